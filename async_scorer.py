@@ -0,0 +1,303 @@
+"""
+Async scoring API for asyncio services
+`await scorer.score(txn)` / `await scorer.score_many(txns)` queue transactions
+on the event loop; a dispatcher groups them into micro-batches and scores
+them in a bounded thread pool (XGBoost releases the GIL while predicting).
+New requests are rejected once too many transactions are pending, each
+request has a deadline, and queue wait and compute time are tracked
+separately so overload shows up in the metrics rather than in memory.
+"""
+
+import argparse
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from preprocess import FeatureTransformer
+from velocity_features import VelocityFeatureStore, velocity_feature_names
+from serve import model_feature_names, load_scoring_model, required_fields, validate_transactions
+from config import *
+
+class ScorerOverloaded(RuntimeError):
+    """Raised when a request would push the pending transactions past the limit"""
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request is not scored before its deadline"""
+
+class _Request:
+    __slots__ = ('rows', 'future', 'deadline', 'enqueued')
+
+    def __init__(self, rows, future, deadline, enqueued):
+        self.rows = rows
+        self.future = future
+        self.deadline = deadline
+        self.enqueued = enqueued
+
+class AsyncScorer:
+    """Micro-batching scorer for use inside a running event loop
+
+    Use as `async with AsyncScorer(model) as scorer:`, or call start() and
+    close() from the loop.
+    """
+
+    def __init__(self, model, max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS,
+                 n_workers=ASYNC_WORKERS, max_pending=ASYNC_MAX_PENDING, timeout_ms=ASYNC_TIMEOUT_MS):
+        self.model = model
+        self.transformer = FeatureTransformer.from_feature_names(model_feature_names(model))
+        uses_velocity = set(velocity_feature_names()) & set(self.transformer.passthrough)
+        self.velocity_store = VelocityFeatureStore() if uses_velocity else None
+        self.fields = required_fields(self.transformer, bool(uses_velocity))
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.n_workers = n_workers
+        self.max_pending = max_pending
+        self.timeout = timeout_ms / 1000.0
+
+        self._requests = deque()
+        self._queued_rows = 0
+        self._pending_rows = 0  # accepted and not yet answered, queued or scoring
+        self._inflight = set()
+        self._closed = False
+        self._dispatcher = None
+
+        self.counts = {'requests': 0, 'transactions': 0, 'batches': 0, 'rejected': 0, 'invalid': 0,
+                       'expired': 0, 'cancelled': 0, 'failed': 0}
+        self._queue_wait = deque(maxlen=ASYNC_METRICS_WINDOW)
+        self._compute = deque(maxlen=ASYNC_METRICS_WINDOW)
+        self._batch_sizes = deque(maxlen=ASYNC_METRICS_WINDOW)
+
+    async def start(self):
+        """Start the dispatcher and the thread pool on the running loop"""
+        if self._dispatcher is not None:
+            return self
+        self._ready = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.n_workers)
+        self._executor = ThreadPoolExecutor(self.n_workers, thread_name_prefix='async-scorer')
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        return self
+
+    async def close(self):
+        """Score everything already queued, then stop"""
+        if self._closed or self._dispatcher is None:
+            self._closed = True
+            return
+        self._closed = True
+        self._ready.set()
+        await self._dispatcher
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def score(self, transaction, timeout_ms=None):
+        """Fraud probability of one raw transaction"""
+        return float((await self.score_many([transaction], timeout_ms))[0])
+
+    async def score_many(self, transactions, timeout_ms=None):
+        """Fraud probabilities of a list of raw transactions, scored together
+
+        Raises ValueError straight away for a malformed transaction,
+        ScorerOverloaded when the scorer is full, and DeadlineExceeded when
+        the result is not ready within timeout_ms.
+        """
+        if self._closed or self._dispatcher is None:
+            raise RuntimeError("AsyncScorer is not running")
+        rows = list(transactions)
+        if not rows:
+            return np.empty(0)
+        try:
+            # Checked before queueing, so a bad transaction never joins a micro-batch
+            validate_transactions(rows, self.fields)
+        except ValueError:
+            self.counts['invalid'] += 1
+            raise
+        if self._pending_rows + len(rows) > self.max_pending:
+            # Shed load at the door instead of queueing work that would miss its deadline
+            self.counts['rejected'] += 1
+            raise ScorerOverloaded(f"{self._pending_rows} transactions pending (limit {self.max_pending})")
+
+        timeout = self.timeout if timeout_ms is None else timeout_ms / 1000.0
+        now = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._pending_rows += len(rows)
+        future.add_done_callback(lambda _: self._release(len(rows)))
+        self._requests.append(_Request(rows, future, now + timeout, now))
+        self._queued_rows += len(rows)
+        self.counts['requests'] += 1
+        self.counts['transactions'] += len(rows)
+        self._ready.set()
+
+        try:
+            # wait_for cancels the future on timeout, so the dispatcher skips it
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.counts['expired'] += 1
+            raise DeadlineExceeded(f"not scored within {timeout * 1000:.0f} ms") from None
+        except asyncio.CancelledError:
+            self.counts['cancelled'] += 1
+            raise
+
+    def _release(self, n_rows):
+        self._pending_rows -= n_rows
+
+    async def _next_batch(self):
+        """Wait for a request, then up to max wait for the batch to fill"""
+        while not self._requests:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while self._queued_rows < self.max_batch_size and not self._closed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        batch, size = [], 0
+        while self._requests and (not batch or size + len(self._requests[0].rows) <= self.max_batch_size):
+            request = self._requests.popleft()
+            self._queued_rows -= len(request.rows)
+            batch.append(request)
+            size += len(request.rows)
+        return batch
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # At most n_workers batches in flight; the rest wait in the queue
+            await self._slots.acquire()
+            batch = await self._next_batch()
+            if batch is None:
+                self._slots.release()
+                return
+            # Requests cancelled or past their deadline while queued are never scored
+            now = time.monotonic()
+            batch = [request for request in batch if not request.future.done() and request.deadline > now]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = loop.create_task(self._score_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def _predict(self, requests_rows):
+        """Score each request's rows together, returning (proba, per-request exception or None)"""
+        parts, errors = [], []
+        for rows in requests_rows:
+            try:
+                parts.append(self.transformer.transform(rows))
+                errors.append(None)
+            except Exception as exc:
+                errors.append(exc)
+        proba = self.model.predict_proba(np.concatenate(parts))[:, 1] if parts else np.empty(0)
+        return proba, errors
+
+    async def _score_batch(self, batch):
+        try:
+            started = time.monotonic()
+            self._queue_wait.extend(started - request.enqueued for request in batch)
+            requests_rows = []
+            for request in batch:
+                rows = request.rows
+                if self.velocity_store is not None:
+                    # Updated on the loop thread, in arrival order, before any await; the rows
+                    # were validated in score_many, so only well-formed transactions update it
+                    rows = [{**txn, **self.velocity_store.update(txn[ENTITY_COLUMN], txn[TIME_COLUMN],
+                                                                 txn[AMOUNT_COLUMN])} for txn in rows]
+                requests_rows.append(rows)
+            try:
+                proba, errors = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._predict, requests_rows)
+            except Exception as exc:
+                self.counts['failed'] += len(batch)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+                return
+
+            self._compute.append(time.monotonic() - started)
+            self._batch_sizes.append(len(proba))
+            self.counts['batches'] += 1
+            start = 0
+            for request, error in zip(batch, errors):
+                # A request that could not be transformed fails alone
+                if error is not None:
+                    self.counts['failed'] += 1
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                    continue
+                end = start + len(request.rows)
+                if not request.future.done():
+                    request.future.set_result(proba[start:end])
+                start = end
+        finally:
+            self._slots.release()
+
+    def metrics(self):
+        """Counters, current load, and queue wait vs compute time percentiles (ms)"""
+        def percentiles(values):
+            if not values:
+                return {'p50': None, 'p95': None, 'p99': None}
+            p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+            return {'p50': p50, 'p95': p95, 'p99': p99}
+
+        return {
+            **self.counts,
+            'pending_transactions': self._pending_rows,
+            'queued_transactions': self._queued_rows,
+            'batches_in_flight': len(self._inflight),
+            'mean_batch_size': float(np.mean(self._batch_sizes)) if self._batch_sizes else None,
+            'queue_wait_ms': percentiles(self._queue_wait),
+            'compute_ms': percentiles(self._compute)
+        }
+
+async def load_test(model, transactions, concurrency, **scorer_args):
+    """Score every transaction as its own request from `concurrency` clients, returning the metrics"""
+    async with AsyncScorer(model, **scorer_args) as scorer:
+        remaining = iter(transactions)
+
+        async def client():
+            for txn in remaining:
+                try:
+                    await scorer.score(txn)
+                except (ScorerOverloaded, DeadlineExceeded):
+                    pass
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+        return scorer.metrics(), seconds
+
+if __name__ == "__main__":
+    from preprocess import load_data
+
+    parser = argparse.ArgumentParser(description='Load test the async scoring API')
+    parser.add_argument('--model', type=str, default='fraud_detection_model.pkl')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=ASYNC_WORKERS)
+    parser.add_argument('--timeout-ms', type=float, default=ASYNC_TIMEOUT_MS)
+
+    args = parser.parse_args()
+    model = load_scoring_model(args.model, watch=False)
+    transactions = load_data().drop(TARGET_COLUMN, axis=1).head(args.requests).to_dict(orient='records')
+    metrics, seconds = asyncio.run(load_test(model, transactions, args.concurrency,
+                                             n_workers=args.workers, timeout_ms=args.timeout_ms))
+
+    print(f"{len(transactions)} requests in {seconds:.2f}s ({len(transactions) / seconds:.0f} req/s)")
+    for key, value in metrics.items():
+        print(f"  {key}: {value}")
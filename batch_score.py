@@ -0,0 +1,225 @@
+"""
+Batch scoring of transaction files
+Reads a CSV or Parquet file in chunks and streams fraud scores to an output
+file. A reader thread parses the next chunks while a thread pool transforms
+and scores several chunks at once (CSV parsing and predict_proba release
+the GIL), and the main thread writes results back in input order. Only a
+fixed number of chunks is ever in flight, so memory stays flat however
+large the input is. When a drift reference was saved at training time,
+the scored features are also checked for drift.
+"""
+
+import argparse
+import copy
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from preprocess import FeatureTransformer
+from velocity_features import VelocityFeatureStore, velocity_feature_names
+from serve import load_scoring_model, model_feature_names
+from threshold import load_threshold
+from drift_monitor import load_reference
+from explain import Explainer, format_reasons
+from instrument import peak_rss_mb
+from config import *
+
+_DONE = object()
+
+def read_chunks(filepath, chunk_size=SCORE_CHUNK_SIZE):
+    """Yield the rows of a CSV or Parquet file as DataFrames of chunk_size rows"""
+    if filepath.endswith('.parquet'):
+        # Optional dependency, only needed for Parquet input
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    dtypes = {col: FEATURE_DTYPE for col in RAW_FEATURE_COLUMNS}
+    yield from pd.read_csv(filepath, chunksize=chunk_size, dtype=dtypes)
+
+def add_velocity_features(chunks, store):
+    """Add streaming velocity features to each chunk, in input order"""
+    for chunk in chunks:
+        rows = zip(chunk[ENTITY_COLUMN].to_numpy(), chunk[TIME_COLUMN].to_numpy(),
+                   chunk[AMOUNT_COLUMN].to_numpy())
+        features = pd.DataFrame([store.update(*row) for row in rows], index=chunk.index)
+        yield pd.concat([chunk, features], axis=1)
+
+def prefetch(iterator, depth):
+    """Run an iterator in a background thread, keeping at most depth items ready"""
+    ready = queue.Queue(maxsize=depth)
+
+    def produce():
+        try:
+            for item in iterator:
+                ready.put(item)
+        except Exception as exc:
+            ready.put(exc)
+        ready.put(_DONE)
+
+    threading.Thread(target=produce, name='chunk-reader', daemon=True).start()
+    while True:
+        item = ready.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def score_chunk(model, transformer, chunk, row_offset, threshold, keep_columns=SCORE_KEEP_COLUMNS,
+                monitor=None, explainer=None):
+    """Scores for one chunk as a DataFrame: row number, kept input columns, probability and flag
+
+    When a drift monitor is given, the chunk's features are also counted into it;
+    with an explainer, flagged rows get their reason codes.
+    """
+    X = transformer.transform(chunk)
+    proba = model.predict_proba(X)[:, 1]
+    if monitor is not None:
+        monitor.update(X)
+
+    scores = {'row': np.arange(row_offset, row_offset + len(chunk))}
+    for col in keep_columns:
+        if col in chunk.columns:
+            scores[col] = chunk[col].to_numpy()
+    scores['fraud_probability'] = proba
+    scores['is_fraud'] = (proba >= threshold).astype(np.int8)
+    if explainer is not None:
+        scores['reasons'] = [format_reasons(r) if r else '' for r in explainer.explain(X, proba, threshold)]
+    return pd.DataFrame(scores)
+
+class ScoreWriter:
+    """Append scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = None
+        self._parquet = None
+
+    def write(self, scores):
+        if self.filepath.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(scores, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.filepath, table.schema)
+            self._parquet.write_table(table)
+            return
+
+        header = self._file is None
+        if header:
+            self._file = open(self.filepath, 'w', newline='')
+        scores.to_csv(self._file, header=header, index=False)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def batch_score(input_path, output_path, model='fraud_detection_model.pkl',
+                chunk_size=SCORE_CHUNK_SIZE, n_workers=SCORE_WORKERS, threshold=None, explain=False):
+    """Score every transaction in input_path and write the scores to output_path
+
+    model is a file name in the models directory, "registry", or a loaded model.
+    """
+    if isinstance(model, str):
+        model = load_scoring_model(model, watch=False)
+    elif hasattr(model, 'set_params'):
+        # The caller's model may be serving elsewhere, so the thread count is set on a private copy
+        model = copy.deepcopy(model)
+    if hasattr(model, 'set_params'):
+        # Split the cores between the chunks scored at once
+        model.set_params(n_jobs=max(1, (os.cpu_count() or 1) // n_workers))
+    transformer = FeatureTransformer.from_feature_names(model_feature_names(model))
+    if threshold is None:
+        # A registry model carries its version's threshold; a model file uses the one saved with it
+        threshold = getattr(model, 'threshold', None) or load_threshold()
+
+    try:
+        reference = load_reference()
+    except FileNotFoundError:
+        reference = None
+    if reference is not None and reference.feature_names != transformer.feature_names:
+        print("Drift reference does not match the model's features, skipping drift monitoring")
+        reference = None
+    drift = reference.empty_like() if reference is not None else None
+    explainer = Explainer(model) if explain else None
+
+    chunks = read_chunks(input_path, chunk_size)
+    if set(velocity_feature_names()) & set(transformer.passthrough):
+        # Velocity state depends on every earlier transaction, so it is built in the reader
+        chunks = add_velocity_features(chunks, VelocityFeatureStore())
+
+    print(f"Scoring {input_path} in chunks of {chunk_size} rows, {n_workers} chunks at a time...")
+    start = time.perf_counter()
+    n_rows = n_flagged = 0
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool, ScoreWriter(output_path) as writer:
+        pending = deque()
+
+        def write_next():
+            nonlocal n_flagged
+            future, chunk_drift = pending.popleft()
+            scores = future.result()
+            n_flagged += int(scores['is_fraud'].sum())
+            writer.write(scores)
+            if chunk_drift is not None:
+                drift.merge(chunk_drift)
+
+        for chunk in prefetch(chunks, depth=n_workers):
+            # Each chunk gets its own sketch, merged once the chunk is written
+            chunk_drift = drift.empty_like() if drift is not None else None
+            future = pool.submit(score_chunk, model, transformer, chunk, n_rows, threshold,
+                                 monitor=chunk_drift, explainer=explainer)
+            pending.append((future, chunk_drift))
+            n_rows += len(chunk)
+            # Write in input order, and never hold more than two chunks per worker
+            while len(pending) >= 2 * n_workers or (pending and pending[0][0].done()):
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': n_rows,
+        'flagged': n_flagged,
+        'seconds': elapsed,
+        'rows_per_s': n_rows / elapsed if elapsed > 0 else float('inf'),
+        'peak_rss_mb': peak_rss_mb()
+    }
+    print(f"Scored {n_rows} transactions in {elapsed:.2f}s ({stats['rows_per_s']:,.0f} rows/s), "
+          f"{n_flagged} flagged at threshold {threshold:.4f}")
+    print(f"Scores written to {output_path} (peak RSS {stats['peak_rss_mb']:.0f} MB)")
+
+    if drift is not None:
+        report = drift.compare(reference)
+        stats['drifted_features'] = list(report.loc[report['drift'], 'feature'])
+        print(f"Drift against the training reference: {len(stats['drifted_features'])} of "
+              f"{len(report)} features drifted {stats['drifted_features'] or ''}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Score a file of transactions')
+    parser.add_argument('input', type=str, help='CSV or Parquet file of transactions')
+    parser.add_argument('output', type=str, help='Output CSV or Parquet file for the scores')
+    parser.add_argument('--model', type=str, default='fraud_detection_model.pkl',
+                        help='Model file name inside the models directory (.pkl or .npz), or "registry"')
+    parser.add_argument('--chunk-size', type=int, default=SCORE_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=SCORE_WORKERS)
+    parser.add_argument('--explain', action='store_true',
+                        help='Add the top contributing features of each flagged transaction')
+
+    args = parser.parse_args()
+    batch_score(args.input, args.output, args.model, args.chunk_size, args.workers, explain=args.explain)
@@ -0,0 +1,213 @@
+"""
+Benchmark suite for the fraud detection pipeline
+Times each pipeline stage on synthetic data, records wall time, throughput
+and peak memory to JSON, and flags stages that regressed against a baseline.
+The precision check reruns the pipeline with float64 features to confirm
+FEATURE_DTYPE does not change the model's accuracy.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from preprocess import load_data, feature_engineering, split_data, apply_smote
+from train_model import train_xgboost
+from test_preprocess import create_mock_data
+from metrics import ScoreCounts
+from config import *
+
+def measure(func, *args, repeat=1):
+    """Run func, returning (result, best wall time, peak traced memory in MB)
+
+    tracemalloc slows Python-heavy stages many times over, so the timed runs
+    are untraced and peak memory comes from one extra traced run.
+    """
+    best_time = float('inf')
+
+    # Pipeline stages print progress; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(*args)
+            best_time = min(best_time, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return result, best_time, peak / 1024 ** 2
+
+def _record(results, stage, wall_time, rows, peak_mb):
+    results[stage] = {
+        'wall_s': wall_time,
+        'rows': rows,
+        'rows_per_s': rows / wall_time if wall_time > 0 else float('inf'),
+        'peak_mb': peak_mb
+    }
+    print(f"{stage:20s}: {wall_time:9.4f}s  {results[stage]['rows_per_s']:14,.0f} rows/s  "
+          f"{peak_mb:9.1f} MB peak")
+
+def run_benchmarks(n_rows=BENCHMARK_ROWS, fraud_rate=BENCHMARK_FRAUD_RATE,
+                   repeat=3, single_row_calls=200):
+    """Time every pipeline stage on synthetic data of n_rows"""
+    print(f"Benchmarking pipeline on {n_rows} synthetic rows (best of {repeat})...\n")
+    stages = {}
+
+    df = create_mock_data(n_samples=n_rows, fraud_rate=fraud_rate)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'creditcard.csv')
+        df.to_csv(csv_path, index=False)
+
+        df, elapsed, peak = measure(load_data, csv_path, False, repeat=repeat)
+        _record(stages, 'load_data', elapsed, len(df), peak)
+
+    df, elapsed, peak = measure(feature_engineering, df, repeat=repeat)
+    _record(stages, 'feature_engineering', elapsed, len(df), peak)
+
+    (X_train, X_test, y_train, y_test), elapsed, peak = measure(split_data, df, repeat=repeat)
+    _record(stages, 'split_data', elapsed, len(df), peak)
+
+    (X_res, y_res), elapsed, peak = measure(apply_smote, X_train, y_train, repeat=repeat)
+    _record(stages, 'apply_smote', elapsed, len(X_train), peak)
+
+    model, elapsed, peak = measure(train_xgboost, X_res, y_res, repeat=1)
+    _record(stages, 'train_xgboost', elapsed, len(X_res), peak)
+
+    rows = [X_test.iloc[[i % len(X_test)]] for i in range(single_row_calls)]
+
+    def predict_single():
+        for row in rows:
+            model.predict_proba(row)
+
+    _, elapsed, peak = measure(predict_single, repeat=repeat)
+    _record(stages, 'predict_single', elapsed, single_row_calls, peak)
+
+    _, elapsed, peak = measure(model.predict_proba, X_test, repeat=repeat)
+    _record(stages, 'predict_batch', elapsed, len(X_test), peak)
+
+    return {
+        'config': {'rows': n_rows, 'fraud_rate': fraud_rate, 'repeat': repeat,
+                   'single_row_calls': single_row_calls},
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(),
+                        'cpu_count': os.cpu_count()},
+        'stages': stages
+    }
+
+def compare_to_baseline(results, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """List stages whose wall time exceeds the baseline by more than tolerance"""
+    regressions = []
+    for stage, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if previous is None:
+            continue
+        ratio = current['wall_s'] / previous['wall_s'] if previous['wall_s'] > 0 else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append({'stage': stage, 'baseline_s': previous['wall_s'],
+                                'current_s': current['wall_s'], 'ratio': ratio})
+    return regressions
+
+def mock_data_with_signal(n_rows, fraud_rate, shift=1.5):
+    """Synthetic data whose fraud rows are shifted on V1-V4, so there is accuracy to lose"""
+    df = create_mock_data(n_samples=n_rows, fraud_rate=fraud_rate)
+    fraud = df[TARGET_COLUMN] == 1
+    for col in ['V1', 'V2', 'V3', 'V4']:
+        df.loc[fraud, col] += shift
+    return df
+
+def precision_check(df, dtypes=('float64', FEATURE_DTYPE), max_auc_delta=PRECISION_MAX_AUC_DELTA):
+    """Run feature engineering, SMOTE, training and scoring once per feature dtype and compare
+
+    df is the raw dataset; load it with use_cache=False so the float64 run
+    starts from full-precision columns. The first dtype is the reference.
+    """
+    runs, probas = {}, {}
+    for dtype in dtypes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            X_train, X_test, y_train, y_test = split_data(feature_engineering(df, dtype=dtype))
+            X_res, y_res = apply_smote(X_train, y_train)
+            model = train_xgboost(X_res, y_res)
+            probas[dtype] = proba = model.predict_proba(X_test)[:, 1]
+        counts = ScoreCounts.from_scores(y_test, proba)
+        runs[dtype] = {
+            'train_matrix_mb': X_res.memory_usage(index=False).sum() / 1024 ** 2,
+            'roc_auc': counts.roc_auc(),
+            'pr_auc': counts.average_precision()
+        }
+
+    reference = runs[dtypes[0]]
+    print(f"{'dtype':10s} {'train MB':>10s} {'ROC-AUC':>9s} {'PR-AUC':>9s} {'max |dp|':>9s} {'flags changed':>14s}")
+    for dtype, run in runs.items():
+        run['max_proba_diff'] = float(np.abs(probas[dtype] - probas[dtypes[0]]).max())
+        run['flags_changed'] = int(((probas[dtype] >= FRAUD_THRESHOLD) !=
+                                    (probas[dtypes[0]] >= FRAUD_THRESHOLD)).sum())
+        run['auc_delta'] = max(abs(run['roc_auc'] - reference['roc_auc']),
+                               abs(run['pr_auc'] - reference['pr_auc']))
+        print(f"{dtype:10s} {run['train_matrix_mb']:10.1f} {run['roc_auc']:9.5f} {run['pr_auc']:9.5f} "
+              f"{run['max_proba_diff']:9.2e} {run['flags_changed']:14d}")
+
+    passed = all(run['auc_delta'] <= max_auc_delta for run in runs.values())
+    return {'runs': runs, 'max_auc_delta': max_auc_delta, 'passed': passed}
+
+def save_json(data, filepath):
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the fraud detection pipeline')
+    parser.add_argument('--rows', type=int, default=BENCHMARK_ROWS)
+    parser.add_argument('--fraud-rate', type=float, default=BENCHMARK_FRAUD_RATE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default='benchmark_results.json')
+    parser.add_argument('--baseline', type=str, default=BENCHMARK_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=BENCHMARK_TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline')
+    parser.add_argument('--precision-check', action='store_true',
+                        help=f'Compare float64 features against FEATURE_DTYPE ({FEATURE_DTYPE}) instead of timing')
+    parser.add_argument('--data', type=str, default=None,
+                        help='Dataset for the precision check (default: synthetic data of --rows)')
+
+    args = parser.parse_args()
+    if args.precision_check:
+        if args.data:
+            df = load_data(args.data, use_cache=False)
+        else:
+            df = mock_data_with_signal(args.rows, args.fraud_rate)
+        check = precision_check(df)
+        print(f"\nPrecision check {'passed' if check['passed'] else 'FAILED'} "
+              f"(max allowed AUC change {check['max_auc_delta']})")
+        sys.exit(0 if check['passed'] else 1)
+
+    results = run_benchmarks(args.rows, args.fraud_rate, args.repeat)
+    save_json(results, args.output)
+    print(f"\nResults saved to {args.output}")
+
+    if args.save_baseline:
+        save_json(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+
+        if regressions:
+            print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+            for r in regressions:
+                print(f"  {r['stage']:20s}: {r['baseline_s']:.4f}s -> {r['current_s']:.4f}s ({r['ratio']:.2f}x)")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+    else:
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
@@ -9,6 +9,10 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(PROJECT_ROOT, 'creditcard.csv')
 MODELS_PATH = os.path.join(PROJECT_ROOT, 'models')
 PLOTS_PATH = os.path.join(PROJECT_ROOT, 'plots')
+CACHE_PATH = os.path.join(PROJECT_ROOT, 'cache')
+SHARDS_PATH = os.path.join(PROJECT_ROOT, 'shards')
+REGISTRY_PATH = os.path.join(MODELS_PATH, 'registry')
+REPORTS_PATH = os.path.join(PROJECT_ROOT, 'reports')
 
 # Data settings
 RANDOM_STATE = 42
@@ -16,9 +20,40 @@ TEST_SIZE = 0.2
 TARGET_COLUMN = 'Class'
 AMOUNT_COLUMN = 'Amount'
 TIME_COLUMN = 'Time'
+FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)] + ['LogAmount', 'Hour']
+
+# Velocity features: per-entity count/amount over sliding windows (seconds).
+# Only added when the data has ENTITY_COLUMN; the Kaggle dataset has no card id.
+ENTITY_COLUMN = 'card_id'
+VELOCITY_WINDOWS = {'1m': 60, '1h': 3600, '24h': 86400}
+VELOCITY_MAX_ENTITIES = 1000000
+VELOCITY_TTL_SECONDS = 86400
+VELOCITY_MAX_EVENTS = 256
+
+# Columnar data cache (memory-mapped .npy per column, keyed by CSV hash)
+USE_DATA_CACHE = True
+RAW_FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)]  # parsed straight into FEATURE_DTYPE
+# Feature matrices from feature engineering through SMOTE, training and scoring are
+# one contiguous array of this dtype; 'float64' doubles memory for no accuracy gain
+# (see `python benchmark.py --precision-check`)
+FEATURE_DTYPE = 'float32'
+
+# Stage cache for preprocess_pipeline outputs (features, split, SMOTE)
+USE_STAGE_CACHE = True
+
+# Streaming preprocessing (chunked, hash-based split, shards written to SHARDS_PATH)
+STREAM_CHUNK_SIZE = 100000
+STREAM_KEY_COLUMN = None  # column used as the split key; None uses the row number
 
 # SMOTE
 SAMPLING_STRATEGY = 0.5
+# 'smote' (imblearn), 'fast_smote' (minority-only ball tree, parallel, float32 output)
+# or 'scale_pos_weight' (no resampling, XGBoost weights the fraud class instead)
+RESAMPLING_METHOD = 'smote'
+SMOTE_K_NEIGHBORS = 5
+SMOTE_NN_ALGORITHM = 'ball_tree'
+SMOTE_N_JOBS = -1
+SMOTE_CHUNK_SIZE = 65536
 
 # XGBoost params
 XGBOOST_PARAMS = {
@@ -30,8 +65,114 @@ XGBOOST_PARAMS = {
     'random_state': RANDOM_STATE,
     'eval_metric': 'logloss'
 }
+TRAIN_NTHREAD = None  # None lets XGBoost use every core
+
+# Incremental updates and model registry
+INCREMENTAL_MODE = 'add_trees'  # or 'refresh' to re-estimate leaf values only
+INCREMENTAL_TREES = 20
+REGISTRY_POLL_SECONDS = 30
+
+# Hyperparameter search (successive halving)
+TUNE_SEARCH_SPACE = {
+    'max_depth': [2, 3, 4, 5, 6],
+    'learning_rate': [0.05, 0.1, 0.2, 0.3],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 5, 10]
+}
+TUNE_N_TRIALS = 27
+TUNE_PARALLEL_TRIALS = 4
+TUNE_MIN_ROUNDS = 25
+TUNE_MAX_ROUNDS = 300
+TUNE_ETA = 3
+TUNE_EARLY_STOPPING_ROUNDS = 20
+TUNE_METRIC = 'aucpr'
+TUNE_VALID_SIZE = 0.2
+TUNE_SCORE_TOLERANCE = 0.01  # prefer a cheaper model if it is this close to the best
+USE_TUNED_PARAMS = False  # train with models/tuned_params.json instead of XGBOOST_PARAMS
+
+# External-memory training from shards
+EXTMEM_CACHE_PATH = os.path.join(CACHE_PATH, 'xgb_extmem')
+EXTMEM_MAX_BIN = 256
+
+# Distributed training (XGBoost collective; one process per worker, local or across nodes)
+DIST_WORKERS = 2
+DIST_TRACKER_HOST = '127.0.0.1'  # address workers use to reach the tracker; a reachable IP for multi-node runs
+DIST_TIMEOUT = 600  # seconds a worker waits on the others before giving up
+DIST_SCALING_WORKERS = [1, 2, 4]  # worker counts compared by the scaling report
+DIST_SCALING_THREADS = 1  # threads per worker in the scaling report, so each added worker adds cores
+
+# Model comparison
+COMPARISON_WORKERS = 3  # concurrent model fits; 1 runs them one after another
+
+# Cascade scoring (cheap screen clears the obvious legitimate transactions first)
+CASCADE_SCREEN = 'Logistic Regression'  # 'Logistic Regression' or 'Tiny XGBoost'
+CASCADE_TINY_PARAMS = {'n_estimators': 10, 'max_depth': 3, 'learning_rate': 0.3, 'random_state': RANDOM_STATE}
+CASCADE_MAX_RECALL_LOSS = 0.01  # share of the full model's caught frauds the screen may clear
+
+# Cross-validation
+CV_FOLDS = 5
+CV_METHOD = 'stratified'  # 'stratified' k-fold or 'time' (train on the past, test on the next block)
+CV_WORKERS = 5  # folds evaluated at once; 1 runs them one after another
+CV_CONFIDENCE = 0.95
+
+# Run instrumentation (per-stage timing, memory and row counts)
+INSTRUMENT_VERBOSE = True  # print a timing line when each stage finishes
+INSTRUMENT_MAX_RECORDS = 10000  # stages kept for the run report; older ones are dropped
+PROFILE_STAGES = []  # stage names run under cProfile, e.g. ['apply_smote']
+TRACE_MEMORY_STAGES = []  # stage names run under tracemalloc
+
+# Benchmarks
+BENCHMARK_ROWS = 100000
+BENCHMARK_FRAUD_RATE = 0.01
+BENCHMARK_TOLERANCE = 0.25  # allowed slowdown vs baseline before a stage counts as regressed
+BENCHMARK_BASELINE = os.path.join(PROJECT_ROOT, 'benchmarks', 'baseline.json')
+PRECISION_MAX_AUC_DELTA = 0.001  # largest ROC-AUC / PR-AUC change FEATURE_DTYPE may cause vs float64
 
 # Evaluation
 METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc']
 PLOT_STYLE = 'seaborn-v0_8'
 FIGURE_SIZE = (10, 6)
+PLOT_DPI = 300
+PLOT_MAX_POINTS = 500  # ROC/PR curves are decimated to this many points
+PLOT_WORKERS = 4  # figures rendered at once (at most one per core); 1 renders them one after another
+FRAUD_THRESHOLD = 0.5  # used until an operating point has been saved
+
+# Drift monitoring
+DRIFT_BINS = 20  # quantile bins of the reference data per feature
+DRIFT_PSI_ALERT = 0.2  # population stability index above this flags a feature
+DRIFT_KS_ALERT = 0.1  # KS distance above this flags a feature
+
+# Operating point selection
+THRESHOLD_STRATEGY = 'fpr_budget'  # 'fpr_budget', 'cost' or 'f1'
+TARGET_FPR = 0.001  # false positive budget for 'fpr_budget'
+COST_FALSE_NEGATIVE = 100.0  # cost of a missed fraud, relative to a false alarm
+COST_FALSE_POSITIVE = 1.0
+CALIBRATION_SIZE = 0.2  # share of the training split held out (before SMOTE) to choose the threshold on
+UPDATE_MIN_CALIBRATION_FRAUD = 10  # incremental updates keep the parent's threshold with fewer held-out frauds
+
+# Scoring service
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8080
+SERVE_MAX_BATCH_SIZE = 256
+SERVE_MAX_WAIT_MS = 2
+
+# Reason codes (per-transaction explanations of flagged scores)
+EXPLAIN_TOP_K = 3  # features returned per flagged transaction
+EXPLAIN_CACHE_SIZE = 10000  # explanations kept for repeated feature vectors
+EXPLAIN_APPROX = False  # True uses XGBoost's faster approximate contributions instead of exact TreeSHAP
+SERVE_EXPLAIN = True  # include reason codes in /score responses for flagged transactions
+
+# Async scoring API (batches share SERVE_MAX_BATCH_SIZE / SERVE_MAX_WAIT_MS)
+ASYNC_WORKERS = 2  # batches scored at once in the thread pool
+ASYNC_MAX_PENDING = 10000  # transactions queued or scoring before new requests are rejected
+ASYNC_TIMEOUT_MS = 100  # default per-request deadline
+ASYNC_METRICS_WINDOW = 10000  # recent requests kept for latency percentiles
+
+# Batch scoring
+SCORE_CHUNK_SIZE = 100000
+SCORE_WORKERS = 4  # chunks transformed and scored at once
+SCORE_KEEP_COLUMNS = [TIME_COLUMN, AMOUNT_COLUMN]  # input columns copied to the output when present
+
+# Metrics
+METRICS_BINS = 65536  # score bins of a mergeable ScoreHistogram (chunked / sharded evaluation)
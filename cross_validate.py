@@ -0,0 +1,130 @@
+"""
+Cross-validation for the fraud detection models
+Stratified k-fold or time-ordered folds, with SMOTE applied inside each
+training fold only. The feature matrix is written once and memory-mapped
+read-only by the fold workers, and the fold metrics are summarised as a
+mean with a t-distribution confidence interval.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from scipy import stats
+from sklearn.model_selection import StratifiedKFold, TimeSeriesSplit
+from preprocess import load_data, feature_engineering, apply_smote
+from model_comparison import MODEL_NAMES, TIMING_COLUMNS, fit_and_score
+from instrument import instrumented
+from config import *
+
+METRIC_COLUMNS = ['Accuracy', 'Precision', 'Recall', 'F1-Score', 'ROC-AUC']
+
+def cv_splits(y, n_folds=CV_FOLDS, method=CV_METHOD, times=None):
+    """(train indices, test indices) for every fold
+
+    'time' orders rows by times (or keeps the given order) and always tests
+    on the block that follows the training rows.
+    """
+    y = np.asarray(y)
+    if method == 'stratified':
+        folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+        return list(folds.split(np.zeros(len(y)), y))
+    if method == 'time':
+        order = np.argsort(times, kind='stable') if times is not None else np.arange(len(y))
+        folds = TimeSeriesSplit(n_splits=n_folds)
+        return [(order[train], order[test]) for train, test in folds.split(order)]
+    raise ValueError(f"Unknown CV method: {method}")
+
+def run_fold(name, fold, X, y, train_idx, test_idx, feature_names, n_jobs=-1):
+    """Resample one training fold, fit, and score on the untouched test fold"""
+    X_train = pd.DataFrame(X[train_idx], columns=feature_names)
+    X_test = pd.DataFrame(X[test_idx], columns=feature_names)
+
+    start = time.perf_counter()
+    X_train, y_train = apply_smote(X_train, y[train_idx])
+    smote_time = time.perf_counter() - start
+
+    metrics = fit_and_score(name, X_train, X_test, y_train, y[test_idx], n_jobs)
+    metrics.update({'Fold': fold, 'Test Rows': len(test_idx), 'SMOTE Time (s)': smote_time})
+    return metrics
+
+def _run_fold_shared(name, fold, data_dir, train_idx, test_idx, feature_names, n_jobs):
+    """Worker entry point: memory-map the shared matrix and evaluate one fold"""
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    return run_fold(name, fold, X, y, train_idx, test_idx, feature_names, n_jobs)
+
+def cross_validate(X, y, name='XGBoost', n_folds=CV_FOLDS, method=CV_METHOD, times=None,
+                   n_workers=CV_WORKERS):
+    """Evaluate one model on every fold, returning one row of metrics and timings per fold"""
+    splits = cv_splits(y, n_folds, method, times)
+    feature_names = list(X.columns)
+    n_workers = min(n_workers, len(splits))
+    print(f"Cross-validating {name}: {len(splits)} {method} folds, {n_workers} at a time...")
+
+    if n_workers <= 1:
+        X_values, y_values = np.asarray(X), np.asarray(y)
+        results = [run_fold(name, fold, X_values, y_values, train_idx, test_idx, feature_names)
+                   for fold, (train_idx, test_idx) in enumerate(splits)]
+    else:
+        n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+        with tempfile.TemporaryDirectory() as data_dir:
+            # Written once; every worker maps the same pages read-only
+            np.save(os.path.join(data_dir, 'X.npy'), np.ascontiguousarray(X))
+            np.save(os.path.join(data_dir, 'y.npy'), np.asarray(y))
+            jobs = [(name, fold, data_dir, train_idx, test_idx, feature_names, n_jobs)
+                    for fold, (train_idx, test_idx) in enumerate(splits)]
+
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(n_workers, maxtasksperchild=1) as pool:
+                results = pool.starmap(_run_fold_shared, jobs)
+
+    for metrics in results:
+        print(f"Fold {metrics['Fold']} - Recall: {metrics['Recall']:.4f}, ROC-AUC: {metrics['ROC-AUC']:.4f}, "
+              f"SMOTE {metrics['SMOTE Time (s)']:.1f}s, fit {metrics['Fit Time (s)']:.1f}s")
+
+    return pd.DataFrame(results)
+
+def summarise_folds(fold_df, confidence=CV_CONFIDENCE):
+    """Mean, standard deviation and confidence interval of every metric across folds"""
+    columns = METRIC_COLUMNS + ['SMOTE Time (s)'] + TIMING_COLUMNS
+    n = len(fold_df)
+    rows = []
+    for column in columns:
+        values = fold_df[column].to_numpy(dtype=float)
+        mean, std = values.mean(), values.std(ddof=1) if n > 1 else 0.0
+        margin = stats.t.ppf((1 + confidence) / 2, n - 1) * std / np.sqrt(n) if n > 1 else 0.0
+        rows.append({'Metric': column, 'Mean': mean, 'Std': std,
+                     'CI Low': mean - margin, 'CI High': mean + margin})
+    return pd.DataFrame(rows)
+
+@instrumented()
+def cv_pipeline(filepath=DATA_PATH, models=('XGBoost',), n_folds=CV_FOLDS, method=CV_METHOD,
+                n_workers=CV_WORKERS):
+    """Cross-validate each model on the full dataset and print the summaries"""
+    raw = load_data(filepath)
+    times = raw[TIME_COLUMN].to_numpy()
+    df = feature_engineering(raw)
+    X, y = df.drop(TARGET_COLUMN, axis=1), df[TARGET_COLUMN]
+
+    summaries = {}
+    for name in models:
+        fold_df = cross_validate(X, y, name, n_folds, method, times, n_workers)
+        summaries[name] = summarise_folds(fold_df)
+
+        print(f"\n{name} ({n_folds} {method} folds, {CV_CONFIDENCE:.0%} CI):")
+        print(summaries[name].to_string(index=False, float_format='%.4f'))
+    return summaries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cross-validate the fraud detection models')
+    parser.add_argument('--folds', type=int, default=CV_FOLDS)
+    parser.add_argument('--method', type=str, default=CV_METHOD, choices=['stratified', 'time'])
+    parser.add_argument('--workers', type=int, default=CV_WORKERS)
+    parser.add_argument('--models', nargs='+', default=['XGBoost'], choices=MODEL_NAMES)
+
+    args = parser.parse_args()
+    cv_pipeline(models=args.models, n_folds=args.folds, method=args.method, n_workers=args.workers)
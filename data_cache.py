@@ -0,0 +1,163 @@
+"""
+Columnar binary cache for the credit card dataset
+Converts the CSV once into one .npy file per column, keyed by the source
+file's hash and the feature dtype, so later loads are memory-mapped instead
+of re-parsing the CSV.
+Also stores content-addressed outputs of the preprocessing stages.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from config import *
+
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.json'
+STAGES_DIR = 'stages'
+
+# Bump when a preprocessing stage changes its output, so old artifacts are not reused
+STAGE_CACHE_VERSION = 1
+
+def column_dtype(column, dtype=FEATURE_DTYPE):
+    """On-disk dtype for a dataset column; the V features are stored at the feature dtype"""
+    if column in RAW_FEATURE_COLUMNS:
+        return np.dtype(dtype)
+    if column == TARGET_COLUMN:
+        return np.int8
+    return np.float64
+
+def file_hash(filepath, chunk_size=1 << 20):
+    """Content hash of a file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_index():
+    try:
+        with open(os.path.join(CACHE_PATH, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_index(index):
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    tmp_path = os.path.join(CACHE_PATH, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(CACHE_PATH, INDEX_FILE))
+
+def source_key(filepath):
+    """Hash of the source file, re-hashed only when its size or mtime changes"""
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    index = _read_index()
+
+    entry = index.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['hash']
+
+    key = file_hash(path)
+    index[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': key}
+    _write_index(index)
+    return key
+
+def cache_dir(key, dtype=FEATURE_DTYPE):
+    """Directory holding the columns for one source hash, parsed at one feature dtype"""
+    return os.path.join(CACHE_PATH, f'{key}_{np.dtype(dtype).name}')
+
+def build_cache(filepath, key, dtype=FEATURE_DTYPE):
+    """Parse the CSV once and write each column as a typed .npy file"""
+    print(f"Building columnar cache for {filepath}...")
+    header = pd.read_csv(filepath, nrows=0).columns
+    df = pd.read_csv(filepath, dtype={col: column_dtype(col, dtype) for col in header})
+
+    # Write into a temporary directory and rename, so a crash never leaves a partial cache
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_PATH)
+    try:
+        for i, col in enumerate(df.columns):
+            np.save(os.path.join(tmp_dir, f'col_{i}.npy'), np.ascontiguousarray(df[col].to_numpy()))
+
+        meta = {'source': os.path.abspath(filepath), 'rows': len(df), 'columns': list(df.columns),
+                'dtype': np.dtype(dtype).name}
+        with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        os.replace(tmp_dir, cache_dir(key, dtype))
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process may have finished the same cache first
+        if not os.path.exists(os.path.join(cache_dir(key, dtype), META_FILE)):
+            raise
+
+    print(f"Cache written to {cache_dir(key, dtype)}")
+
+def load_cached(filepath=DATA_PATH, dtype=FEATURE_DTYPE):
+    """Load the dataset from the columnar cache, building it on first use"""
+    key = source_key(filepath)
+    directory = cache_dir(key, dtype)
+    meta_path = os.path.join(directory, META_FILE)
+
+    if not os.path.exists(meta_path):
+        build_cache(filepath, key, dtype)
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    # Memory-mapped, read-only columns: no parsing and no copy until a column is modified
+    columns = {
+        col: np.load(os.path.join(directory, f'col_{i}.npy'), mmap_mode='r')
+        for i, col in enumerate(meta['columns'])
+    }
+    return pd.DataFrame(columns, copy=False)
+
+def stage_key(stage, *parts):
+    """Content address for a stage output: stage name plus everything it depends on"""
+    payload = json.dumps([stage, STAGE_CACHE_VERSION] + [str(p) for p in parts])
+    return f"{stage}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+def _stage_path(key):
+    return os.path.join(CACHE_PATH, STAGES_DIR, f'{key}.joblib')
+
+def load_stage(key):
+    """Load a cached stage output, or None if it has not been computed yet"""
+    path = _stage_path(key)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+def save_stage(key, value):
+    """Store a stage output under its key"""
+    path = _stage_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump(value, tmp_path)
+    os.replace(tmp_path, path)
+
+def cached_stage(key, compute):
+    """Return the cached output for key, computing and storing it on a miss"""
+    value = load_stage(key)
+    if value is not None:
+        print(f"Loaded {key.split('-')[0]} stage from cache")
+        return value
+
+    value = compute()
+    save_stage(key, value)
+    return value
+
+def clear_cache():
+    """Remove every cached dataset"""
+    shutil.rmtree(CACHE_PATH, ignore_errors=True)
+    print(f"Cache cleared: {CACHE_PATH}")
+
+if __name__ == "__main__":
+    df = load_cached()
+    print(f"Cached data: {df.shape[0]} rows, {df.shape[1]} columns")
@@ -0,0 +1,192 @@
+"""
+Distributed XGBoost training over data shards
+The training set is split into shards and each worker process trains on its
+own shards; XGBoost's collective communicator (started by a RabitTracker)
+allreduces the quantile sketches and gradient histograms, so every worker
+builds the same trees. Locally the workers are processes on one machine;
+train_worker can also be started on other nodes with the same tracker args.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost.tracker import RabitTracker
+from stream_preprocess import load_manifest
+from train_model import booster_params, booster_to_classifier, class_weight_params
+from instrument import instrumented
+from metrics import ScoreCounts
+from config import *
+
+def write_shards(X, y, n_shards, directory, seed=RANDOM_STATE):
+    """Shuffle the rows into n_shards .npy shard pairs, returning their (X path, y path)
+
+    Rows are shuffled first because SMOTE appends all synthetic fraud rows at
+    the end, and each shard should see both classes.
+    """
+    order = np.random.default_rng(seed).permutation(len(y))
+    X, y = np.asarray(X), np.asarray(y)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for index, rows in enumerate(np.array_split(order, n_shards)):
+        X_path = os.path.join(directory, f'X_{index:05d}.npy')
+        y_path = os.path.join(directory, f'y_{index:05d}.npy')
+        np.save(X_path, np.ascontiguousarray(X[rows], dtype=FEATURE_DTYPE))
+        np.save(y_path, y[rows])
+        paths.append((X_path, y_path))
+    return paths
+
+def manifest_shard_paths(shards_dir=SHARDS_PATH, split='train'):
+    """(X path, y path) of every shard written by stream_preprocess"""
+    directory = os.path.join(shards_dir, split)
+    return [(os.path.join(directory, f"X_{shard['index']:05d}.npy"),
+             os.path.join(directory, f"y_{shard['index']:05d}.npy"))
+            for shard in load_manifest(shards_dir)['shards'][split]]
+
+def assign_shards(paths, n_workers):
+    """Deal the shards out to the workers round-robin"""
+    if len(paths) < n_workers:
+        raise ValueError(f"{len(paths)} shards cannot be split across {n_workers} workers")
+    return [paths[rank::n_workers] for rank in range(n_workers)]
+
+def train_worker(tracker_args, shard_paths, feature_names, params, num_boost_round):
+    """Train on this worker's shards inside the collective; rank 0 also returns the model bytes"""
+    with xgb.collective.CommunicatorContext(**tracker_args):
+        rank = xgb.collective.get_rank()
+        try:
+            start = time.perf_counter()
+            X = np.concatenate([np.load(X_path, mmap_mode='r') for X_path, _ in shard_paths])
+            y = np.concatenate([np.load(y_path, mmap_mode='r') for _, y_path in shard_paths])
+            # Quantile sketches are merged across workers, so every worker gets the same bins
+            dtrain = xgb.QuantileDMatrix(X, label=y, feature_names=feature_names, nthread=params.get('nthread'))
+            n_rows = len(y)
+            del X, y
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+            train_time = time.perf_counter() - start
+        except Exception:
+            # Unblock the other workers instead of leaving them waiting in an allreduce
+            xgb.collective.signal_error()
+            raise
+
+    stats = {'rank': rank, 'rows': n_rows, 'load_s': load_time, 'train_s': train_time}
+    return stats, (bytes(booster.save_raw('ubj')) if rank == 0 else None)
+
+@instrumented()
+def train_distributed(X_train=None, y_train=None, n_workers=DIST_WORKERS, shards_dir=SHARDS_PATH, nthread=None):
+    """Train one model across n_workers processes, returning (model, timing stats)
+
+    Trains on X_train/y_train when given (written out as one shard per
+    worker), otherwise on the train shards of stream_preprocess in shards_dir.
+    Each worker uses nthread threads; by default the machine's cores are
+    split between the workers.
+    """
+    print(f"Training XGBoost model on {n_workers} workers...")
+    if nthread is None:
+        nthread = max(1, (os.cpu_count() or 1) // n_workers)
+    params, num_boost_round = booster_params(nthread=nthread)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        if X_train is not None:
+            feature_names = list(X_train.columns)
+            paths = write_shards(X_train, y_train, n_workers, data_dir)
+            params.update(class_weight_params(y_train))
+        else:
+            manifest = load_manifest(shards_dir)
+            feature_names = manifest['feature_names']
+            paths = manifest_shard_paths(shards_dir)
+            # Stream shards are not resampled with SMOTE, so weight the fraud class instead
+            counts = manifest['class_counts']['train']
+            params['scale_pos_weight'] = counts.get('0', 0) / max(counts.get('1', 0), 1)
+
+        assignments = assign_shards(paths, n_workers)
+
+        start = time.perf_counter()
+        tracker = RabitTracker(n_workers=n_workers, host_ip=DIST_TRACKER_HOST, timeout=DIST_TIMEOUT)
+        tracker.start()
+        tracker_args = {**tracker.worker_args(), 'dmlc_timeout': DIST_TIMEOUT}
+        jobs = [(tracker_args, worker_paths, feature_names, params, num_boost_round)
+                for worker_paths in assignments]
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers, maxtasksperchild=1) as pool:
+            results = pool.starmap(train_worker, jobs)
+        tracker.wait_for()
+        wall_time = time.perf_counter() - start
+
+    worker_stats = [stats for stats, _ in results]
+    model_bytes = next(raw for _, raw in results if raw is not None)
+    model = booster_to_classifier(xgb.Booster(model_file=bytearray(model_bytes)))
+
+    stats = {
+        'workers': n_workers,
+        'rows': sum(s['rows'] for s in worker_stats),
+        'wall_s': wall_time,
+        # Workers train in lockstep, so the slowest one sets the pace
+        'load_s': max(s['load_s'] for s in worker_stats),
+        'train_s': max(s['train_s'] for s in worker_stats)
+    }
+    print(f"Model training complete! {stats['rows']} rows, {wall_time:.1f}s wall, "
+          f"{stats['train_s']:.1f}s boosting")
+    return model, stats
+
+def scaling_report(X_train, y_train, X_test=None, y_test=None, worker_counts=DIST_SCALING_WORKERS,
+                   nthread=DIST_SCALING_THREADS):
+    """Train with each worker count and report speedup and efficiency against the first
+
+    Every worker gets the same nthread threads, so each added worker brings
+    its own cores, as when workers run on separate nodes.
+    """
+    cpu_count = os.cpu_count() or 1
+    if max(worker_counts) * nthread > cpu_count:
+        print(f"Note: only {cpu_count} CPU(s) available, runs needing more than that share cores "
+              f"and cannot reach the ideal speedup")
+
+    rows = []
+    for n_workers in worker_counts:
+        model, stats = train_distributed(X_train, y_train, n_workers, nthread=nthread)
+        row = {'Workers': n_workers, 'Wall (s)': stats['wall_s'], 'Load (s)': stats['load_s'],
+               'Train (s)': stats['train_s']}
+        if X_test is not None:
+            row['ROC-AUC'] = ScoreCounts.from_scores(y_test, model.predict_proba(X_test)[:, 1]).roc_auc()
+        rows.append(row)
+
+    report = pd.DataFrame(rows)
+    base = report.iloc[0]
+    # Strong scaling: same data, cores grow with the workers, ideal speedup is n_workers / base workers
+    report['Speedup'] = base['Train (s)'] / report['Train (s)']
+    report['Efficiency'] = report['Speedup'] * base['Workers'] / report['Workers']
+
+    print("\nDistributed training scaling:")
+    print(report.to_string(index=False, float_format='%.3f'))
+    return report
+
+if __name__ == "__main__":
+    from preprocess import preprocess_pipeline
+    from train_model import save_model
+
+    parser = argparse.ArgumentParser(description='Distributed XGBoost training')
+    parser.add_argument('--workers', type=int, default=DIST_WORKERS)
+    parser.add_argument('--shards', action='store_true',
+                        help='Train on the stream_preprocess shards instead of the preprocessed dataset')
+    parser.add_argument('--scaling', action='store_true',
+                        help=f'Compare worker counts {DIST_SCALING_WORKERS} instead of saving a model')
+
+    args = parser.parse_args()
+    if args.shards:
+        model, _ = train_distributed(n_workers=args.workers)
+        save_model(model)
+    else:
+        X_train, X_test, y_train, y_test = preprocess_pipeline()
+        if args.scaling:
+            scaling_report(X_train, y_train, X_test, y_test)
+        else:
+            model, _ = train_distributed(X_train, y_train, args.workers)
+            save_model(model)
@@ -0,0 +1,177 @@
+"""
+Drift and data-quality monitoring for model features
+Every feature gets a fixed-bin histogram whose edges are quantiles of a
+reference snapshot taken at training time, plus null and out-of-range
+counters and the observed min/max. The state has a fixed size, so the
+monitor runs in constant memory over any stream, and two monitors with the
+same edges merge by adding counts (e.g. one per worker process).
+PSI and KS distance against the reference are computed from the bins.
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+from config import *
+
+DRIFT_REFERENCE_FILE = 'drift_reference.json'
+
+class DriftMonitor:
+    """Mergeable per-feature histograms and data-quality counters"""
+
+    def __init__(self, feature_names, edges):
+        self.feature_names = list(feature_names)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        # Bin 0 is below the reference minimum, the last bin above its maximum
+        self.counts = [np.zeros(max(len(e) - 1, 1) + 2, dtype=np.int64) for e in self.edges]
+        n_features = len(self.feature_names)
+        self.n_rows = 0
+        self.nulls = np.zeros(n_features, dtype=np.int64)
+        self.minimum = np.full(n_features, np.inf)
+        self.maximum = np.full(n_features, -np.inf)
+
+    @classmethod
+    def from_reference(cls, X, n_bins=DRIFT_BINS):
+        """Bin edges from the quantiles of reference data, with the reference counted in"""
+        columns = _columns(X)
+        edges = []
+        for values in columns.values():
+            values = values[~np.isnan(values)]
+            # Repeated quantiles (discrete or constant features) collapse into one edge
+            edges.append(np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1))))
+        return cls(columns.keys(), edges).update(X)
+
+    def empty_like(self):
+        """Monitor with the same bins and no counts, e.g. for a worker"""
+        return DriftMonitor(self.feature_names, self.edges)
+
+    def _bin(self, j, values):
+        """Bin index of every value; both reference extremes fall in the real bins"""
+        edges = self.edges[j]
+        bins = np.searchsorted(edges[1:-1], values, side='right') + 1
+        bins[values < edges[0]] = 0
+        bins[values > edges[-1]] = len(self.counts[j]) - 1
+        return bins
+
+    def update(self, X):
+        """Count a batch of rows (DataFrame or array in feature order)"""
+        columns = _columns(X, self.feature_names)
+        for j, name in enumerate(self.feature_names):
+            values = columns[name]
+            missing = np.isnan(values)
+            present = values[~missing] if missing.any() else values
+            self.nulls[j] += int(missing.sum())
+            if len(present):
+                self.minimum[j] = min(self.minimum[j], present.min())
+                self.maximum[j] = max(self.maximum[j], present.max())
+            self.counts[j] += np.bincount(self._bin(j, present), minlength=len(self.counts[j]))
+        self.n_rows += len(next(iter(columns.values()))) if columns else 0
+        return self
+
+    def merge(self, other):
+        """Add another monitor's counts into this one"""
+        if self.feature_names != other.feature_names or not all(
+                np.array_equal(a, b) for a, b in zip(self.edges, other.edges)):
+            raise ValueError("Cannot merge drift monitors with different features or bins")
+        for j in range(len(self.feature_names)):
+            self.counts[j] += other.counts[j]
+        self.n_rows += other.n_rows
+        self.nulls += other.nulls
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+        return self
+
+    def compare(self, reference, psi_alert=DRIFT_PSI_ALERT, ks_alert=DRIFT_KS_ALERT):
+        """Per-feature PSI, KS distance and data-quality rates against a reference monitor"""
+        rows = []
+        for j, name in enumerate(self.feature_names):
+            expected = _proportions(reference.counts[j])
+            actual = _proportions(self.counts[j])
+            counted = max(self.counts[j].sum(), 1)
+            psi = float(np.sum((actual - expected) * np.log(actual / expected)))
+            # KS on the binned CDFs: a lower bound of the exact statistic
+            ks = float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+            rows.append({
+                'feature': name,
+                'psi': psi,
+                'ks': ks,
+                'null_rate': self.nulls[j] / max(self.n_rows, 1),
+                'below_range_rate': self.counts[j][0] / counted,
+                'above_range_rate': self.counts[j][-1] / counted,
+                'min': self.minimum[j],
+                'max': self.maximum[j],
+                'drift': psi > psi_alert or ks > ks_alert
+            })
+        return pd.DataFrame(rows)
+
+    def to_dict(self):
+        return {
+            'feature_names': self.feature_names,
+            'edges': [e.tolist() for e in self.edges],
+            'counts': [c.tolist() for c in self.counts],
+            'n_rows': self.n_rows,
+            'nulls': self.nulls.tolist(),
+            'minimum': self.minimum.tolist(),
+            'maximum': self.maximum.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        monitor = cls(state['feature_names'], state['edges'])
+        monitor.counts = [np.asarray(c, dtype=np.int64) for c in state['counts']]
+        monitor.n_rows = state['n_rows']
+        monitor.nulls = np.asarray(state['nulls'], dtype=np.int64)
+        monitor.minimum = np.asarray(state['minimum'], dtype=np.float64)
+        monitor.maximum = np.asarray(state['maximum'], dtype=np.float64)
+        return monitor
+
+def _columns(X, feature_names=None):
+    """Feature name -> float64 column array"""
+    if hasattr(X, 'columns'):
+        names = feature_names if feature_names is not None else list(X.columns)
+        return {name: X[name].to_numpy(dtype=np.float64) for name in names}
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    names = feature_names if feature_names is not None else [f'f{j}' for j in range(X.shape[1])]
+    return {name: X[:, j] for j, name in enumerate(names)}
+
+def _proportions(counts, epsilon=1e-6):
+    """Bin proportions, floored so empty bins do not make PSI infinite"""
+    p = counts / max(counts.sum(), 1)
+    return np.maximum(p, epsilon)
+
+def save_reference(monitor, filename=DRIFT_REFERENCE_FILE):
+    """Store the training-time snapshot next to the model"""
+    os.makedirs(MODELS_PATH, exist_ok=True)
+    filepath = os.path.join(MODELS_PATH, filename)
+    with open(filepath, 'w') as f:
+        json.dump(monitor.to_dict(), f)
+    print(f"Drift reference saved to {filepath}")
+
+def load_reference(filename=DRIFT_REFERENCE_FILE):
+    filepath = os.path.join(MODELS_PATH, filename)
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Drift reference not found at {filepath}")
+    with open(filepath) as f:
+        return DriftMonitor.from_dict(json.load(f))
+
+def print_drift_report(report):
+    drifted = report[report['drift']]
+    print(f"\nDrift report: {len(drifted)} of {len(report)} features drifted")
+    print(report.to_string(index=False, float_format='%.4f'))
+
+if __name__ == "__main__":
+    from batch_score import read_chunks
+    from preprocess import FeatureTransformer
+
+    parser = argparse.ArgumentParser(description='Check a file of transactions for drift against the training data')
+    parser.add_argument('input', type=str, help='CSV or Parquet file of transactions')
+    parser.add_argument('--chunk-size', type=int, default=SCORE_CHUNK_SIZE)
+
+    args = parser.parse_args()
+    reference = load_reference()
+    transformer = FeatureTransformer.from_feature_names(reference.feature_names)
+    monitor = reference.empty_like()
+    for chunk in read_chunks(args.input, args.chunk_size):
+        monitor.update(transformer.transform_frame(chunk))
+    print_drift_report(monitor.compare(reference))
@@ -1,35 +1,23 @@
 """
 Model evaluation module for fraud detection
-Generates metrics, confusion matrix, and ROC curve
+Generates metrics, confusion matrix, ROC and precision-recall curves
 """
 
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, 
-    f1_score, roc_auc_score, confusion_matrix, 
-    classification_report, roc_curve
-)
-import os
+from metrics import ScoreCounts, confusion_matrix, classification_report
+from report import decimate_curve, plot_figure, generate_figures
+from instrument import instrumented
 from config import *
 
-def evaluate_model(model, X_test, y_test):
-    """Evaluate model and return metrics"""
-    print("Evaluating model...")
-    
-    # Predictions
-    y_pred = model.predict(X_test)
-    y_pred_proba = model.predict_proba(X_test)[:, 1]
-    
-    # Calculate metrics
-    metrics = {
-        'accuracy': accuracy_score(y_test, y_pred),
-        'precision': precision_score(y_test, y_pred),
-        'recall': recall_score(y_test, y_pred),
-        'f1': f1_score(y_test, y_pred),
-        'roc_auc': roc_auc_score(y_test, y_pred_proba)
-    }
+def score_metrics(y_test, y_pred_proba, threshold=FRAUD_THRESHOLD):
+    """Print and return the metrics at threshold, plus the ScoreCounts they were read from"""
+    # One sort of the scores gives every metric, curve and the confusion matrix
+    counts = ScoreCounts.from_scores(y_test, y_pred_proba)
+    metrics = counts.metrics(threshold)
     
     # Print metrics
     print("\n" + "="*50)
@@ -41,32 +29,32 @@ def evaluate_model(model, X_test, y_test):
     
     # Classification report
     print("\nClassification Report:")
-    print(classification_report(y_test, y_pred))
+    print(classification_report(counts.confusion_matrix(threshold)))
     
-    return metrics, y_pred, y_pred_proba
+    return metrics, counts
 
-def plot_confusion_matrix(y_test, y_pred, save=True):
-    """Plot confusion matrix"""
-    cm = confusion_matrix(y_test, y_pred)
+@instrumented(rows_arg=1)
+def evaluate_model(model, X_test, y_test, threshold=FRAUD_THRESHOLD):
+    """Evaluate model and return metrics"""
+    print("Evaluating model...")
     
+    # Predictions (one predict_proba pass, flagged at the given threshold)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    y_pred = (y_pred_proba >= threshold).astype(int)
+    
+    metrics, _ = score_metrics(y_test, y_pred_proba, threshold)
+    return metrics, y_pred, y_pred_proba
+
+def draw_confusion_matrix(cm):
+    """Draw a confusion matrix"""
     plt.figure(figsize=FIGURE_SIZE)
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', cbar=True)
     plt.title('Confusion Matrix')
     plt.ylabel('True Label')
     plt.xlabel('Predicted Label')
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'confusion_matrix.png'))
-        print(f"Confusion matrix saved to {PLOTS_PATH}")
-    
-    plt.show()
 
-def plot_roc_curve(y_test, y_pred_proba, save=True):
-    """Plot ROC curve"""
-    fpr, tpr, thresholds = roc_curve(y_test, y_pred_proba)
-    roc_auc = roc_auc_score(y_test, y_pred_proba)
-    
+def draw_roc_curve(fpr, tpr, roc_auc):
+    """Draw a ROC curve"""
     plt.figure(figsize=FIGURE_SIZE)
     plt.plot(fpr, tpr, color='darkorange', lw=2, 
              label=f'ROC curve (AUC = {roc_auc:.4f})')
@@ -78,24 +66,75 @@ def plot_roc_curve(y_test, y_pred_proba, save=True):
     plt.title('Receiver Operating Characteristic (ROC) Curve')
     plt.legend(loc="lower right")
     plt.grid(True, alpha=0.3)
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'roc_curve.png'))
-        print(f"ROC curve saved to {PLOTS_PATH}")
-    
-    plt.show()
 
-def full_evaluation(model, X_test, y_test):
+def draw_pr_curve(recall, precision, average_precision):
+    """Draw a precision-recall curve"""
+    plt.figure(figsize=FIGURE_SIZE)
+    plt.plot(recall, precision, color='darkorange', lw=2,
+             label=f'PR curve (AP = {average_precision:.4f})')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.title('Precision-Recall Curve')
+    plt.legend(loc="lower left")
+    plt.grid(True, alpha=0.3)
+
+def confusion_matrix_figure(y_test, y_pred):
+    return 'confusion_matrix.png', draw_confusion_matrix, {'cm': confusion_matrix(y_test, y_pred)}
+
+def roc_curve_figure(y_test, y_pred_proba, max_points=PLOT_MAX_POINTS, counts=None):
+    """ROC curve figure, decimated to max_points"""
+    if counts is None:
+        counts = ScoreCounts.from_scores(y_test, y_pred_proba)
+    fpr, tpr, _ = counts.roc_curve()
+    fpr, tpr = decimate_curve(fpr, tpr, max_points)
+    return 'roc_curve.png', draw_roc_curve, {
+        'fpr': fpr, 'tpr': tpr, 'roc_auc': counts.roc_auc()
+    }
+
+def pr_curve_figure(y_test, y_pred_proba, max_points=PLOT_MAX_POINTS, counts=None):
+    """Precision-recall curve figure, decimated to max_points"""
+    if counts is None:
+        counts = ScoreCounts.from_scores(y_test, y_pred_proba)
+    recall, precision, _ = counts.pr_curve()
+    recall, precision = decimate_curve(recall, precision, max_points)
+    return 'pr_curve.png', draw_pr_curve, {
+        'recall': recall, 'precision': precision,
+        'average_precision': counts.average_precision()
+    }
+
+def evaluation_figures(y_test, y_pred, y_pred_proba, counts=None):
+    """Every evaluation figure, ready for report.generate_figures"""
+    # Both curves come from the same sorted counts
+    if counts is None:
+        counts = ScoreCounts.from_scores(y_test, y_pred_proba)
+    return [
+        confusion_matrix_figure(y_test, y_pred),
+        roc_curve_figure(y_test, y_pred_proba, counts=counts),
+        pr_curve_figure(y_test, y_pred_proba, counts=counts)
+    ]
+
+def plot_confusion_matrix(y_test, y_pred, save=True):
+    """Plot confusion matrix"""
+    plot_figure(confusion_matrix_figure(y_test, y_pred), save)
+
+def plot_roc_curve(y_test, y_pred_proba, save=True):
+    """Plot ROC curve"""
+    plot_figure(roc_curve_figure(y_test, y_pred_proba), save)
+
+@instrumented(rows_arg=1)
+def full_evaluation(model, X_test, y_test, threshold=FRAUD_THRESHOLD):
     """Complete evaluation pipeline"""
-    # Evaluate metrics
-    metrics, y_pred, y_pred_proba = evaluate_model(model, X_test, y_test)
+    print("Evaluating model...")
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    y_pred = (y_pred_proba >= threshold).astype(int)
     
-    # Plot confusion matrix
-    plot_confusion_matrix(y_test, y_pred)
+    # Evaluate metrics
+    metrics, counts = score_metrics(y_test, y_pred_proba, threshold)
     
-    # Plot ROC curve
-    plot_roc_curve(y_test, y_pred_proba)
+    # Render confusion matrix, ROC and PR curves in parallel, skipping unchanged ones
+    generate_figures(evaluation_figures(y_test, y_pred, y_pred_proba, counts))
     
     return metrics
 
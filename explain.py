@@ -0,0 +1,107 @@
+"""
+Per-transaction reason codes for flagged scores
+Feature contributions come from XGBoost's native pred_contribs (TreeSHAP)
+and are only computed for rows at or above the alert threshold, in one
+batch. Explanations of repeated feature vectors are served from an LRU
+cache, and the top-k features are picked for all rows at once.
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import xgboost as xgb
+from config import *
+
+def top_reasons(contributions, feature_names, k=EXPLAIN_TOP_K):
+    """The k features pushing each row hardest towards fraud, as (name, contribution) lists
+
+    contributions has one column per feature (no bias column). Only positive
+    contributions count as reasons, so a row can get fewer than k.
+    """
+    contributions = np.atleast_2d(contributions)
+    k = min(k, contributions.shape[1])
+    if k == 0:
+        return [[] for _ in range(len(contributions))]
+
+    # argpartition finds the k largest in O(n_features), then only those k are sorted
+    top = np.argpartition(-contributions, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(contributions, top, axis=1)
+    order = np.argsort(-values, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+
+    return [[(feature_names[j], float(v)) for j, v in zip(row_top, row_values) if v > 0]
+            for row_top, row_values in zip(top, values)]
+
+def format_reasons(reasons):
+    """Reason list as a compact string, e.g. 'V14:+2.310;V4:+1.102'"""
+    return ';'.join(f'{name}:{value:+.3f}' for name, value in reasons)
+
+class Explainer:
+    """Reason codes for flagged transactions of an XGBoost model"""
+
+    def __init__(self, model, k=EXPLAIN_TOP_K, cache_size=EXPLAIN_CACHE_SIZE, approx=EXPLAIN_APPROX):
+        self.model = model
+        self.k = k
+        self.cache_size = cache_size
+        self.approx = approx
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._cached_booster = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def booster(self):
+        # Looked up on every call, so a hot-swapped model is explained by its own trees
+        model = getattr(self.model, 'model', self.model)
+        if isinstance(model, xgb.Booster):
+            return model
+        if hasattr(model, 'get_booster'):
+            return model.get_booster()
+        raise ValueError("Explanations need an XGBoost model, compiled models have no pred_contribs")
+
+    def contributions(self, X, booster=None):
+        """Per-feature contributions to the log-odds (bias column dropped)"""
+        booster = self.booster if booster is None else booster
+        dmatrix = xgb.DMatrix(np.asarray(X, dtype=np.float32), feature_names=booster.feature_names)
+        contribs = booster.predict(dmatrix, pred_contribs=True, approx_contribs=self.approx)
+        return contribs[:, :-1]
+
+    def explain(self, X, proba, threshold=FRAUD_THRESHOLD):
+        """Reasons for every row with proba >= threshold, None for the others"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        reasons = [None] * len(X)
+        flagged = np.flatnonzero(np.asarray(proba) >= threshold)
+        if len(flagged) == 0:
+            return reasons
+
+        booster = self.booster
+        keys = {i: X[i].tobytes() for i in flagged}
+        missing = []
+        with self._lock:
+            if booster is not self._cached_booster:
+                # New model version: explanations of the old one no longer apply
+                self._cache.clear()
+                self._cached_booster = booster
+            for i in flagged:
+                cached = self._cache.get(keys[i])
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(keys[i])
+                    reasons[i] = cached
+            self.hits += len(flagged) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            names = booster.feature_names or [f'f{j}' for j in range(X.shape[1])]
+            computed = top_reasons(self.contributions(X[missing], booster), names, self.k)
+            with self._lock:
+                for i, row_reasons in zip(missing, computed):
+                    reasons[i] = row_reasons
+                    self._cache[keys[i]] = row_reasons
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return reasons
@@ -8,15 +8,15 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import os
-from train_model import train_and_save
+from train_model import load_model
 from config import *
 
-def plot_feature_importance(model, X_train, save=True):
+def plot_feature_importance(model, X_train=None, save=True):
     """Plot feature importance from trained model"""
     
     # Get feature importance
     importance = model.feature_importances_
-    feature_names = X_train.columns
+    feature_names = X_train.columns if X_train is not None else model.feature_names_in_
     
     # Create dataframe
     importance_df = pd.DataFrame({
@@ -55,14 +55,8 @@ if __name__ == "__main__":
     print("GENERATING FEATURE IMPORTANCE VISUALIZATION")
     print("="*60 + "\n")
     
-    # Train model and get data
-    model, X_test, y_test = train_and_save()
-    
-    # We need X_train for feature names
-    from preprocess import preprocess_pipeline
-    X_train, _, _, _ = preprocess_pipeline()
-    
-    # Plot importance
-    importance_df = plot_feature_importance(model, X_train)
+    # Use the saved model instead of retraining; per-transaction reasons are in explain.py
+    model = load_model()
+    importance_df = plot_feature_importance(model)
     
     print("\nFeature importance analysis complete!")
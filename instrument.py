@@ -0,0 +1,197 @@
+"""
+Run instrumentation for the pipeline stages
+Stages are functions wrapped with @instrumented (or blocks wrapped with
+`with stage(...)`). Each records wall and CPU time, peak RSS and row count,
+nested under the stage that called it. Chosen stages can run under cProfile
+or tracemalloc, and the whole run is written out as a JSON report. Only the
+last INSTRUMENT_MAX_RECORDS stages are kept, so long-running processes such
+as the scoring service do not grow without bound.
+"""
+
+import cProfile
+import functools
+import inspect
+import itertools
+import json
+import os
+import platform
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import *
+
+_records = deque(maxlen=INSTRUMENT_MAX_RECORDS)
+_counts = {'recorded': 0}
+_profile_ids = itertools.count(1)
+_lock = threading.Lock()
+_local = threading.local()
+_settings = {'profile': set(PROFILE_STAGES), 'trace_memory': set(TRACE_MEMORY_STAGES)}
+_started = datetime.now(timezone.utc)
+
+def configure(profile=None, trace_memory=None):
+    """Choose the stages that run under cProfile and tracemalloc"""
+    if profile is not None:
+        _settings['profile'] = set(profile)
+    if trace_memory is not None:
+        _settings['trace_memory'] = set(trace_memory)
+
+def reset():
+    """Forget the stages recorded so far and start a new run"""
+    global _started
+    with _lock:
+        _records.clear()
+        _counts['recorded'] = 0
+    _started = datetime.now(timezone.utc)
+
+def records():
+    with _lock:
+        return list(_records)
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def count_rows(value):
+    """Rows in a DataFrame/array, or in the first element of a tuple of them"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+def _top_functions(profiler, limit=20):
+    """Functions with the most cumulative time in a profile"""
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{'function': f'{os.path.basename(filename)}:{line}({function})',
+             'calls': calls, 'cumulative_s': cumulative}
+            for (filename, line, function), (_, calls, _, cumulative, _) in top]
+
+@contextmanager
+def stage(name, rows=None, verbose=None):
+    """Record one stage; yields a dict whose 'rows' may be set inside the block
+
+    The timing line is printed when verbose, which defaults to the enclosing
+    stage's setting (INSTRUMENT_VERBOSE at the top level), so a quiet stage
+    keeps the stages it calls quiet too.
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    if verbose is None:
+        verbose = stack[-1]['_verbose'] if stack else INSTRUMENT_VERBOSE
+    record = {'stage': name, 'parent': stack[-1]['stage'] if stack else None,
+              'depth': len(stack), 'rows': rows, '_verbose': verbose and INSTRUMENT_VERBOSE}
+    stack.append(record)
+
+    # cProfile cannot nest, so only the outermost profiled stage is profiled
+    profiler = None
+    if name in _settings['profile'] and not getattr(_local, 'profiling', False):
+        profiler = cProfile.Profile()
+        _local.profiling = True
+    trace = name in _settings['trace_memory'] and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _local.profiling = False
+            os.makedirs(REPORTS_PATH, exist_ok=True)
+            # One file per profiled call, so repeated stages do not overwrite each other
+            run_id = _started.strftime('%Y%m%dT%H%M%S')
+            profile_path = os.path.join(REPORTS_PATH, f'{name}_{run_id}_{next(_profile_ids):04d}.prof')
+            profiler.dump_stats(profile_path)
+            record['profile'] = {'file': profile_path, 'top': _top_functions(profiler)}
+
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.process_time() - cpu_start
+        record['peak_rss_mb'] = peak_rss_mb()
+        if record['rows']:
+            record['rows_per_s'] = record['rows'] / record['wall_s'] if record['wall_s'] > 0 else None
+
+        if trace:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            record['memory'] = {
+                'traced_peak_mb': peak / 1024 ** 2,
+                'top': [{'location': str(stat.traceback), 'size_mb': stat.size / 1024 ** 2}
+                        for stat in snapshot.statistics('lineno')[:10]]
+            }
+
+        stack.pop()
+        verbose = record.pop('_verbose')
+        with _lock:
+            _records.append(record)
+            _counts['recorded'] += 1
+
+        if verbose:
+            rows_text = f", {record['rows']} rows" if record['rows'] else ""
+            print(f"[{name}] {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU{rows_text}, "
+                  f"peak RSS {record['peak_rss_mb']:.0f} MB")
+
+def instrumented(name=None, rows_arg=0):
+    """Decorator recording a function as a stage
+
+    Rows are counted from the result when it is a DataFrame/array (or a tuple
+    starting with one), otherwise from positional argument rows_arg. A
+    function with a `verbose` argument prints its timing line only when it
+    is called with verbose true.
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+        signature = inspect.signature(func)
+        has_verbose = 'verbose' in signature.parameters
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows = count_rows(args[rows_arg]) if len(args) > rows_arg else None
+            verbose = None
+            if has_verbose:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                # Only ever silences: a verbose call still follows the enclosing stage
+                verbose = None if bound.arguments['verbose'] else False
+            with stage(stage_name, rows, verbose) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = count_rows(result) or record['rows']
+            return result
+        return wrapper
+    return decorate
+
+def run_report():
+    """The recorded stages plus run metadata, in the order the stages finished"""
+    return {
+        'started': _started.isoformat(),
+        'argv': sys.argv,
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(),
+                        'cpu_count': os.cpu_count()},
+        'peak_rss_mb': peak_rss_mb(),
+        # Stages beyond INSTRUMENT_MAX_RECORDS dropped out of the report, oldest first
+        'dropped_stages': _counts['recorded'] - len(_records),
+        'stages': records()
+    }
+
+def write_report(filepath=None):
+    """Write the run report as JSON (default: reports/run_<start time>.json)"""
+    if filepath is None:
+        filepath = os.path.join(REPORTS_PATH, f"run_{_started.strftime('%Y%m%dT%H%M%S')}.json")
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w') as f:
+        json.dump(run_report(), f, indent=2, default=str)
+    print(f"Run report saved to {filepath}")
+    return filepath
@@ -4,11 +4,40 @@ Complete end-to-end pipeline
 """
 
 import argparse
-from preprocess import preprocess_pipeline
-from train_model import train_xgboost, save_model, load_model
+import os
+from preprocess import preprocess_pipeline, calibrated_preprocess_pipeline, load_data, feature_engineering, FeatureTransformer
+from stream_preprocess import stream_preprocess, load_split, load_manifest
+from train_model import train_xgboost, train_xgboost_external_memory, save_model, load_model
+from distributed_train import train_distributed
+from native_model import export_native, export_compiled
 from evaluate import full_evaluation
+from tune import tune_pipeline, load_tuned_params
+from model_registry import register_model, incremental_update, split_update_batch
+from threshold import optimise_threshold, save_threshold, load_threshold
+from cross_validate import cv_pipeline
+from cascade import cascade_pipeline
+from batch_score import batch_score
+from drift_monitor import DriftMonitor, save_reference
+from instrument import instrumented, stage, configure, write_report
 from config import *
 
+def save_model_artifacts(model, X_test):
+    """Save the model with everything serving needs: transformer, native and compiled exports, drift reference"""
+    save_model(model)
+    FeatureTransformer.from_feature_names(X_test.columns).save()
+    export_native(model)
+    export_compiled(model)
+    # Drift reference from the held-out split: the training split contains synthetic SMOTE rows
+    save_reference(DriftMonitor.from_reference(X_test))
+
+def select_operating_point(model, X_cal, y_cal, metadata):
+    """Choose the threshold on the calibration split, save it with the model and register both"""
+    point = optimise_threshold(y_cal, model.predict_proba(X_cal)[:, 1])
+    save_threshold(point)
+    register_model(model, metadata, threshold=point)
+    return point
+
+@instrumented()
 def train_pipeline():
     """Run complete training pipeline"""
     print("\n" + "="*60)
@@ -17,19 +46,60 @@ def train_pipeline():
     
     # Step 1: Preprocess data
     print("Step 1: Data Preprocessing")
-    X_train, X_test, y_train, y_test = preprocess_pipeline()
+    X_train, X_cal, X_test, y_train, y_cal, y_test = calibrated_preprocess_pipeline()
     
     # Step 2: Train model
     print("\nStep 2: Model Training")
-    model = train_xgboost(X_train, y_train)
+    params = load_tuned_params() if USE_TUNED_PARAMS else None
+    model = train_xgboost(X_train, y_train, params)
     
-    # Step 3: Save model
+    # Step 3: Save model (pickle, native booster and compiled arrays for scoring workers)
     print("\nStep 3: Saving Model")
-    save_model(model)
+    save_model_artifacts(model, X_test)
+    
+    # Step 4: Pick the operating point on the calibration split, so the test metrics stay unbiased
+    print("\nStep 4: Threshold Selection")
+    point = select_operating_point(model, X_cal, y_cal, {'mode': 'full', 'train_rows': len(X_train)})
+    
+    # Step 5: Evaluate model at that operating point
+    print("\nStep 5: Model Evaluation")
+    metrics = full_evaluation(model, X_test, y_test, point['threshold'])
+    
+    print("\n" + "="*60)
+    print("PIPELINE COMPLETE!")
+    print("="*60)
+    
+    return model, metrics
+
+@instrumented()
+def train_stream_pipeline():
+    """Run training pipeline out-of-core: chunked preprocessing to shards, external-memory training"""
+    print("\n" + "="*60)
+    print("FRAUD DETECTION - OUT-OF-CORE TRAINING PIPELINE")
+    print("="*60 + "\n")
     
-    # Step 4: Evaluate model
-    print("\nStep 4: Model Evaluation")
-    metrics = full_evaluation(model, X_test, y_test)
+    # Step 1: Stream data to shards
+    print("Step 1: Streaming Preprocessing")
+    stream_preprocess()
+    
+    # Step 2: Train model from shards
+    print("\nStep 2: Model Training (external memory)")
+    model = train_xgboost_external_memory()
+    
+    # Step 3: Save model (pickle, native booster and compiled arrays for scoring workers)
+    print("\nStep 3: Saving Model")
+    X_test, y_test = load_split('test')
+    save_model_artifacts(model, X_test)
+    
+    # Step 4: Pick the operating point on the calibration shards
+    print("\nStep 4: Threshold Selection")
+    X_cal, y_cal = load_split('calibration')
+    train_rows = sum(shard['rows'] for shard in load_manifest()['shards']['train'])
+    point = select_operating_point(model, X_cal, y_cal, {'mode': 'stream', 'train_rows': train_rows})
+    
+    # Step 5: Evaluate model on the test shards
+    print("\nStep 5: Model Evaluation")
+    metrics = full_evaluation(model, X_test, y_test, point['threshold'])
     
     print("\n" + "="*60)
     print("PIPELINE COMPLETE!")
@@ -37,6 +107,59 @@ def train_pipeline():
     
     return model, metrics
 
+@instrumented()
+def train_distributed_pipeline(n_workers=DIST_WORKERS):
+    """Run training pipeline with the training set sharded across worker processes"""
+    print("\n" + "="*60)
+    print("FRAUD DETECTION - DISTRIBUTED TRAINING PIPELINE")
+    print("="*60 + "\n")
+    
+    # Step 1: Preprocess data
+    print("Step 1: Data Preprocessing")
+    X_train, X_cal, X_test, y_train, y_cal, y_test = calibrated_preprocess_pipeline()
+    
+    # Step 2: Train model, one shard per worker
+    print(f"\nStep 2: Model Training ({n_workers} workers)")
+    model, _ = train_distributed(X_train, y_train, n_workers)
+    
+    # Step 3: Save model (pickle, native booster and compiled arrays for scoring workers)
+    print("\nStep 3: Saving Model")
+    save_model_artifacts(model, X_test)
+    
+    # Step 4: Pick the operating point on the calibration split
+    print("\nStep 4: Threshold Selection")
+    point = select_operating_point(model, X_cal, y_cal,
+                                   {'mode': 'distributed', 'workers': n_workers, 'train_rows': len(X_train)})
+    
+    # Step 5: Evaluate model at that operating point
+    print("\nStep 5: Model Evaluation")
+    metrics = full_evaluation(model, X_test, y_test, point['threshold'])
+    
+    print("\n" + "="*60)
+    print("PIPELINE COMPLETE!")
+    print("="*60)
+    
+    return model, metrics
+
+@instrumented()
+def update_pipeline(batch_path):
+    """Warm-start the registered model on a new labelled batch"""
+    print("\n" + "="*60)
+    print("FRAUD DETECTION - INCREMENTAL UPDATE")
+    print("="*60 + "\n")
+    
+    df = feature_engineering(load_data(batch_path, use_cache=False))
+    # Part of the batch is held out to choose the updated version's threshold
+    X_fit, X_cal, y_fit, y_cal = split_update_batch(df.drop(TARGET_COLUMN, axis=1), df[TARGET_COLUMN])
+    version = incremental_update(X_fit, y_fit, X_cal=X_cal, y_cal=y_cal)
+    
+    print("\n" + "="*60)
+    print(f"UPDATE COMPLETE! Serving version is now {version}")
+    print("="*60)
+    
+    return version
+
+@instrumented()
 def predict_pipeline(model_path='fraud_detection_model.pkl'):
     """Run prediction pipeline on test data"""
     print("\n" + "="*60)
@@ -51,9 +174,9 @@ def predict_pipeline(model_path='fraud_detection_model.pkl'):
     print("\nPreprocessing data...")
     X_train, X_test, y_train, y_test = preprocess_pipeline()
     
-    # Evaluate
+    # Evaluate at the saved operating point
     print("\nEvaluating model...")
-    metrics = full_evaluation(model, X_test, y_test)
+    metrics = full_evaluation(model, X_test, y_test, load_threshold())
     
     print("\n" + "="*60)
     print("PREDICTION COMPLETE!")
@@ -69,13 +192,80 @@ if __name__ == "__main__":
         '--mode',
         type=str,
         default='train',
-        choices=['train', 'predict'],
-        help='Mode: train (train new model) or predict (use existing model)'
+        choices=['train', 'train-stream', 'train-distributed', 'tune', 'cv', 'cascade', 'update', 'predict',
+                 'score'],
+        help='Mode: train (train new model), train-stream (out-of-core training '
+             'from shards), train-distributed (training sharded across DIST_WORKERS '
+             'processes), tune (hyperparameter search), cv (k-fold cross-validation), '
+             'cascade (calibrate a cheap screen in front of the trained model), '
+             'update (add a new labelled batch to the registered model), predict '
+             '(use existing model) or score (score a new file of transactions)'
+    )
+    parser.add_argument(
+        '--data',
+        type=str,
+        default=None,
+        help='Input CSV for update mode, input CSV or Parquet for score mode'
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        default=None,
+        help='Output file for score mode (default: <input>_scores.csv)'
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        default='fraud_detection_model.pkl',
+        help='Model used in score mode (.pkl, compiled .npz, or "registry")'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='+',
+        default=None,
+        metavar='STAGE',
+        help='Stages to run under cProfile, e.g. apply_smote train_xgboost'
+    )
+    parser.add_argument(
+        '--trace-memory',
+        nargs='+',
+        default=None,
+        metavar='STAGE',
+        help='Stages to run under tracemalloc'
+    )
+    parser.add_argument(
+        '--report',
+        type=str,
+        default=None,
+        help='Run report JSON path (default: reports/run_<start time>.json)'
     )
     
     args = parser.parse_args()
+    configure(profile=args.profile, trace_memory=args.trace_memory)
     
     if args.mode == 'train':
         train_pipeline()
+    elif args.mode == 'train-stream':
+        train_stream_pipeline()
+    elif args.mode == 'train-distributed':
+        train_distributed_pipeline()
+    elif args.mode == 'tune':
+        tune_pipeline()
+    elif args.mode == 'cv':
+        cv_pipeline()
+    elif args.mode == 'cascade':
+        cascade_pipeline()
+    elif args.mode == 'update':
+        if args.data is None:
+            parser.error('--data is required in update mode')
+        update_pipeline(args.data)
     elif args.mode == 'predict':
-        predict_pipeline()
\ No newline at end of file
+        predict_pipeline()
+    elif args.mode == 'score':
+        if args.data is None:
+            parser.error('--data is required in score mode')
+        output = args.output or os.path.splitext(args.data)[0] + '_scores.csv'
+        with stage('batch_score') as record:
+            record['rows'] = batch_score(args.data, output, args.model)['rows']
+    
+    write_report(args.report)
\ No newline at end of file
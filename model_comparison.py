@@ -10,61 +10,126 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 import os
+import multiprocessing
+import tempfile
+import time
+from threadpoolctl import threadpool_limits
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 import xgboost as xgb
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 from preprocess import preprocess_pipeline
+from train_model import class_weight_params
+from report import plot_figure, generate_figures
+from instrument import instrumented, peak_rss_mb
+from metrics import ScoreCounts
 from config import *
 
-def train_and_evaluate_models(X_train, X_test, y_train, y_test):
-    """Train and evaluate multiple models"""
-    
-    models = {
-        'XGBoost': xgb.XGBClassifier(**XGBOOST_PARAMS),
-        'Random Forest': RandomForestClassifier(
+MODEL_NAMES = ['XGBoost', 'Random Forest', 'Logistic Regression']
+TIMING_COLUMNS = ['Fit Time (s)', 'Predict Time (s)', 'Peak RSS (MB)']
+
+def make_model(name, n_jobs=-1, y_train=None):
+    """Build a candidate model with an explicit thread budget
+
+    With y_train, XGBoost gets the same class weight train_xgboost would use.
+    """
+    if name == 'XGBoost':
+        weights = class_weight_params(y_train) if y_train is not None else {}
+        return xgb.XGBClassifier(**XGBOOST_PARAMS, **weights, n_jobs=n_jobs)
+    if name == 'Random Forest':
+        return RandomForestClassifier(
             n_estimators=100, 
             max_depth=6, 
             random_state=RANDOM_STATE,
-            n_jobs=-1
-        ),
-        'Logistic Regression': LogisticRegression(
+            n_jobs=n_jobs
+        )
+    if name == 'Logistic Regression':
+        # lbfgs is single-threaded apart from BLAS, which threadpool_limits caps
+        return LogisticRegression(
             max_iter=1000, 
-            random_state=RANDOM_STATE,
-            n_jobs=-1
+            random_state=RANDOM_STATE
         )
-    }
-    
-    results = []
-    
-    for name, model in models.items():
-        print(f"\nTraining {name}...")
-        
-        # Train
+    raise ValueError(f"Unknown model: {name}")
+
+@instrumented(rows_arg=1)
+def fit_and_score(name, X_train, X_test, y_train, y_test, n_jobs=-1):
+    """Train one candidate and return its metrics, timings and peak memory"""
+    model = make_model(name, n_jobs, y_train)
+
+    # Keep BLAS/OpenMP inside the model's thread budget too
+    with threadpool_limits(limits=None if n_jobs == -1 else n_jobs):
+        start = time.perf_counter()
         model.fit(X_train, y_train)
-        
-        # Predict
-        y_pred = model.predict(X_test)
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
         y_pred_proba = model.predict_proba(X_test)[:, 1]
-        
-        # Calculate metrics
-        metrics = {
-            'Model': name,
-            'Accuracy': accuracy_score(y_test, y_pred),
-            'Precision': precision_score(y_test, y_pred),
-            'Recall': recall_score(y_test, y_pred),
-            'F1-Score': f1_score(y_test, y_pred),
-            'ROC-AUC': roc_auc_score(y_test, y_pred_proba)
-        }
-        
-        results.append(metrics)
-        
-        print(f"{name} - Accuracy: {metrics['Accuracy']:.4f}, Recall: {metrics['Recall']:.4f}")
+        predict_time = time.perf_counter() - start
+
+    metrics = ScoreCounts.from_scores(y_test, y_pred_proba).metrics(threshold=0.5)
+
+    return {
+        'Model': name,
+        'Accuracy': metrics['accuracy'],
+        'Precision': metrics['precision'],
+        'Recall': metrics['recall'],
+        'F1-Score': metrics['f1'],
+        'ROC-AUC': metrics['roc_auc'],
+        'Fit Time (s)': fit_time,
+        'Predict Time (s)': predict_time,
+        'Peak RSS (MB)': peak_rss_mb()
+    }
+
+def share_data(data_dir, X_train, X_test, y_train, y_test):
+    """Write the matrices once as .npy files so workers can memory-map them"""
+    np.save(os.path.join(data_dir, 'X_train.npy'), np.ascontiguousarray(X_train))
+    np.save(os.path.join(data_dir, 'X_test.npy'), np.ascontiguousarray(X_test))
+    np.save(os.path.join(data_dir, 'y_train.npy'), np.asarray(y_train))
+    np.save(os.path.join(data_dir, 'y_test.npy'), np.asarray(y_test))
+
+def _run_shared(name, data_dir, feature_names, n_jobs):
+    """Worker entry point: memory-map the shared matrices and evaluate one model"""
+    def load(filename):
+        return np.load(os.path.join(data_dir, filename), mmap_mode='r')
+
+    X_train = pd.DataFrame(load('X_train.npy'), columns=feature_names, copy=False)
+    X_test = pd.DataFrame(load('X_test.npy'), columns=feature_names, copy=False)
+    return fit_and_score(name, X_train, X_test, load('y_train.npy'), load('y_test.npy'), n_jobs)
+
+@instrumented()
+def train_and_evaluate_models(X_train, X_test, y_train, y_test, n_workers=COMPARISON_WORKERS):
+    """Train and evaluate multiple models, concurrently when n_workers > 1"""
+    n_workers = min(n_workers, len(MODEL_NAMES))
+
+    if n_workers <= 1:
+        results = []
+        for name in MODEL_NAMES:
+            print(f"\nTraining {name}...")
+            metrics = fit_and_score(name, X_train, X_test, y_train, y_test)
+            results.append(metrics)
+            print(f"{name} - Accuracy: {metrics['Accuracy']:.4f}, Recall: {metrics['Recall']:.4f}")
+        return pd.DataFrame(results)
+
+    # Split the cores between concurrent jobs so models do not oversubscribe the machine
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+    print(f"\nTraining {len(MODEL_NAMES)} models in {n_workers} processes, {n_jobs} threads each...")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        share_data(data_dir, X_train, X_test, y_train, y_test)
+        jobs = [(name, data_dir, list(X_train.columns), n_jobs) for name in MODEL_NAMES]
+
+        # One task per child, so each reported peak RSS belongs to a single model
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers, maxtasksperchild=1) as pool:
+            results = pool.starmap(_run_shared, jobs)
+
+    for metrics in results:
+        print(f"{metrics['Model']} - Accuracy: {metrics['Accuracy']:.4f}, Recall: {metrics['Recall']:.4f}, "
+              f"fit {metrics['Fit Time (s)']:.1f}s, peak RSS {metrics['Peak RSS (MB)']:.0f} MB")
     
     return pd.DataFrame(results)
 
-def plot_comparison(results_df, save=True):
-    """Plot model comparison"""
+def draw_comparison(results_df):
+    """Draw model comparison"""
     
     # Prepare data
     metrics = ['Accuracy', 'Precision', 'Recall', 'F1-Score', 'ROC-AUC']
@@ -110,13 +175,16 @@ def plot_comparison(results_df, save=True):
            verticalalignment='center')
     
     plt.tight_layout()
-    
+
+def plot_comparison(results_df, save=True):
+    """Plot model comparison, skipping the render when the results have not changed"""
+    # Only the plotted columns go into the figure, so new timings alone do not force a render
+    plotted = results_df[['Model', 'Accuracy', 'Precision', 'Recall', 'F1-Score', 'ROC-AUC']]
+    figure = ('model_comparison.png', draw_comparison, {'results_df': plotted})
     if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'model_comparison.png'), dpi=300, bbox_inches='tight')
-        print(f"\nModel comparison plot saved to {PLOTS_PATH}")
-    
-    plt.close()
+        generate_figures([figure])
+    else:
+        plot_figure(figure, save=False)
 
 def print_comparison_table(results_df):
     """Print formatted comparison table"""
@@ -131,8 +199,10 @@ def print_comparison_table(results_df):
     print("\nBest Models by Metric:")
     print("-"*80)
     for col in results_df.columns[1:]:
-        best_model = results_df.loc[results_df[col].idxmax(), 'Model']
-        best_score = results_df[col].max()
+        # Lower is better for time and memory
+        best_idx = results_df[col].idxmin() if col in TIMING_COLUMNS else results_df[col].idxmax()
+        best_model = results_df.loc[best_idx, 'Model']
+        best_score = results_df.loc[best_idx, col]
         print(f"{col:20s}: {best_model:20s} ({best_score:.4f})")
     print("="*80)
 
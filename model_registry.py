@@ -0,0 +1,232 @@
+"""
+Versioned model registry and incremental model updates
+Each version is a native XGBoost booster plus metadata, including its
+decision threshold, in its own folder; a CURRENT pointer marks the version to serve. New labelled batches either
+add trees to the current booster or refresh its leaf values, and serving
+processes pick up the new version without a restart.
+"""
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from train_model import booster_params, booster_to_classifier
+from threshold import optimise_threshold
+from preprocess import split_calibration
+from config import *
+
+CURRENT_FILE = 'CURRENT'
+MODEL_FILE = 'model.ubj'
+METADATA_FILE = 'metadata.json'
+
+def list_versions(registry_path=REGISTRY_PATH):
+    """Registered versions, oldest first"""
+    if not os.path.isdir(registry_path):
+        return []
+    return sorted(name for name in os.listdir(registry_path) if name.startswith('v'))
+
+def current_version(registry_path=REGISTRY_PATH):
+    """Version the CURRENT pointer refers to, or None for an empty registry"""
+    try:
+        with open(os.path.join(registry_path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def set_current(version, registry_path=REGISTRY_PATH):
+    """Point CURRENT at a version (also used to roll back)"""
+    if version not in list_versions(registry_path):
+        raise ValueError(f"Unknown model version: {version}")
+
+    # Write then rename, so readers never see a half-written pointer
+    tmp_path = os.path.join(registry_path, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(registry_path, CURRENT_FILE))
+
+def register_model(model, metadata=None, registry_path=REGISTRY_PATH, make_current=True, threshold=None):
+    """Store a model as the next version and optionally make it current
+
+    threshold is the version's operating point from threshold.optimise_threshold;
+    serving from the registry flags transactions at its threshold.
+    """
+    versions = list_versions(registry_path)
+    version = f'v{int(versions[-1][1:]) + 1 if versions else 1:04d}'
+    directory = os.path.join(registry_path, version)
+    os.makedirs(directory)
+
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    booster.save_model(os.path.join(directory, MODEL_FILE))
+
+    metadata = dict(metadata or {})
+    metadata.update({
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'n_trees': booster.num_boosted_rounds(),
+        'threshold': threshold
+    })
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    if make_current:
+        set_current(version, registry_path)
+    print(f"Registered model {version} in {registry_path}")
+    return version
+
+def load_version(version=None, registry_path=REGISTRY_PATH):
+    """Load a registered version (default: current) as an XGBClassifier"""
+    version = version or current_version(registry_path)
+    if version is None:
+        raise FileNotFoundError(f"No model registered in {registry_path}")
+
+    booster = xgb.Booster(model_file=os.path.join(registry_path, version, MODEL_FILE))
+    return booster_to_classifier(booster)
+
+def load_metadata(version=None, registry_path=REGISTRY_PATH):
+    version = version or current_version(registry_path)
+    with open(os.path.join(registry_path, version, METADATA_FILE)) as f:
+        return json.load(f)
+
+def version_threshold(version=None, registry_path=REGISTRY_PATH, default=FRAUD_THRESHOLD):
+    """Decision threshold registered with a version (default: current)"""
+    point = load_metadata(version, registry_path).get('threshold')
+    return point['threshold'] if point else default
+
+def _batch_scale_pos_weight(y):
+    """Class weight that gives the new batch the balance the full model was trained with"""
+    n_negative = int((y == 0).sum())
+    n_positive = max(int((y == 1).sum()), 1)
+    if RESAMPLING_METHOD == 'scale_pos_weight':
+        return n_negative / n_positive
+    # SMOTE brought fraud to SAMPLING_STRATEGY x legitimate; weighting reproduces that ratio
+    return SAMPLING_STRATEGY * n_negative / n_positive
+
+def update_model(model, X_new, y_new, mode=INCREMENTAL_MODE, n_trees=INCREMENTAL_TREES):
+    """Warm-start a model on a new labelled batch
+
+    mode='add_trees' appends n_trees boosting rounds fitted on the new batch;
+    mode='refresh' keeps the tree structure and re-estimates leaf values.
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    y = np.asarray(y_new)
+
+    params, _ = booster_params()
+    params['scale_pos_weight'] = _batch_scale_pos_weight(y)
+    if hasattr(X_new, 'columns'):
+        X_new = X_new[booster.feature_names]
+    dnew = xgb.DMatrix(X_new, label=y, feature_names=booster.feature_names)
+
+    if mode == 'add_trees':
+        print(f"Adding {n_trees} trees fitted on {len(y)} new transactions...")
+        updated = xgb.train(params, dnew, num_boost_round=n_trees, xgb_model=booster)
+    elif mode == 'refresh':
+        print(f"Refreshing leaf values on {len(y)} new transactions...")
+        # The refresh updater replaces tree_method for this pass
+        params.pop('tree_method', None)
+        params.update({'process_type': 'update', 'updater': 'refresh', 'refresh_leaf': True})
+        updated = xgb.train(params, dnew, num_boost_round=booster.num_boosted_rounds(), xgb_model=booster)
+    else:
+        raise ValueError(f"Unknown incremental mode: {mode}")
+
+    return booster_to_classifier(updated)
+
+def split_update_batch(X_new, y_new, calibration_size=CALIBRATION_SIZE, min_fraud=UPDATE_MIN_CALIBRATION_FRAUD):
+    """Hold out part of a new batch to choose the updated model's threshold on
+
+    Returns X_fit, X_cal, y_fit, y_cal; X_cal/y_cal are None when the batch
+    has too few frauds to calibrate on, and the whole batch is used to update.
+    """
+    if int((np.asarray(y_new) == 1).sum()) * calibration_size < min_fraud:
+        return X_new, None, y_new, None
+    return split_calibration(X_new, y_new, calibration_size)
+
+def incremental_update(X_new, y_new, mode=INCREMENTAL_MODE, n_trees=INCREMENTAL_TREES,
+                       registry_path=REGISTRY_PATH, X_cal=None, y_cal=None):
+    """Update the current registered model with a new batch and register the result
+
+    The new version's threshold is chosen on X_cal/y_cal, held out from the
+    batch; without them it keeps the parent version's operating point.
+    """
+    parent = current_version(registry_path)
+    model = update_model(load_version(parent, registry_path), X_new, y_new, mode, n_trees)
+
+    if X_cal is not None:
+        threshold = optimise_threshold(y_cal, model.predict_proba(X_cal)[:, 1])
+    else:
+        threshold = load_metadata(parent, registry_path).get('threshold')
+        print("No calibration data, keeping the parent version's threshold")
+
+    return register_model(model, {
+        'parent': parent,
+        'mode': mode,
+        'batch_rows': len(X_new),
+        'batch_fraud': int(np.asarray(y_new).sum())
+    }, registry_path, threshold=threshold)
+
+class HotSwapModel:
+    """Serving wrapper that switches to the registry's current version when it changes
+
+    The swap is a single attribute assignment, so in-flight predict_proba
+    calls finish on the old model and the next call uses the new one. The
+    version's registered threshold is exposed as `threshold` and swaps with it.
+    """
+
+    def __init__(self, registry_path=REGISTRY_PATH, poll_seconds=REGISTRY_POLL_SECONDS):
+        self.registry_path = registry_path
+        self.poll_seconds = poll_seconds
+        self.version = current_version(registry_path)
+        self.model = load_version(self.version, registry_path)
+        self.threshold = version_threshold(self.version, registry_path)
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @property
+    def feature_names_in_(self):
+        return self.model.feature_names_in_
+
+    def predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def refresh(self):
+        """Load the current version if it changed, returns True when a swap happened"""
+        version = current_version(self.registry_path)
+        if version is None or version == self.version:
+            return False
+
+        model = load_version(version, self.registry_path)
+        threshold = version_threshold(version, self.registry_path)
+        self.model, self.version, self.threshold = model, version, threshold
+        print(f"Switched to model {version}")
+        return True
+
+    def start_watching(self):
+        """Poll the registry in a background thread"""
+        def watch():
+            while not self._stop.wait(self.poll_seconds):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=watch, name='registry-watcher', daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+if __name__ == "__main__":
+    from preprocess import feature_engineering
+
+    parser = argparse.ArgumentParser(description='Update the registered model with a new labelled batch')
+    parser.add_argument('batch', type=str, help='CSV with the new labelled transactions')
+    parser.add_argument('--mode', type=str, default=INCREMENTAL_MODE, choices=['add_trees', 'refresh'])
+    parser.add_argument('--trees', type=int, default=INCREMENTAL_TREES)
+
+    args = parser.parse_args()
+    df = feature_engineering(pd.read_csv(args.batch))
+    X_fit, X_cal, y_fit, y_cal = split_update_batch(df.drop(TARGET_COLUMN, axis=1), df[TARGET_COLUMN])
+    incremental_update(X_fit, y_fit, args.mode, args.trees, X_cal=X_cal, y_cal=y_cal)
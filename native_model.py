@@ -0,0 +1,158 @@
+"""
+Native and compiled model export for low-latency inference
+Writes the trained booster in XGBoost's native JSON/UBJSON format and
+compiles it into flat NumPy arrays that a scoring worker can evaluate
+with vectorised tree traversal, without importing xgboost or sklearn
+"""
+
+import json
+import os
+import numpy as np
+from config import *
+
+def _booster(model):
+    return model.get_booster() if hasattr(model, 'get_booster') else model
+
+def export_native(model, filename='fraud_detection_model.ubj'):
+    """Save the booster in XGBoost's native format (.json or .ubj, chosen by extension)"""
+    os.makedirs(MODELS_PATH, exist_ok=True)
+    filepath = os.path.join(MODELS_PATH, filename)
+    _booster(model).save_model(filepath)
+    print(f"Native model saved to {filepath}")
+    return filepath
+
+def _parse_base_score(value):
+    # Stored as '5E-1' in older XGBoost and '[5E-1]' since 3.0
+    return float(value.strip('[]').split(',')[0])
+
+def compile_model(model):
+    """Flatten every tree of a binary:logistic booster into shared node arrays"""
+    learner = json.loads(_booster(model).save_raw('json'))['learner']
+    if learner['objective']['name'] != 'binary:logistic':
+        raise ValueError(f"Only binary:logistic models can be compiled, got {learner['objective']['name']}")
+
+    trees = learner['gradient_booster']['model']['trees']
+    # Respect early stopping the same way XGBClassifier.predict_proba does
+    best_iteration = learner.get('attributes', {}).get('best_iteration')
+    if best_iteration is not None:
+        trees = trees[:int(best_iteration) + 1]
+
+    left, right, feature, threshold, default_left, roots = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+
+    for tree in trees:
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported by the compiled model")
+
+        n_nodes = len(tree['left_children'])
+        node_ids = np.arange(n_nodes)
+        tree_left = np.asarray(tree['left_children'])
+        tree_right = np.asarray(tree['right_children'])
+        is_leaf = tree_left == -1
+
+        # Leaves point to themselves, so traversal can run a fixed number of steps
+        left.append(np.where(is_leaf, node_ids, tree_left) + offset)
+        right.append(np.where(is_leaf, node_ids, tree_right) + offset)
+        feature.append(np.where(is_leaf, 0, tree['split_indices']))
+        # For leaves split_conditions holds the leaf value
+        threshold.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+        default_left.append(np.asarray(tree['default_left'], dtype=bool))
+        roots.append(offset)
+
+        max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+        offset += n_nodes
+
+    base_score = _parse_base_score(learner['learner_model_param']['base_score'])
+
+    return {
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'value': np.concatenate(threshold),
+        'default_left': np.concatenate(default_left),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth),
+        'base_margin': np.float32(np.log(base_score / (1 - base_score))),
+        'feature_names': np.asarray(learner.get('feature_names') or FEATURE_COLUMNS)
+    }
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+        if not frontier:
+            return depth
+        depth += 1
+
+def export_compiled(model, filename='fraud_detection_model.npz'):
+    """Compile the model and save its node arrays as a single .npz file"""
+    os.makedirs(MODELS_PATH, exist_ok=True)
+    filepath = os.path.join(MODELS_PATH, filename)
+    np.savez(filepath, **compile_model(model))
+    print(f"Compiled model saved to {filepath}")
+    return filepath
+
+class CompiledModel:
+    """NumPy-only tree ensemble evaluator with a predict_proba like XGBClassifier"""
+
+    def __init__(self, arrays):
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.feature = arrays['feature']
+        self.value = arrays['value']
+        self.default_left = arrays['default_left']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.base_margin = np.float32(arrays['base_margin'])
+        self.feature_names_in_ = np.asarray(arrays['feature_names'], dtype=object)
+
+    @classmethod
+    def load(cls, filename='fraud_detection_model.npz'):
+        """Load a compiled model from the models directory"""
+        filepath = filename if os.path.isabs(filename) else os.path.join(MODELS_PATH, filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Compiled model not found at {filepath}")
+
+        with np.load(filepath) as arrays:
+            model = cls({key: arrays[key] for key in arrays.files})
+        print(f"Compiled model loaded from {filepath}")
+        return model
+
+    def _as_matrix(self, X):
+        if isinstance(X, dict):
+            X = [X]
+        if isinstance(X, list) and X and isinstance(X[0], dict):
+            return np.array([[row[name] for name in self.feature_names_in_] for row in X], dtype=np.float32)
+        if hasattr(X, 'columns'):
+            return X[list(self.feature_names_in_)].to_numpy(dtype=np.float32)
+        return np.atleast_2d(np.asarray(X, dtype=np.float32))
+
+    def predict_margin(self, X):
+        """Raw log-odds for each row"""
+        X = self._as_matrix(X)
+        rows = np.arange(len(X))[:, None]
+
+        # Walk every (row, tree) pair one level per step; leaves loop onto themselves
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.value[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return self.base_margin + self.value[node].sum(axis=1, dtype=np.float32)
+
+    def predict_proba(self, X):
+        """Class probabilities, shape (n_rows, 2)"""
+        proba = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - proba, proba])
+
+    def predict(self, X, threshold=FRAUD_THRESHOLD):
+        return (self.predict_proba(X)[:, 1] >= threshold).astype(int)
+
+if __name__ == "__main__":
+    from train_model import load_model
+
+    model = load_model()
+    export_native(model)
+    export_compiled(model)
@@ -3,35 +3,174 @@ Data preprocessing module for fraud detection
 Handles data loading, feature engineering, and SMOTE
 """
 
+import json
+import os
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
+from sklearn.neighbors import NearestNeighbors
 from imblearn.over_sampling import SMOTE
+from data_cache import load_cached, source_key, stage_key, cached_stage
+from velocity_features import backfill_velocity_features, velocity_feature_names
+from instrument import instrumented
 from config import *
 
-def load_data(filepath=DATA_PATH):
+@instrumented()
+def load_data(filepath=DATA_PATH, use_cache=USE_DATA_CACHE):
     """Load the credit card dataset"""
     print(f"Loading data from {filepath}...")
-    df = pd.read_csv(filepath)
+    if use_cache:
+        df = load_cached(filepath)
+    else:
+        df = pd.read_csv(filepath)
     print(f"Data loaded: {df.shape[0]} rows, {df.shape[1]} columns")
     return df
 
-def feature_engineering(df):
-    """Create new features from existing ones"""
-    print("Performing feature engineering...")
+DERIVED_FEATURES = ['LogAmount', 'Hour']
+TRANSFORMER_FILE = 'feature_transformer.json'
+
+def log_amount(amount, out=None):
+    """LogAmount feature: log(1 + Amount)"""
+    return np.log1p(amount, out=out)
+
+def hour_of_day(time_seconds, out=None):
+    """Hour feature: seconds since the first transaction folded onto a 24h clock"""
+    return np.remainder(np.divide(time_seconds, 3600.0), 24, out=out)
+
+class FeatureTransformer:
+    """Fitted feature schema shared by training and serving
+
+    Records which raw columns pass through, the output feature order and
+    the matrix dtype, and computes LogAmount/Hour with NumPy straight into a
+    preallocated output. Works on a single transaction dict, a list of
+    dicts, a raw 2D array or a DataFrame.
+    """
+
+    def __init__(self, passthrough=None, dtype=FEATURE_DTYPE):
+        self.passthrough = list(passthrough) if passthrough is not None else None
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def feature_names(self):
+        return self.passthrough + DERIVED_FEATURES
+
+    @property
+    def input_columns(self):
+        """Raw column order expected when transforming a plain array"""
+        return self.passthrough + [AMOUNT_COLUMN, TIME_COLUMN]
+
+    def fit(self, df):
+        """Record the schema from a raw DataFrame (Time, Amount, V1-V28, optional Class)"""
+        self.passthrough = [col for col in df.columns
+                            if col not in (TIME_COLUMN, AMOUNT_COLUMN, TARGET_COLUMN, ENTITY_COLUMN)]
+        return self
+
+    @classmethod
+    def from_feature_names(cls, feature_names, dtype=FEATURE_DTYPE):
+        """Rebuild the transformer from a trained model's feature order"""
+        return cls([name for name in feature_names if name not in DERIVED_FEATURES], dtype)
+
+    def _columns(self, X):
+        """Map each raw input column to an array, without copying DataFrame columns"""
+        if isinstance(X, dict):
+            X = [X]
+        if isinstance(X, list):
+            return {col: np.fromiter((row[col] for row in X), dtype=np.float64, count=len(X))
+                    for col in self.input_columns}
+        if hasattr(X, 'columns'):
+            return {col: X[col].to_numpy() for col in self.input_columns}
+
+        X = np.atleast_2d(np.asarray(X))
+        return {col: X[:, j] for j, col in enumerate(self.input_columns)}
+
+    def transform(self, X):
+        """Feature matrix of shape (n_rows, n_features) in the fitted order"""
+        columns = self._columns(X)
+        n_rows = len(columns[AMOUNT_COLUMN])
+        n_passthrough = len(self.passthrough)
+
+        out = np.empty((n_rows, n_passthrough + len(DERIVED_FEATURES)), dtype=self.dtype)
+        for j, col in enumerate(self.passthrough):
+            out[:, j] = columns[col]
+        log_amount(columns[AMOUNT_COLUMN], out=out[:, n_passthrough])
+        hour_of_day(columns[TIME_COLUMN], out=out[:, n_passthrough + 1])
+        return out
+
+    def transform_frame(self, df):
+        """Feature DataFrame that reuses the input's column arrays and keeps their dtypes"""
+        derived = {
+            'LogAmount': log_amount(df[AMOUNT_COLUMN].to_numpy()),
+            'Hour': hour_of_day(df[TIME_COLUMN].to_numpy())
+        }
+        data = {col: df[col] for col in self.passthrough}
+        data.update(derived)
+        return pd.DataFrame(data, index=df.index, copy=False)
+
+    def save(self, filename=TRANSFORMER_FILE):
+        """Store the schema next to the model"""
+        os.makedirs(MODELS_PATH, exist_ok=True)
+        filepath = os.path.join(MODELS_PATH, filename)
+        with open(filepath, 'w') as f:
+            json.dump({'passthrough': self.passthrough, 'dtype': self.dtype.name,
+                       'feature_names': self.feature_names}, f, indent=2)
+        print(f"Feature transformer saved to {filepath}")
+
+    @classmethod
+    def load(cls, filename=TRANSFORMER_FILE):
+        filepath = os.path.join(MODELS_PATH, filename)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Feature transformer not found at {filepath}")
+        with open(filepath) as f:
+            schema = json.load(f)
+        return cls(schema['passthrough'], schema['dtype'])
+
+def as_feature_frame(X, dtype=None):
+    """DataFrame backed by one C-contiguous matrix (default: the frame's common dtype)
+
+    to_numpy() on the result is a view, so predict_proba and NumPy code get
+    the matrix without a conversion copy. No copy is made when X already is one.
+    """
+    values = np.ascontiguousarray(X.to_numpy(dtype=dtype))
+    return pd.DataFrame(values, columns=X.columns, index=X.index, copy=False)
+
+@instrumented()
+def feature_engineering(df, verbose=True, dtype=FEATURE_DTYPE, history=None):
+    """Create new features from existing ones
+
+    history holds earlier raw transactions (card id, Time, Amount) that still
+    count towards the velocity windows of df's rows, e.g. the tail of the
+    previous chunk when the data is processed in chunks.
+    """
+    if verbose:
+        print("Performing feature engineering...")
     
-    # Create LogAmount feature
-    df['LogAmount'] = np.log1p(df[AMOUNT_COLUMN])
+    # Per-entity velocity features, when the data identifies the card
+    if ENTITY_COLUMN in df.columns:
+        if history is not None and len(history):
+            raw = df[[ENTITY_COLUMN, TIME_COLUMN, AMOUNT_COLUMN]]
+            combined = backfill_velocity_features(pd.concat([history, raw], ignore_index=True))
+            velocity = combined[velocity_feature_names()].iloc[len(history):]
+            df = df.assign(**{col: velocity[col].to_numpy() for col in velocity.columns})
+        else:
+            df = backfill_velocity_features(df)
     
-    # Create Hour feature from Time
-    df['Hour'] = (df[TIME_COLUMN] / 3600) % 24
+    # LogAmount and Hour replace the original Amount and Time columns, and every
+    # feature is written into one contiguous matrix of the configured dtype;
+    # the input DataFrame is left untouched
+    transformer = FeatureTransformer(dtype=dtype).fit(df)
+    features = pd.DataFrame(transformer.transform(df), columns=transformer.feature_names,
+                            index=df.index, copy=False)
     
-    # Drop original Time and Amount columns
-    df = df.drop([TIME_COLUMN, AMOUNT_COLUMN], axis=1)
+    # Keep the label where it was in the input
+    if TARGET_COLUMN in df.columns:
+        kept = [col for col in df.columns if col not in (TIME_COLUMN, AMOUNT_COLUMN, ENTITY_COLUMN)]
+        features.insert(kept.index(TARGET_COLUMN), TARGET_COLUMN, df[TARGET_COLUMN])
     
-    print("Feature engineering complete")
-    return df
+    if verbose:
+        print("Feature engineering complete")
+    return features
 
+@instrumented()
 def split_data(df):
     """Split data into train and test sets"""
     print("Splitting data into train and test sets...")
@@ -49,22 +188,105 @@ def split_data(df):
     print(f"Train set: {X_train.shape[0]} samples")
     print(f"Test set: {X_test.shape[0]} samples")
     
-    return X_train, X_test, y_train, y_test
+    return as_feature_frame(X_train), as_feature_frame(X_test), y_train, y_test
+
+def split_calibration(X_train, y_train, calibration_size=CALIBRATION_SIZE):
+    """Hold out part of the training split for choosing the decision threshold
+
+    Done before SMOTE, so the calibration rows are real transactions, and
+    kept apart from the test set, so reported metrics are not tuned on.
+    """
+    X_fit, X_cal, y_fit, y_cal = train_test_split(
+        X_train, y_train,
+        test_size=calibration_size,
+        random_state=RANDOM_STATE,
+        stratify=y_train
+    )
+    print(f"Calibration set: {X_cal.shape[0]} samples held out of the train set")
+    return as_feature_frame(X_fit), as_feature_frame(X_cal), y_fit, y_cal
 
-def apply_smote(X_train, y_train):
+def fast_smote(X_train, y_train, k_neighbors=SMOTE_K_NEIGHBORS):
+    """SMOTE oversampling into a preallocated array of the input's float dtype
+
+    Neighbours are searched only among minority rows with a ball tree queried
+    in parallel, and synthetic rows are written in chunks straight into the
+    output array, so no intermediate copies of the training set are made.
+    """
+    y = np.asarray(y_train)
+    dtypes = X_train.dtypes if hasattr(X_train, 'dtypes') else [X_train.dtype]
+    dtype = np.result_type(*dtypes, np.float32)
+    minority = np.asarray(X_train[y == 1], dtype=dtype)
+    n_majority = int((y == 0).sum())
+    n_minority = len(minority)
+    n_synthetic = int(SAMPLING_STRATEGY * n_majority) - n_minority
+
+    if n_synthetic <= 0:
+        return X_train, y_train
+    if n_minority < 2:
+        raise ValueError(f"SMOTE needs at least 2 minority samples, got {n_minority}")
+
+    k = min(k_neighbors, n_minority - 1)
+    nn = NearestNeighbors(n_neighbors=k + 1, algorithm=SMOTE_NN_ALGORITHM, n_jobs=SMOTE_N_JOBS)
+    nn.fit(minority)
+    # Column 0 is each point itself
+    neighbours = nn.kneighbors(minority, return_distance=False)[:, 1:]
+
+    n_train = len(y)
+    X_resampled = np.empty((n_train + n_synthetic, minority.shape[1]), dtype=dtype)
+    X_resampled[:n_train] = X_train
+    rng = np.random.default_rng(RANDOM_STATE)
+
+    for start in range(0, n_synthetic, SMOTE_CHUNK_SIZE):
+        size = min(SMOTE_CHUNK_SIZE, n_synthetic - start)
+        base = rng.integers(0, n_minority, size)
+        neighbour = neighbours[base, rng.integers(0, k, size)]
+        gap = rng.random(size, dtype=dtype)[:, None]
+
+        # new = base + gap * (neighbour - base), computed in place in the output slice
+        out = X_resampled[n_train + start:n_train + start + size]
+        np.subtract(minority[neighbour], minority[base], out=out)
+        out *= gap
+        out += minority[base]
+
+    y_resampled = np.concatenate([y, np.ones(n_synthetic, dtype=y.dtype)])
+
+    if hasattr(X_train, 'columns'):
+        X_resampled = pd.DataFrame(X_resampled, columns=X_train.columns, copy=False)
+        y_resampled = pd.Series(y_resampled, name=getattr(y_train, 'name', TARGET_COLUMN))
+
+    return X_resampled, y_resampled
+
+@instrumented()
+def apply_smote(X_train, y_train, method=RESAMPLING_METHOD):
     """Apply SMOTE to handle class imbalance"""
+    if method == 'scale_pos_weight':
+        print("Skipping resampling, class imbalance is handled by scale_pos_weight")
+        return X_train, y_train
+
     print("Applying SMOTE for class balancing...")
     
-    smote = SMOTE(sampling_strategy=SAMPLING_STRATEGY, random_state=RANDOM_STATE)
-    X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
+    if method == 'fast_smote':
+        X_train_resampled, y_train_resampled = fast_smote(X_train, y_train)
+    elif method == 'smote':
+        smote = SMOTE(sampling_strategy=SAMPLING_STRATEGY, random_state=RANDOM_STATE)
+        X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
+        if hasattr(X_train_resampled, 'columns'):
+            # imblearn keeps the dtype but returns a column-major frame
+            X_train_resampled = as_feature_frame(X_train_resampled)
+    else:
+        raise ValueError(f"Unknown resampling method: {method}")
     
     print(f"Original class distribution: {dict(pd.Series(y_train).value_counts())}")
     print(f"After SMOTE: {dict(pd.Series(y_train_resampled).value_counts())}")
     
     return X_train_resampled, y_train_resampled
 
-def preprocess_pipeline(filepath=DATA_PATH):
+@instrumented()
+def preprocess_pipeline(filepath=DATA_PATH, use_cache=USE_STAGE_CACHE):
     """Complete preprocessing pipeline"""
+    if use_cache:
+        return cached_preprocess_pipeline(filepath)
+
     # Load data
     df = load_data(filepath)
     
@@ -79,6 +301,64 @@ def preprocess_pipeline(filepath=DATA_PATH):
     
     return X_train_resampled, X_test, y_train_resampled, y_test
 
+def split_stage_keys(filepath=DATA_PATH):
+    """Stage keys of the engineered features and of the train/test split of filepath"""
+    # Each key covers the data hash plus the config settings that stage depends on
+    features_key = stage_key('features', source_key(filepath), VELOCITY_WINDOWS, FEATURE_DTYPE)
+    split_key = stage_key('split', features_key, TEST_SIZE, RANDOM_STATE)
+    return features_key, split_key
+
+def resampled_stage_key(parent_key):
+    """Stage key of resampled training data, covering every setting resampling depends on"""
+    # fast_smote draws its random numbers chunk by chunk, so the chunk size changes its output too
+    return stage_key('resampled', parent_key, RESAMPLING_METHOD, SAMPLING_STRATEGY, SMOTE_K_NEIGHBORS,
+                     SMOTE_CHUNK_SIZE, RANDOM_STATE)
+
+def cached_split(filepath=DATA_PATH):
+    """Train/test split of filepath, reusing the features and split stages from the stage cache"""
+    features_key, split_key = split_stage_keys(filepath)
+
+    def features():
+        return feature_engineering(load_data(filepath))
+
+    def split():
+        return split_data(cached_stage(features_key, features))
+
+    return cached_stage(split_key, split)
+
+def cached_preprocess_pipeline(filepath=DATA_PATH):
+    """Preprocessing pipeline that reuses each stage's output from the stage cache"""
+    _, split_key = split_stage_keys(filepath)
+
+    def resampled():
+        X_train, X_test, y_train, y_test = cached_split(filepath)
+        X_train_resampled, y_train_resampled = apply_smote(X_train, y_train)
+        return X_train_resampled, X_test, y_train_resampled, y_test
+
+    return cached_stage(resampled_stage_key(split_key), resampled)
+
+@instrumented()
+def calibrated_preprocess_pipeline(filepath=DATA_PATH, use_cache=USE_STAGE_CACHE):
+    """Preprocessing pipeline that also holds out a calibration split for the threshold
+
+    Returns X_train, X_cal, X_test, y_train, y_cal, y_test; the test split is
+    the same as preprocess_pipeline's, and only X_train is resampled.
+    """
+    def calibrated():
+        if use_cache:
+            X_train, X_test, y_train, y_test = cached_split(filepath)
+        else:
+            X_train, X_test, y_train, y_test = split_data(feature_engineering(load_data(filepath)))
+        X_fit, X_cal, y_fit, y_cal = split_calibration(X_train, y_train)
+        X_fit_resampled, y_fit_resampled = apply_smote(X_fit, y_fit)
+        return X_fit_resampled, X_cal, X_test, y_fit_resampled, y_cal, y_test
+
+    if not use_cache:
+        return calibrated()
+    _, split_key = split_stage_keys(filepath)
+    calibration_key = stage_key('calibration', split_key, CALIBRATION_SIZE, RANDOM_STATE)
+    return cached_stage(resampled_stage_key(calibration_key), calibrated)
+
 if __name__ == "__main__":
     # Test the preprocessing pipeline
     X_train, X_test, y_train, y_test = preprocess_pipeline()
@@ -0,0 +1,114 @@
+"""
+Headless figure rendering for evaluation and EDA plots
+A figure is (filename, draw function, inputs). Inputs are small summaries
+computed up front (decimated curves, histogram counts, matrices), so the
+workers that render them never see the full dataset. Figures are drawn
+with the Agg backend in parallel processes, and a figure is skipped when
+its inputs hash to the same key as the PNG already on disk.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend
+import matplotlib.pyplot as plt
+import numpy as np
+from instrument import instrumented
+from config import *
+
+PLOT_INDEX_FILE = '.plot_index.json'
+
+def decimate_curve(x, y, max_points=PLOT_MAX_POINTS):
+    """Keep at most max_points of a curve, spaced evenly along its length
+
+    Spacing by arc length (on axes scaled to [0, 1]) keeps the detail in the
+    bends, such as the steep start of a ROC curve, and always keeps both ends.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return x, y
+
+    def scaled(values):
+        span = values.max() - values.min()
+        return (values - values.min()) / span if span > 0 else np.zeros_like(values)
+
+    steps = np.hypot(np.diff(scaled(x)), np.diff(scaled(y)))
+    length = np.concatenate([[0.0], np.cumsum(steps)])
+    targets = np.linspace(0.0, length[-1], max_points)
+    keep = np.unique(np.searchsorted(length, targets).clip(0, len(x) - 1))
+    keep = np.union1d(keep, [0, len(x) - 1])
+    return x[keep], y[keep]
+
+def figure_key(draw, inputs, dpi):
+    """Hash of everything that determines how a figure looks"""
+    payload = pickle.dumps((draw.__module__, draw.__qualname__, inputs, dpi, FIGURE_SIZE),
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def render_figure(filepath, draw, inputs, dpi=PLOT_DPI):
+    """Draw one figure with draw(**inputs) and save it"""
+    draw(**inputs)
+    plt.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    plt.close('all')
+    return filepath
+
+def plot_figure(figure, save=True, output_dir=PLOTS_PATH, dpi=PLOT_DPI):
+    """Draw one figure in this process, without the unchanged-input check"""
+    filename, draw, inputs = figure
+    if save:
+        os.makedirs(output_dir, exist_ok=True)
+        render_figure(os.path.join(output_dir, filename), draw, inputs, dpi)
+        print(f"{filename} saved to {output_dir}")
+    else:
+        draw(**inputs)
+        plt.close('all')
+
+def _load_index(output_dir):
+    try:
+        with open(os.path.join(output_dir, PLOT_INDEX_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+@instrumented()
+def generate_figures(figures, output_dir=PLOTS_PATH, n_workers=PLOT_WORKERS, dpi=PLOT_DPI, force=False):
+    """Render figures whose inputs changed since the last run, in parallel when there are more than n_workers
+
+    Returns (rendered filenames, skipped filenames).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index = _load_index(output_dir)
+
+    jobs, keys, skipped = [], {}, []
+    for filename, draw, inputs in figures:
+        filepath = os.path.join(output_dir, filename)
+        key = figure_key(draw, inputs, dpi)
+        if not force and index.get(filename) == key and os.path.exists(filepath):
+            skipped.append(filename)
+            continue
+        keys[filename] = key
+        jobs.append((filepath, draw, inputs, dpi))
+
+    # Each spawned worker re-imports the plotting stack, which costs more than
+    # drawing a few figures, so the pool is only worth it for more jobs than workers
+    n_workers = min(n_workers, os.cpu_count() or 1)
+    if n_workers <= 1 or len(jobs) <= n_workers:
+        for job in jobs:
+            render_figure(*job)
+    else:
+        # Spawned workers start with a clean matplotlib state and the Agg backend
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers) as pool:
+            pool.starmap(render_figure, jobs)
+
+    index.update(keys)
+    with open(os.path.join(output_dir, PLOT_INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    rendered = list(keys)
+    print(f"Rendered {len(rendered)} figures to {output_dir}"
+          + (f", {len(skipped)} unchanged" if skipped else ""))
+    return rendered, skipped
@@ -0,0 +1,314 @@
+"""
+Real-time scoring service for fraud detection
+Loads the trained model once and scores transactions over HTTP,
+grouping concurrent requests into micro-batches for predict_proba.
+Flagged transactions are returned with their reason codes.
+"""
+
+import argparse
+import json
+import numbers
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from preprocess import FeatureTransformer
+from velocity_features import VelocityFeatureStore, velocity_feature_names
+from native_model import CompiledModel
+from threshold import load_threshold
+from config import *
+
+def model_feature_names(model):
+    """Feature order the model was trained on"""
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        return list(names)
+    return list(FEATURE_COLUMNS)
+
+def score_transactions(model, transactions, transformer=None):
+    """Score a list of raw transactions (dicts with Time, Amount, V1-V28)"""
+    if transformer is None:
+        transformer = FeatureTransformer.from_feature_names(model_feature_names(model))
+
+    return model.predict_proba(transformer.transform(transactions))[:, 1]
+
+def required_fields(transformer, uses_velocity=False):
+    """Raw fields each transaction must carry for the transformer (velocity features are computed)"""
+    fields = [str(col) for col in transformer.input_columns]
+    if uses_velocity:
+        fields = [col for col in fields if col not in velocity_feature_names()] + [ENTITY_COLUMN]
+    return fields
+
+def validate_transactions(transactions, fields):
+    """Raise ValueError naming the first missing or non-numeric field"""
+    for txn in transactions:
+        if not isinstance(txn, dict):
+            raise ValueError("each transaction must be a JSON object")
+        for field in fields:
+            if field not in txn:
+                raise ValueError(f"missing field '{field}'")
+            # Card ids may be strings; every model input must be a number
+            if field != ENTITY_COLUMN and not isinstance(txn[field], numbers.Real):
+                raise ValueError(f"field '{field}' must be a number, got {type(txn[field]).__name__}")
+
+class MicroBatcher:
+    """Gather concurrent scoring requests into batches for one predict_proba call"""
+
+    def __init__(self, model, max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS,
+                 explainer=None, threshold=FRAUD_THRESHOLD):
+        self.model = model
+        self.explainer = explainer
+        self._threshold = threshold
+        self.transformer = FeatureTransformer.from_feature_names(model_feature_names(model))
+        # Models trained with velocity features need the per-card streaming state
+        uses_velocity = set(velocity_feature_names()) & set(self.transformer.passthrough)
+        self.velocity_store = VelocityFeatureStore() if uses_velocity else None
+        self.fields = required_fields(self.transformer, bool(uses_velocity))
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    @property
+    def threshold(self):
+        """Alert threshold: transactions at or above it are flagged and get reason codes
+
+        None follows the model's own threshold, which a registry model swaps
+        along with the version it serves.
+        """
+        return self.model.threshold if self._threshold is None else self._threshold
+
+    def submit(self, transactions, explain=False):
+        """Queue transactions for scoring, returns a Future of fraud probabilities
+
+        With explain=True the Future holds (probabilities, reasons), where reasons
+        has the top features of each flagged transaction and None for the rest.
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        if explain and self.explainer is None:
+            raise ValueError("MicroBatcher has no explainer")
+
+        future = Future()
+        self._queue.put((list(transactions), future, explain))
+        return future
+
+    def score(self, transactions, timeout=None, explain=False):
+        """Score transactions and wait for the result"""
+        return self.submit(transactions, explain).result(timeout)
+
+    def close(self):
+        """Stop the worker after the queued requests have been scored"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        """Block for one request, then keep gathering until the batch is full or max wait expires"""
+        item = self._queue.get()
+        if item is None:
+            return None
+
+        batch = [item]
+        size = len(item[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the stop marker back so the worker exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    def _with_velocity(self, txn):
+        features = self.velocity_store.update(txn[ENTITY_COLUMN], txn[TIME_COLUMN], txn[AMOUNT_COLUMN])
+        return {**txn, **features}
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Each request is checked and transformed on its own, so a malformed
+            # transaction fails only its request and never touches the velocity state
+            parts, valid = [], []
+            for request in batch:
+                transactions, future, _ = request
+                try:
+                    validate_transactions(transactions, self.fields)
+                    if self.velocity_store is not None:
+                        transactions = [self._with_velocity(txn) for txn in transactions]
+                    parts.append(self.transformer.transform(transactions))
+                except Exception as exc:
+                    future.set_exception(exc)
+                    continue
+                valid.append(request)
+            if not valid:
+                continue
+            batch = valid
+
+            try:
+                X = np.concatenate(parts) if len(parts) > 1 else parts[0]
+                proba = self.model.predict_proba(X)[:, 1]
+                # Flagged rows of the whole batch are explained in one call
+                explain = any(wants for _, _, wants in batch)
+                reasons = self.explainer.explain(X, proba, self.threshold) if explain else None
+            except Exception as exc:
+                for _, future, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            # Hand each request back its own slice of the batch
+            start = 0
+            for transactions, future, wants in batch:
+                end = start + len(transactions)
+                future.set_result((proba[start:end], reasons[start:end]) if wants else proba[start:end])
+                start = end
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler: POST /score with one transaction or a list, GET /health"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/score':
+            # The body is left unread, so close rather than parse it as the next request
+            self.close_connection = True
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            # A bad Content-Length leaves an unknown amount of body on the connection
+            self.close_connection = True
+            self._send_json(400, {'error': 'invalid JSON body'})
+            return
+
+        transactions = payload if isinstance(payload, list) else [payload]
+        if not transactions:
+            self._send_json(200, {'fraud_probability': [], 'is_fraud': []})
+            return
+
+        try:
+            explain = self.server.batcher.explainer is not None
+            result = self.server.batcher.score(transactions, explain=explain)
+        except KeyError as exc:
+            self._send_json(400, {'error': f"missing field '{exc.args[0]}'"})
+            return
+        except (ValueError, TypeError) as exc:
+            self._send_json(400, {'error': str(exc)})
+            return
+
+        proba, reasons = result if explain else (result, None)
+        body = {
+            'fraud_probability': [float(p) for p in proba],
+            'is_fraud': [bool(p >= self.server.batcher.threshold) for p in proba]
+        }
+        if reasons is not None:
+            body['reasons'] = [
+                None if row is None else [{'feature': name, 'contribution': value} for name, value in row]
+                for row in reasons
+            ]
+        self._send_json(200, body)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Per-request access logs are too noisy at high request rates
+        pass
+
+def create_server(model, host=SERVE_HOST, port=SERVE_PORT,
+                  max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS,
+                  threshold=None, explain=SERVE_EXPLAIN):
+    """Build the HTTP scoring server around an already loaded model"""
+    if threshold is None and not hasattr(model, 'threshold'):
+        # A registry model carries its version's threshold; a model file uses the one saved with it
+        threshold = load_threshold()
+    explainer = None
+    if explain and not isinstance(model, CompiledModel):
+        # Imported here so compiled-model servers never load xgboost
+        from explain import Explainer
+        explainer = Explainer(model)
+    server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(model, max_batch_size, max_wait_ms, explainer, threshold)
+    return server
+
+def load_scoring_model(model_path='fraud_detection_model.pkl', watch=True):
+    """Load a .pkl model, a compiled .npz model, or the registry's current version"""
+    if model_path == 'registry':
+        # Follow the registry's CURRENT version, swapping models without a restart
+        from model_registry import HotSwapModel
+        model = HotSwapModel()
+        print(f"Using registry version {model.version}")
+        return model.start_watching() if watch else model
+    if model_path.endswith('.npz'):
+        # Compiled model: NumPy-only scoring, no xgboost import needed
+        return CompiledModel.load(model_path)
+    from train_model import load_model
+    return load_model(model_path)
+
+def serve(model_path='fraud_detection_model.pkl', host=SERVE_HOST, port=SERVE_PORT,
+          max_batch_size=SERVE_MAX_BATCH_SIZE, max_wait_ms=SERVE_MAX_WAIT_MS):
+    """Load the model once and serve until interrupted"""
+    model = load_scoring_model(model_path)
+    server = create_server(model, host, port, max_batch_size, max_wait_ms)
+
+    print(f"Scoring service listening on http://{host}:{server.server_port}")
+    print(f"Micro-batching: max batch size {max_batch_size}, max wait {max_wait_ms} ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down scoring service...")
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fraud Detection Scoring Service')
+    parser.add_argument('--model', type=str, default='fraud_detection_model.pkl',
+                        help='Model file name inside the models directory (.pkl, or .npz for a compiled model), '
+                             'or "registry" to follow the model registry')
+    parser.add_argument('--host', type=str, default=SERVE_HOST)
+    parser.add_argument('--port', type=int, default=SERVE_PORT)
+    parser.add_argument('--max-batch-size', type=int, default=SERVE_MAX_BATCH_SIZE,
+                        help='Maximum number of transactions per predict_proba call')
+    parser.add_argument('--max-wait-ms', type=float, default=SERVE_MAX_WAIT_MS,
+                        help='Maximum time to wait for a batch to fill')
+
+    args = parser.parse_args()
+    serve(args.model, args.host, args.port, args.max_batch_size, args.max_wait_ms)
@@ -0,0 +1,176 @@
+"""
+Streaming preprocessing for datasets larger than RAM
+Reads the source CSV in chunks, applies feature engineering per chunk,
+splits train/calibration/test in a single pass with a hash of a row key, and writes
+each chunk straight to on-disk shards, so peak memory is bounded by the
+chunk size rather than the dataset size.
+Velocity features carry the trailing window of earlier chunks forward, so
+they match the in-memory pipeline; this needs the input sorted by Time.
+SMOTE is not applied here, it needs the whole training set in memory.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from preprocess import feature_engineering
+from config import *
+
+MANIFEST_FILE = 'manifest.json'
+SPLIT_BUCKETS = 10000
+SPLITS = ('train', 'calibration', 'test')
+
+def _splitmix64(x):
+    """Vectorised splitmix64 finaliser, spreads keys uniformly over uint64"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def hash_split_mask(keys, test_size=TEST_SIZE, seed=RANDOM_STATE):
+    """True for rows that belong to the test set
+
+    Each row's assignment depends only on its key, so the split is the same
+    whatever the chunk size or file order. The hash is independent of the
+    label, so every class lands in the test set at the same expected rate.
+    """
+    hashed = pd.util.hash_array(np.asarray(keys))
+    mixed = _splitmix64(hashed ^ np.uint64(seed))
+    return (mixed % np.uint64(SPLIT_BUCKETS)) < int(test_size * SPLIT_BUCKETS)
+
+def hash_split(keys, test_size=TEST_SIZE, calibration_size=CALIBRATION_SIZE, seed=RANDOM_STATE):
+    """(calibration mask, test mask) of the rows; calibration is a share of the non-test rows
+
+    The calibration draw uses a second, independent hash of the key, so the
+    test rows are exactly those of hash_split_mask.
+    """
+    test_mask = hash_split_mask(keys, test_size, seed)
+    calibration_mask = hash_split_mask(keys, calibration_size, seed + 1) & ~test_mask
+    return calibration_mask, test_mask
+
+def velocity_history(history, chunk, windows=VELOCITY_WINDOWS):
+    """Raw rows of history and chunk that can still fall inside a velocity window of a later chunk"""
+    rows = chunk[[ENTITY_COLUMN, TIME_COLUMN, AMOUNT_COLUMN]]
+    if history is not None:
+        if len(history) and chunk[TIME_COLUMN].min() < history[TIME_COLUMN].max():
+            raise ValueError("Streaming velocity features need the input sorted by "
+                             f"{TIME_COLUMN}; sort it or drop the {ENTITY_COLUMN} column")
+        rows = pd.concat([history, rows], ignore_index=True)
+    # Later chunks start at or after this chunk's last time
+    cutoff = chunk[TIME_COLUMN].max() - max(windows.values())
+    return rows[rows[TIME_COLUMN] > cutoff].reset_index(drop=True)
+
+def _write_shard(directory, index, X, y):
+    np.save(os.path.join(directory, f'X_{index:05d}.npy'), X)
+    np.save(os.path.join(directory, f'y_{index:05d}.npy'), y)
+
+def stream_preprocess(filepath=DATA_PATH, output_dir=SHARDS_PATH,
+                      chunk_size=STREAM_CHUNK_SIZE, key_column=STREAM_KEY_COLUMN):
+    """Chunked preprocessing pipeline writing train/calibration/test shards to output_dir"""
+    print(f"Streaming {filepath} in chunks of {chunk_size} rows...")
+
+    # Build into a temporary folder so a failed run never leaves half-written shards behind
+    tmp_dir = output_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for split in SPLITS:
+        os.makedirs(os.path.join(tmp_dir, split))
+
+    feature_names = None
+    shards = {split: [] for split in SPLITS}
+    class_counts = {split: {} for split in SPLITS}
+    row_offset = 0
+    history = None  # trailing velocity window carried across chunks
+
+    dtypes = {col: FEATURE_DTYPE for col in RAW_FEATURE_COLUMNS}
+    for chunk_index, chunk in enumerate(pd.read_csv(filepath, chunksize=chunk_size, dtype=dtypes)):
+        if key_column is None:
+            keys = np.arange(row_offset, row_offset + len(chunk), dtype=np.int64)
+        else:
+            keys = chunk[key_column].to_numpy()
+        row_offset += len(chunk)
+
+        if ENTITY_COLUMN in chunk.columns:
+            previous = history
+            history = velocity_history(history, chunk)
+            chunk = feature_engineering(chunk, verbose=False, history=previous)
+        else:
+            chunk = feature_engineering(chunk, verbose=False)
+        if feature_names is None:
+            feature_names = [col for col in chunk.columns if col != TARGET_COLUMN]
+
+        X = np.ascontiguousarray(chunk[feature_names].to_numpy(dtype=FEATURE_DTYPE))
+        y = chunk[TARGET_COLUMN].to_numpy(dtype=np.int8)
+        calibration_mask, test_mask = hash_split(keys)
+        train_mask = ~(calibration_mask | test_mask)
+
+        for split, mask in (('train', train_mask), ('calibration', calibration_mask), ('test', test_mask)):
+            if not mask.any():
+                continue
+            _write_shard(os.path.join(tmp_dir, split), chunk_index, X[mask], y[mask])
+            shards[split].append({'index': chunk_index, 'rows': int(mask.sum())})
+
+            labels, counts = np.unique(y[mask], return_counts=True)
+            for label, count in zip(labels, counts):
+                class_counts[split][str(label)] = class_counts[split].get(str(label), 0) + int(count)
+
+        print(f"Chunk {chunk_index}: {row_offset} rows processed")
+
+    manifest = {
+        'source': os.path.abspath(filepath),
+        'feature_names': feature_names,
+        'test_size': TEST_SIZE,
+        'calibration_size': CALIBRATION_SIZE,
+        'random_state': RANDOM_STATE,
+        'shards': shards,
+        'class_counts': class_counts
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+    for split in SPLITS:
+        rows = sum(shard['rows'] for shard in shards[split])
+        print(f"{split.capitalize()} set: {rows} samples in {len(shards[split])} shards, "
+              f"class distribution {class_counts[split]}")
+    print(f"Shards written to {output_dir}")
+
+    return manifest
+
+def load_manifest(output_dir=SHARDS_PATH):
+    """Read the manifest written by stream_preprocess"""
+    with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def iter_shards(split='train', output_dir=SHARDS_PATH, mmap_mode='r'):
+    """Yield (X, y) for each shard of a split, memory-mapped by default"""
+    manifest = load_manifest(output_dir)
+    directory = os.path.join(output_dir, split)
+
+    for shard in manifest['shards'][split]:
+        X = np.load(os.path.join(directory, f"X_{shard['index']:05d}.npy"), mmap_mode=mmap_mode)
+        y = np.load(os.path.join(directory, f"y_{shard['index']:05d}.npy"), mmap_mode=mmap_mode)
+        yield X, y
+
+def load_split(split='test', output_dir=SHARDS_PATH):
+    """Concatenate the shards of a split into an in-memory X DataFrame and y Series"""
+    feature_names = load_manifest(output_dir)['feature_names']
+    parts = list(iter_shards(split, output_dir))
+
+    X = pd.DataFrame(np.concatenate([X for X, _ in parts]), columns=feature_names)
+    y = pd.Series(np.concatenate([y for _, y in parts]), name=TARGET_COLUMN)
+    return X, y
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Streaming preprocessing to on-disk shards')
+    parser.add_argument('--input', type=str, default=DATA_PATH)
+    parser.add_argument('--output', type=str, default=SHARDS_PATH)
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE)
+    parser.add_argument('--key-column', type=str, default=STREAM_KEY_COLUMN,
+                        help='Column used as the split key (default: row number)')
+
+    args = parser.parse_args()
+    stream_preprocess(args.input, args.output, args.chunk_size, args.key_column)
@@ -0,0 +1,117 @@
+"""
+Unit tests for the async scoring API
+"""
+import asyncio
+import time
+import numpy as np
+import pytest
+import xgboost as xgb
+from preprocess import feature_engineering
+from serve import score_transactions
+from async_scorer import AsyncScorer, ScorerOverloaded, DeadlineExceeded
+from test_preprocess import create_mock_data
+
+@pytest.fixture(scope='module')
+def trained_model():
+    df = feature_engineering(create_mock_data(), verbose=False)
+    df.loc[df.index[:20], 'Class'] = 1
+    model = xgb.XGBClassifier(n_estimators=5, max_depth=3)
+    model.fit(df.drop('Class', axis=1), df['Class'])
+    return model
+
+class SlowModel:
+    """Wraps a model and sleeps in predict_proba, recording the batch sizes it saw"""
+
+    def __init__(self, model, seconds):
+        self.model = model
+        self.seconds = seconds
+        self.feature_names_in_ = model.feature_names_in_
+        self.batches = []
+
+    def predict_proba(self, X):
+        self.batches.append(len(X))
+        time.sleep(self.seconds)
+        return self.model.predict_proba(X)
+
+def mock_transactions(n):
+    return create_mock_data().drop('Class', axis=1).head(n).to_dict(orient='records')
+
+def test_concurrent_requests_get_their_own_scores(trained_model):
+    transactions = mock_transactions(50)
+    expected = score_transactions(trained_model, transactions)
+
+    async def run():
+        async with AsyncScorer(trained_model, max_batch_size=16, max_wait_ms=5, timeout_ms=5000) as scorer:
+            singles = await asyncio.gather(*(scorer.score(txn) for txn in transactions[:40]))
+            many = await scorer.score_many(transactions[40:])
+            return singles, many, scorer.metrics()
+
+    singles, many, metrics = asyncio.run(run())
+    np.testing.assert_allclose(np.concatenate([singles, many]), expected, rtol=1e-6)
+    assert metrics['requests'] == 41 and metrics['transactions'] == 50
+    assert metrics['batches'] < 41
+    assert metrics['pending_transactions'] == 0
+    assert metrics['queue_wait_ms']['p50'] is not None and metrics['compute_ms']['p99'] is not None
+
+def test_rejects_when_pending_limit_reached(trained_model):
+    model = SlowModel(trained_model, 0.2)
+    transactions = mock_transactions(30)
+
+    async def run():
+        async with AsyncScorer(model, max_batch_size=10, max_wait_ms=1, n_workers=1,
+                               max_pending=20, timeout_ms=5000) as scorer:
+            accepted = [asyncio.ensure_future(scorer.score_many(transactions[i:i + 10])) for i in (0, 10)]
+            await asyncio.sleep(0)
+            with pytest.raises(ScorerOverloaded):
+                await scorer.score_many(transactions[20:])
+            await asyncio.gather(*accepted)
+            # Capacity comes back once the earlier requests are answered
+            await scorer.score_many(transactions[20:])
+            return scorer.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics['rejected'] == 1
+    assert metrics['pending_transactions'] == 0
+
+def test_deadline_and_cancellation(trained_model):
+    model = SlowModel(trained_model, 0.2)
+    transactions = mock_transactions(3)
+
+    async def run():
+        async with AsyncScorer(model, max_batch_size=1, max_wait_ms=0, n_workers=1, timeout_ms=5000) as scorer:
+            busy = asyncio.ensure_future(scorer.score(transactions[0]))
+            await asyncio.sleep(0.01)
+            # Queued behind the busy worker: misses its deadline, the other is cancelled
+            with pytest.raises(DeadlineExceeded):
+                await scorer.score(transactions[1], timeout_ms=50)
+            cancelled = asyncio.ensure_future(scorer.score(transactions[2]))
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            await busy
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+            return scorer.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics['expired'] == 1 and metrics['cancelled'] == 1
+    # Neither the expired nor the cancelled request reached the model
+    assert model.batches == [1]
+
+def test_malformed_request_fails_alone(trained_model):
+    """Good and bad requests sent together: only the bad one fails"""
+    transactions = mock_transactions(6)
+    bad = dict(transactions[0])
+    del bad['V3']
+
+    async def run():
+        async with AsyncScorer(trained_model, max_batch_size=16, max_wait_ms=20, timeout_ms=5000) as scorer:
+            results = await asyncio.gather(scorer.score_many(transactions[:3]), scorer.score_many([bad]),
+                                           scorer.score_many(transactions[3:]), return_exceptions=True)
+            return results, scorer.metrics()
+
+    (first, failed, second), metrics = asyncio.run(run())
+    assert isinstance(failed, ValueError) and "missing field 'V3'" in str(failed)
+    np.testing.assert_allclose(np.concatenate([first, second]), score_transactions(trained_model, transactions),
+                               rtol=1e-6)
+    # The two good requests still shared one micro-batch
+    assert metrics['batches'] == 1 and metrics['invalid'] == 1 and metrics['failed'] == 0
@@ -0,0 +1,79 @@
+"""
+Unit tests for batch scoring
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from preprocess import feature_engineering
+from batch_score import batch_score, read_chunks
+from test_preprocess import create_mock_data
+
+@pytest.fixture(scope='module')
+def data():
+    df = create_mock_data(n_samples=5000, fraud_rate=0.02)
+    features = feature_engineering(df, verbose=False)
+    X = features.drop('Class', axis=1)
+    model = xgb.XGBClassifier(n_estimators=10, max_depth=3)
+    model.fit(X, features['Class'])
+    return df, model, model.predict_proba(X)[:, 1]
+
+def test_read_chunks_covers_file(data, tmp_path):
+    df, _, _ = data
+    path = str(tmp_path / 'transactions.csv')
+    df.to_csv(path, index=False)
+
+    sizes = [len(chunk) for chunk in read_chunks(path, chunk_size=1200)]
+    assert sizes == [1200, 1200, 1200, 1200, 200]
+
+def test_batch_score_matches_predict_proba(data, tmp_path):
+    """Chunks scored in parallel are written back complete and in input order"""
+    df, model, expected = data
+    input_path, output_path = str(tmp_path / 'transactions.csv'), str(tmp_path / 'scores.csv')
+    df.drop('Class', axis=1).to_csv(input_path, index=False)
+    n_jobs = model.get_params()['n_jobs']
+
+    stats = batch_score(input_path, output_path, model, chunk_size=700, n_workers=3, threshold=0.5)
+    scores = pd.read_csv(output_path)
+
+    # The caller's model keeps its own settings
+    assert model.get_params()['n_jobs'] == n_jobs
+    assert stats['rows'] == len(df)
+    assert list(scores['row']) == list(range(len(df)))
+    np.testing.assert_allclose(scores['fraud_probability'], expected, rtol=1e-5)
+    assert (scores['is_fraud'] == (scores['fraud_probability'] >= 0.5)).all()
+    assert stats['flagged'] == scores['is_fraud'].sum()
+
+def test_batch_score_velocity_state_spans_chunks(tmp_path):
+    """Velocity features carry over between chunks like a full backfill"""
+    rng = np.random.default_rng(0)
+    df = create_mock_data(n_samples=3000, fraud_rate=0.02)
+    df['card_id'] = rng.integers(0, 50, len(df))
+    df = df.sort_values('Time', kind='stable').reset_index(drop=True)
+
+    features = feature_engineering(df, verbose=False)
+    X = features.drop('Class', axis=1)
+    model = xgb.XGBClassifier(n_estimators=10, max_depth=3).fit(X, features['Class'])
+    expected = model.predict_proba(X)[:, 1]
+
+    input_path, output_path = str(tmp_path / 'transactions.csv'), str(tmp_path / 'scores.csv')
+    df.drop('Class', axis=1).to_csv(input_path, index=False)
+    batch_score(input_path, output_path, model, chunk_size=500, n_workers=2, threshold=0.5)
+
+    np.testing.assert_allclose(pd.read_csv(output_path)['fraud_probability'], expected, rtol=1e-5)
+
+def test_batch_score_checks_drift(data, tmp_path, monkeypatch):
+    """With a saved reference, the merged chunk sketches are compared against it"""
+    import drift_monitor
+    from drift_monitor import DriftMonitor, save_reference
+    monkeypatch.setattr(drift_monitor, 'MODELS_PATH', str(tmp_path))
+
+    df, model, _ = data
+    features = feature_engineering(df, verbose=False)[list(model.feature_names_in_)]
+    save_reference(DriftMonitor.from_reference(features))
+
+    input_path, output_path = str(tmp_path / 'transactions.csv'), str(tmp_path / 'scores.csv')
+    df.drop('Class', axis=1).to_csv(input_path, index=False)
+    stats = batch_score(input_path, output_path, model, chunk_size=700, n_workers=3, threshold=0.5)
+
+    assert stats['drifted_features'] == []
@@ -0,0 +1,40 @@
+"""
+Unit tests for the benchmark suite
+"""
+import pytest
+from benchmark import compare_to_baseline, run_benchmarks, precision_check, mock_data_with_signal
+
+def test_run_benchmarks_records_every_stage():
+    """Each stage reports wall time, throughput and peak memory"""
+    results = run_benchmarks(n_rows=2000, fraud_rate=0.02, repeat=1, single_row_calls=5)
+
+    assert set(results['stages']) == {
+        'load_data', 'feature_engineering', 'split_data', 'apply_smote',
+        'train_xgboost', 'predict_single', 'predict_batch'
+    }
+    for stage in results['stages'].values():
+        assert stage['wall_s'] > 0
+        assert stage['rows_per_s'] > 0
+        assert stage['peak_mb'] >= 0
+
+def test_compare_to_baseline():
+    """Only stages slower than baseline beyond the tolerance are reported"""
+    baseline = {'stages': {'load_data': {'wall_s': 1.0}, 'split_data': {'wall_s': 1.0}}}
+    results = {'stages': {'load_data': {'wall_s': 1.1}, 'split_data': {'wall_s': 1.5},
+                          'apply_smote': {'wall_s': 9.0}}}
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.25)
+
+    assert [r['stage'] for r in regressions] == ['split_data']
+
+def test_precision_check_float32_matches_float64():
+    """float32 features halve the training matrix without changing the model's accuracy"""
+    check = precision_check(mock_data_with_signal(5000, fraud_rate=0.02), dtypes=('float64', 'float32'))
+    runs = check['runs']
+
+    assert check['passed']
+    assert runs['float32']['train_matrix_mb'] == pytest.approx(runs['float64']['train_matrix_mb'] / 2)
+    assert runs['float32']['auc_delta'] <= 0.001
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,62 @@
+"""
+Unit tests for the cascade scorer
+"""
+import joblib
+import numpy as np
+import pytest
+from sklearn.model_selection import train_test_split
+from preprocess import feature_engineering, split_data
+from train_model import train_xgboost
+from serve import score_transactions
+from cascade import train_screen, calibrate_cascade, cascade_report, CascadeModel
+from benchmark import mock_data_with_signal
+
+@pytest.fixture(scope='module')
+def trained():
+    raw = mock_data_with_signal(20000, fraud_rate=0.02, shift=1.0)
+    X_train, X_test, y_train, y_test = split_data(feature_engineering(raw, verbose=False))
+    model = train_xgboost(X_train, y_train)
+    screen = train_screen(X_train, y_train, 'Logistic Regression')
+    X_cal, X_hold, y_cal, y_hold = train_test_split(X_test, y_test, test_size=0.5,
+                                                    random_state=0, stratify=y_test)
+    return raw, model, screen, X_cal, X_hold, y_cal, y_hold
+
+def caught(model, X, y, threshold):
+    return (np.asarray(y) == 1) & (model.predict_proba(X)[:, 1] >= threshold)
+
+@pytest.mark.parametrize('max_recall_loss', [0.0, 0.05])
+def test_calibration_bounds_recall_loss(trained, max_recall_loss):
+    _, model, screen, X_cal, _, y_cal, _ = trained
+    cascade = calibrate_cascade(screen, model, X_cal, y_cal, max_recall_loss, threshold=0.3)
+
+    full = caught(model, X_cal, y_cal, 0.3).sum()
+    cascaded = caught(cascade, X_cal, y_cal, 0.3).sum()
+    assert cascade.clear_below <= 0.3
+    assert full > 0
+    assert (full - cascaded) / full <= max_recall_loss
+    assert cascade.escalated(X_cal).mean() < 1.0
+
+def test_escalated_rows_get_full_model_scores(trained):
+    _, model, screen, X_cal, X_hold, y_cal, _ = trained
+    cascade = CascadeModel(screen, model, clear_below=0.2)
+
+    proba = cascade.predict_proba(X_hold)[:, 1]
+    escalated = cascade.escalated(X_hold)
+    np.testing.assert_allclose(proba[escalated], model.predict_proba(X_hold)[:, 1][escalated], rtol=1e-6)
+    assert (proba[~escalated] < 0.2).all()
+
+def test_report_and_serving(trained, tmp_path):
+    raw, model, screen, X_cal, X_hold, y_cal, y_hold = trained
+    cascade = calibrate_cascade(screen, model, X_cal, y_cal, 0.02, threshold=0.5)
+    result = cascade_report(cascade, X_hold, y_hold, threshold=0.5)
+
+    assert list(result['report']['Scorer']) == ['Full model', 'Cascade']
+    assert 0 < result['escalation_rate'] < 1
+    assert result['recall_loss'] <= 0.1
+
+    # Pickles like a plain model and scores raw transactions through the serving path
+    joblib.dump(cascade, tmp_path / 'cascade.pkl')
+    loaded = joblib.load(tmp_path / 'cascade.pkl')
+    transactions = raw.drop('Class', axis=1).head(20).to_dict(orient='records')
+    expected = cascade.predict_proba(feature_engineering(raw.head(20), verbose=False).drop('Class', axis=1))[:, 1]
+    np.testing.assert_allclose(score_transactions(loaded, transactions), expected, rtol=1e-5)
@@ -0,0 +1,47 @@
+"""
+Unit tests for cross-validation
+"""
+import numpy as np
+import pytest
+from preprocess import feature_engineering
+from cross_validate import cv_splits, cross_validate, summarise_folds
+from test_preprocess import create_mock_data
+
+@pytest.fixture(scope='module')
+def data():
+    df = create_mock_data(n_samples=2000, fraud_rate=0.05)
+    times = df['Time'].to_numpy()
+    df = feature_engineering(df, verbose=False)
+    return df.drop('Class', axis=1), df['Class'], times
+
+def test_stratified_splits_partition_rows(data):
+    X, y, _ = data
+    splits = cv_splits(y, n_folds=4, method='stratified')
+
+    test_rows = np.concatenate([test for _, test in splits])
+    assert np.array_equal(np.sort(test_rows), np.arange(len(y)))
+    for train, test in splits:
+        assert not np.intersect1d(train, test).size
+        assert y.iloc[test].mean() == pytest.approx(y.mean(), abs=0.01)
+
+def test_time_splits_train_on_the_past(data):
+    X, y, times = data
+    for train, test in cv_splits(y, n_folds=3, method='time', times=times):
+        assert times[train].max() <= times[test].min()
+
+def test_parallel_folds_match_serial(data):
+    """Fold workers on the shared memmap give the same metrics as running in-process"""
+    X, y, _ = data
+    serial = cross_validate(X, y, 'Logistic Regression', n_folds=3, n_workers=1)
+    parallel = cross_validate(X, y, 'Logistic Regression', n_folds=3, n_workers=3)
+
+    assert list(parallel['Fold']) == [0, 1, 2]
+    assert np.allclose(serial['ROC-AUC'], parallel['ROC-AUC'])
+    assert (parallel['Fit Time (s)'] > 0).all()
+
+def test_summary_interval_contains_mean(data):
+    X, y, _ = data
+    summary = summarise_folds(cross_validate(X, y, 'XGBoost', n_folds=3, n_workers=1))
+
+    recall = summary.set_index('Metric').loc['Recall']
+    assert recall['CI Low'] <= recall['Mean'] <= recall['CI High']
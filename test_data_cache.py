@@ -0,0 +1,85 @@
+"""
+Unit tests for the columnar data cache
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import data_cache
+import preprocess
+from test_preprocess import create_mock_data
+
+@pytest.fixture
+def csv_file(tmp_path, monkeypatch):
+    """Mock dataset written to CSV, with the cache redirected to a temp folder"""
+    monkeypatch.setattr(data_cache, 'CACHE_PATH', str(tmp_path / 'cache'))
+    path = tmp_path / 'creditcard.csv'
+    create_mock_data().to_csv(path, index=False)
+    return str(path)
+
+def test_cache_round_trip(csv_file):
+    """Cached data matches the CSV with float32 V columns"""
+    expected = pd.read_csv(csv_file)
+    df = data_cache.load_cached(csv_file)
+
+    assert list(df.columns) == list(expected.columns)
+    assert df['V1'].dtype == np.float32
+    assert df['Class'].dtype == np.int8
+    np.testing.assert_allclose(df['V1'], expected['V1'], rtol=1e-6)
+    np.testing.assert_array_equal(df['Amount'], expected['Amount'])
+
+def test_cache_follows_feature_dtype(csv_file):
+    """V columns are stored at the requested dtype, each dtype in its own cache"""
+    expected = pd.read_csv(csv_file)
+    narrow = data_cache.load_cached(csv_file, dtype='float32')
+    wide = data_cache.load_cached(csv_file, dtype='float64')
+
+    assert narrow['V1'].dtype == np.float32
+    assert wide['V1'].dtype == np.float64
+    # Not float32 values upcast: the float64 cache keeps the CSV's full precision
+    np.testing.assert_array_equal(wide['V1'], expected['V1'])
+
+def test_second_load_skips_csv(csv_file, monkeypatch):
+    """Once built, the cache is used without parsing the CSV again"""
+    data_cache.load_cached(csv_file)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("CSV should not be parsed again")
+    monkeypatch.setattr(data_cache.pd, 'read_csv', fail)
+
+    df = data_cache.load_cached(csv_file)
+    assert len(df) == 1000
+
+def test_cache_invalidated_on_change(csv_file):
+    """Changing the source file produces a new cache entry"""
+    key_before = data_cache.source_key(csv_file)
+    create_mock_data().head(500).to_csv(csv_file, index=False)
+
+    assert data_cache.source_key(csv_file) != key_before
+    assert len(data_cache.load_cached(csv_file)) == 500
+
+def test_stage_cache_skips_smote(tmp_path, monkeypatch):
+    """A repeat pipeline run loads the resampled data instead of recomputing it"""
+    monkeypatch.setattr(data_cache, 'CACHE_PATH', str(tmp_path / 'cache'))
+    df = create_mock_data()
+    df.loc[df.index[:50], 'Class'] = 1
+    path = str(tmp_path / 'creditcard.csv')
+    df.to_csv(path, index=False)
+
+    first = preprocess.preprocess_pipeline(path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("SMOTE should not run again")
+    monkeypatch.setattr(preprocess, 'apply_smote', fail)
+
+    second = preprocess.preprocess_pipeline(path)
+    for a, b in zip(first, second):
+        assert a.equals(b)
+
+def test_resampled_key_covers_smote_settings(monkeypatch):
+    """Changing a SMOTE setting misses the cache instead of returning stale resampled data"""
+    key = preprocess.resampled_stage_key('split-key')
+    monkeypatch.setattr(preprocess, 'SMOTE_K_NEIGHBORS', preprocess.SMOTE_K_NEIGHBORS + 1)
+    assert preprocess.resampled_stage_key('split-key') != key
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
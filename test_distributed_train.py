@@ -0,0 +1,51 @@
+"""
+Unit tests for distributed training
+"""
+import numpy as np
+import pytest
+from sklearn.metrics import roc_auc_score
+from preprocess import feature_engineering, split_data
+from train_model import train_xgboost
+from distributed_train import assign_shards, write_shards, train_distributed, scaling_report
+from benchmark import mock_data_with_signal
+
+@pytest.fixture(scope='module')
+def data():
+    return split_data(feature_engineering(mock_data_with_signal(6000, fraud_rate=0.05), verbose=False))
+
+def test_write_shards_keeps_every_row(data, tmp_path):
+    X_train, _, y_train, _ = data
+    paths = write_shards(X_train, y_train, 3, str(tmp_path))
+
+    X_parts = [np.load(X_path) for X_path, _ in paths]
+    y_parts = [np.load(y_path) for _, y_path in paths]
+    assert sum(len(part) for part in y_parts) == len(y_train)
+    assert all(part.sum() > 0 for part in y_parts)  # shuffled, so every shard has fraud rows
+    assert np.isclose(np.concatenate(X_parts).sum(dtype=np.float64),
+                      X_train.to_numpy().sum(dtype=np.float64), rtol=1e-6)
+
+def test_assign_shards_round_robin():
+    assert assign_shards(list('abcde'), 2) == [['a', 'c', 'e'], ['b', 'd']]
+    with pytest.raises(ValueError):
+        assign_shards(['a'], 2)
+
+def test_distributed_matches_single_process(data):
+    """Two workers sharing sketches and histograms learn a model as good as one process"""
+    X_train, X_test, y_train, y_test = data
+    model, stats = train_distributed(X_train, y_train, n_workers=2)
+    single = train_xgboost(X_train, y_train)
+
+    assert stats['workers'] == 2 and stats['rows'] == len(y_train)
+    assert list(model.feature_names_in_) == list(X_train.columns)
+    distributed_auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    single_auc = roc_auc_score(y_test, single.predict_proba(X_test)[:, 1])
+    assert distributed_auc == pytest.approx(single_auc, abs=0.02)
+
+def test_scaling_report(data):
+    X_train, X_test, y_train, y_test = data
+    report = scaling_report(X_train, y_train, X_test, y_test, worker_counts=[1, 2])
+
+    assert list(report['Workers']) == [1, 2]
+    assert report.loc[0, 'Speedup'] == 1.0 and report.loc[0, 'Efficiency'] == 1.0
+    assert (report['Efficiency'] > 0).all()
+    assert (report['ROC-AUC'] > 0.8).all()
@@ -0,0 +1,81 @@
+"""
+Unit tests for drift monitoring
+"""
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp
+from drift_monitor import DriftMonitor
+
+def make_frame(n, seed, shift=0.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'V1': rng.normal(shift, 1.0, n),
+        'V2': rng.exponential(1.0, n),
+        'Hour': rng.uniform(0, 24, n)
+    })
+
+@pytest.fixture(scope='module')
+def reference():
+    return DriftMonitor.from_reference(make_frame(20000, seed=0), n_bins=20)
+
+def _sketch(args):
+    reference_state, seed = args
+    monitor = DriftMonitor.from_dict(reference_state).empty_like()
+    return monitor.update(make_frame(5000, seed)).to_dict()
+
+def test_merged_parts_equal_single_pass(reference):
+    data = make_frame(9000, seed=1)
+    whole = reference.empty_like().update(data)
+    merged = reference.empty_like()
+    for part in np.array_split(np.arange(len(data)), 4):
+        merged.merge(reference.empty_like().update(data.iloc[part]))
+
+    assert merged.to_dict() == whole.to_dict()
+
+def test_merge_across_processes(reference):
+    """Sketches built in worker processes merge into the same state as one process"""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(2) as pool:
+        states = pool.map(_sketch, [(reference.to_dict(), seed) for seed in (1, 2, 3)])
+
+    merged = reference.empty_like()
+    for state in states:
+        merged.merge(DriftMonitor.from_dict(state))
+    expected = reference.empty_like()
+    for seed in (1, 2, 3):
+        expected.update(make_frame(5000, seed))
+
+    assert merged.to_dict() == expected.to_dict()
+
+def test_detects_shifted_feature_only(reference):
+    report = reference.empty_like().update(make_frame(10000, seed=2, shift=0.5)).compare(reference)
+    report = report.set_index('feature')
+
+    assert report.loc['V1', 'drift']
+    assert not report.loc['V2', 'drift'] and not report.loc['Hour', 'drift']
+    assert report.loc['V1', 'psi'] > 0.2 > report.loc['V2', 'psi']
+
+def test_binned_ks_close_to_exact(reference):
+    current = make_frame(10000, seed=3, shift=0.3)
+    report = reference.empty_like().update(current).compare(reference).set_index('feature')
+    exact = ks_2samp(make_frame(20000, seed=0)['V1'], current['V1']).statistic
+
+    assert report.loc['V1', 'ks'] <= exact + 1e-9
+    assert report.loc['V1', 'ks'] == pytest.approx(exact, abs=0.03)
+
+def test_quality_counters(reference):
+    data = make_frame(1000, seed=4)
+    data.loc[:9, 'V1'] = np.nan
+    data.loc[10:14, 'Hour'] = 30.0
+    report = reference.empty_like().update(data).compare(reference).set_index('feature')
+
+    assert report.loc['V1', 'null_rate'] == pytest.approx(0.01)
+    assert report.loc['Hour', 'above_range_rate'] == pytest.approx(0.005)
+    assert report.loc['Hour', 'max'] == 30.0
+
+def test_merge_rejects_different_bins(reference):
+    other = DriftMonitor.from_reference(make_frame(1000, seed=5), n_bins=10)
+    with pytest.raises(ValueError):
+        reference.empty_like().merge(other)
@@ -0,0 +1,58 @@
+"""
+Unit tests for per-transaction reason codes
+"""
+import numpy as np
+import pytest
+import xgboost as xgb
+from explain import Explainer, top_reasons, format_reasons
+
+@pytest.fixture(scope='module')
+def model_and_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 8)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 3] > 1.5).astype(int)
+    model = xgb.XGBClassifier(n_estimators=20, max_depth=3).fit(X, y)
+    return model, X, model.predict_proba(X)[:, 1]
+
+def test_top_reasons_match_full_sort():
+    rng = np.random.default_rng(1)
+    contributions = rng.normal(size=(50, 12))
+    names = [f'f{j}' for j in range(12)]
+    reasons = top_reasons(contributions, names, k=4)
+
+    for row, row_reasons in zip(contributions, reasons):
+        expected = [(names[j], row[j]) for j in np.argsort(-row)[:4] if row[j] > 0]
+        assert [name for name, _ in row_reasons] == [name for name, _ in expected]
+        assert [value for _, value in row_reasons] == pytest.approx([value for _, value in expected])
+
+def test_only_flagged_rows_are_explained(model_and_data):
+    model, X, proba = model_and_data
+    reasons = Explainer(model, k=2).explain(X[:200], proba[:200], threshold=0.5)
+
+    for p, row in zip(proba[:200], reasons):
+        assert (row is None) == (p < 0.5)
+    flagged = [row for row in reasons if row is not None]
+    assert flagged and all(row[0][0] in ('f0', 'f3') for row in flagged)
+
+def test_contributions_add_up_to_margin(model_and_data):
+    model, X, _ = model_and_data
+    explainer = Explainer(model)
+    margin = model.get_booster().predict(xgb.DMatrix(X[:20]), output_margin=True)
+    full = model.get_booster().predict(xgb.DMatrix(X[:20]), pred_contribs=True)
+
+    np.testing.assert_allclose(explainer.contributions(X[:20]).sum(axis=1) + full[:, -1], margin, rtol=1e-4, atol=1e-4)
+
+def test_cache_reuses_and_evicts(model_and_data):
+    model, X, proba = model_and_data
+    flagged = np.flatnonzero(proba >= 0.5)[:10]
+    explainer = Explainer(model, cache_size=5)
+
+    first = explainer.explain(X[flagged], proba[flagged], threshold=0.5)
+    assert explainer.misses == 10 and len(explainer._cache) == 5
+
+    again = explainer.explain(X[flagged[-5:]], proba[flagged[-5:]], threshold=0.5)
+    assert explainer.hits == 5
+    assert again == first[-5:]
+
+def test_format_reasons():
+    assert format_reasons([('V14', 2.3101), ('V4', -0.5)]) == 'V14:+2.310;V4:-0.500'
@@ -0,0 +1,86 @@
+"""
+Unit tests for run instrumentation
+"""
+import json
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+import pytest
+import instrument
+from instrument import stage, instrumented, configure, records, reset, write_report
+
+@pytest.fixture(autouse=True)
+def clean_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrument, 'REPORTS_PATH', str(tmp_path))
+    reset()
+    yield
+    configure(profile=[], trace_memory=[])
+    reset()
+
+@instrumented()
+def make_frame(n):
+    return pd.DataFrame({'a': np.arange(n)})
+
+@instrumented(rows_arg=1)
+def summarise(label, df):
+    return {'label': label, 'total': int(df['a'].sum())}
+
+def test_stages_record_nesting_and_rows():
+    with stage('outer'):
+        df = make_frame(500)
+        summarise('x', df)
+
+    by_name = {r['stage']: r for r in records()}
+    assert by_name['make_frame']['rows'] == 500
+    assert by_name['summarise']['rows'] == 500
+    assert by_name['make_frame']['parent'] == 'outer'
+    assert by_name['outer']['parent'] is None
+    assert by_name['outer']['wall_s'] >= by_name['make_frame']['wall_s']
+    assert all(r['peak_rss_mb'] > 0 for r in records())
+
+def test_profile_and_trace_memory_chosen_stage():
+    configure(profile=['make_frame'], trace_memory=['make_frame'])
+    make_frame(100000)
+    summarise('x', make_frame(10))
+
+    profiled = [r for r in records() if 'profile' in r]
+    assert len(profiled) == 2 and all(r['stage'] == 'make_frame' for r in profiled)
+    assert profiled[0]['profile']['top']
+    assert profiled[0]['memory']['traced_peak_mb'] > 0.5
+    assert 'profile' not in next(r for r in records() if r['stage'] == 'summarise')
+
+@instrumented()
+def chatty(n, verbose=True):
+    return make_frame(n)
+
+def test_verbose_false_silences_stage_and_children(capsys):
+    chatty(10, verbose=False)
+    assert capsys.readouterr().out == ''
+    chatty(10)
+    out = capsys.readouterr().out
+    assert '[make_frame]' in out and '[chatty]' in out
+    assert len(records()) == 4
+
+def test_repeated_profiles_kept_and_records_capped(tmp_path, monkeypatch):
+    configure(profile=['make_frame'])
+    make_frame(10)
+    make_frame(10)
+    files = [r['profile']['file'] for r in records()]
+    assert len(set(files)) == 2 and all(os.path.exists(f) for f in files)
+
+    monkeypatch.setattr(instrument, '_records', deque(maxlen=3))
+    for _ in range(5):
+        summarise('x', make_frame(1))
+    report = instrument.run_report()
+    assert len(report['stages']) == 3
+    assert report['dropped_stages'] == 9
+
+def test_write_report(tmp_path):
+    make_frame(10)
+    path = write_report(str(tmp_path / 'run.json'))
+    with open(path) as f:
+        report = json.load(f)
+
+    assert [s['stage'] for s in report['stages']] == ['make_frame']
+    assert report['environment']['cpu_count'] >= 1
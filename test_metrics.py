@@ -0,0 +1,81 @@
+"""
+Unit tests for the single-pass metrics engine
+"""
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import metrics as skm
+from metrics import ScoreCounts, ScoreHistogram, confusion_matrix, classification_report, histogram_from_file
+
+@pytest.fixture(scope='module')
+def scores():
+    rng = np.random.default_rng(1)
+    y = (rng.random(20000) < 0.03).astype(int)
+    proba = np.clip(rng.normal(0.25 + 0.4 * y, 0.15), 0, 1)
+    # Round a third of the scores so that ties are covered
+    proba[::3] = np.round(proba[::3], 2)
+    return y, proba
+
+def test_counts_match_sklearn(scores):
+    y, proba = scores
+    counts = ScoreCounts.from_scores(y, proba)
+
+    assert counts.roc_auc() == pytest.approx(skm.roc_auc_score(y, proba), abs=1e-12)
+    assert counts.average_precision() == pytest.approx(skm.average_precision_score(y, proba), abs=1e-12)
+    for threshold in (0.0, 0.3, 0.5, 0.71, 1.1):
+        y_pred = (proba >= threshold).astype(int)
+        np.testing.assert_array_equal(counts.confusion_matrix(threshold),
+                                      skm.confusion_matrix(y, y_pred, labels=[0, 1]))
+        np.testing.assert_array_equal(confusion_matrix(y, y_pred), skm.confusion_matrix(y, y_pred, labels=[0, 1]))
+
+    metrics = counts.metrics(0.5)
+    y_pred = (proba >= 0.5).astype(int)
+    assert metrics['precision'] == pytest.approx(skm.precision_score(y, y_pred))
+    assert metrics['recall'] == pytest.approx(skm.recall_score(y, y_pred))
+    assert metrics['f1'] == pytest.approx(skm.f1_score(y, y_pred))
+    assert metrics['accuracy'] == pytest.approx(skm.accuracy_score(y, y_pred))
+
+def test_curves_cover_sklearn_points(scores):
+    """sklearn drops collinear ROC points, so every one of its points is on our curve"""
+    y, proba = scores
+    fpr, tpr, _ = ScoreCounts.from_scores(y, proba).roc_curve()
+    sk_fpr, sk_tpr, _ = skm.roc_curve(y, proba)
+    ours = set(zip(fpr.round(12), tpr.round(12)))
+    assert set(zip(sk_fpr.round(12), sk_tpr.round(12))) <= ours
+
+    recall, precision, _ = ScoreCounts.from_scores(y, proba).pr_curve()
+    sk_precision, sk_recall, _ = skm.precision_recall_curve(y, proba)
+    assert set(zip(sk_recall.round(12), sk_precision.round(12))) == set(zip(recall.round(12), precision.round(12)))
+
+def test_classification_report_layout(scores):
+    y, proba = scores
+    y_pred = (proba >= 0.5).astype(int)
+    assert classification_report(confusion_matrix(y, y_pred)) == skm.classification_report(y, y_pred)
+
+def test_chunked_histogram_merge(scores, tmp_path):
+    y, proba = scores
+    whole = ScoreHistogram().update(y, proba)
+
+    # Shards built separately, serialised and merged give the same counts
+    shards = [ScoreHistogram().update(y[rows], proba[rows]) for rows in np.array_split(np.arange(len(y)), 7)]
+    merged = ScoreHistogram.from_dict(json.loads(json.dumps(shards[0].to_dict())))
+    for shard in shards[1:]:
+        merged.merge(shard)
+    np.testing.assert_array_equal(merged.positives, whole.positives)
+    np.testing.assert_array_equal(merged.negatives, whole.negatives)
+
+    # Exact at bin edges, close to the exact AUCs elsewhere
+    exact = ScoreCounts.from_scores(y, proba)
+    binned = merged.counts()
+    np.testing.assert_array_equal(binned.confusion_matrix(0.5), exact.confusion_matrix(0.5))
+    assert binned.roc_auc() == pytest.approx(exact.roc_auc(), abs=1e-4)
+    assert binned.average_precision() == pytest.approx(exact.average_precision(), abs=1e-3)
+
+    path = tmp_path / 'scored.csv'
+    pd.DataFrame({'Class': y, 'fraud_probability': proba}).to_csv(path, index=False)
+    from_file = histogram_from_file(path, chunk_size=3000)
+    np.testing.assert_array_equal(from_file.positives, whole.positives)
+
+    with pytest.raises(ValueError):
+        merged.merge(ScoreHistogram(n_bins=16))
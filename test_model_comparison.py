@@ -0,0 +1,39 @@
+"""
+Unit tests for the model comparison engine
+"""
+import numpy as np
+import pytest
+import train_model
+from model_comparison import MODEL_NAMES, TIMING_COLUMNS, make_model, train_and_evaluate_models
+from preprocess import feature_engineering, split_data
+from test_preprocess import create_mock_data
+
+def test_parallel_comparison_matches_sequential():
+    """Process-pool comparison gives the same metrics as running models in turn"""
+    df = create_mock_data()
+    df.loc[df['V1'] > 1.5, 'Class'] = 1
+    X_train, X_test, y_train, y_test = split_data(feature_engineering(df, verbose=False))
+
+    sequential = train_and_evaluate_models(X_train, X_test, y_train, y_test, n_workers=1)
+    parallel = train_and_evaluate_models(X_train, X_test, y_train, y_test, n_workers=3)
+
+    assert list(parallel['Model']) == MODEL_NAMES
+    for col in TIMING_COLUMNS:
+        assert (parallel[col] > 0).all()
+    for col in ['Accuracy', 'Recall', 'ROC-AUC']:
+        assert parallel[col].tolist() == pytest.approx(sequential[col].tolist(), abs=1e-6)
+
+@pytest.mark.parametrize('method', ['smote', 'scale_pos_weight'])
+def test_xgboost_candidate_weighted_like_train_xgboost(monkeypatch, method):
+    """Comparison, CV and cascade XGBoost models get the class weight train_xgboost uses"""
+    monkeypatch.setattr(train_model, 'RESAMPLING_METHOD', method)
+    y = np.array([0] * 90 + [1] * 10)
+
+    params = make_model('XGBoost', y_train=y).get_params()
+    if method == 'scale_pos_weight':
+        assert params['scale_pos_weight'] == pytest.approx(9.0)
+    else:
+        assert params['scale_pos_weight'] is None
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,71 @@
+"""
+Unit tests for the model registry and incremental updates
+"""
+import numpy as np
+import pytest
+import xgboost as xgb
+from model_registry import (HotSwapModel, current_version, incremental_update, list_versions, load_version,
+                            register_model, set_current, split_update_batch, version_threshold)
+from preprocess import feature_engineering
+from test_preprocess import create_mock_data
+
+def labelled_batch(seed, n_samples=1500):
+    df = create_mock_data(n_samples=n_samples, seed=seed)
+    df.loc[df['V1'] > 1.5, 'Class'] = 1
+    df = feature_engineering(df, verbose=False)
+    return df.drop('Class', axis=1), df['Class']
+
+@pytest.fixture
+def registry(tmp_path):
+    X, y = labelled_batch(seed=1)
+    model = xgb.XGBClassifier(n_estimators=10, max_depth=3).fit(X, y)
+    path = str(tmp_path / 'registry')
+    register_model(model, {'mode': 'full'}, registry_path=path, threshold={'threshold': 0.7})
+    return path
+
+@pytest.mark.parametrize('mode, extra_trees', [('add_trees', 5), ('refresh', 0)])
+def test_incremental_update(registry, mode, extra_trees):
+    """New batches produce a new current version built on the previous booster"""
+    X_new, y_new = labelled_batch(seed=2, n_samples=500)
+    version = incremental_update(X_new, y_new, mode=mode, n_trees=5, registry_path=registry)
+
+    assert list_versions(registry) == ['v0001', 'v0002']
+    assert current_version(registry) == version == 'v0002'
+
+    before = load_version('v0001', registry)
+    after = load_version('v0002', registry)
+    assert after.get_booster().num_boosted_rounds() == before.get_booster().num_boosted_rounds() + extra_trees
+    assert not np.allclose(before.predict_proba(X_new), after.predict_proba(X_new))
+
+def test_hot_swap_and_rollback(registry):
+    """The serving wrapper follows CURRENT, including a rollback"""
+    serving = HotSwapModel(registry_path=registry)
+    assert serving.version == 'v0001'
+    assert not serving.refresh()
+
+    X_new, y_new = labelled_batch(seed=3, n_samples=500)
+    incremental_update(X_new, y_new, registry_path=registry)
+    assert serving.refresh()
+    assert serving.version == 'v0002'
+
+    set_current('v0001', registry)
+    assert serving.refresh()
+    assert serving.predict_proba(X_new).shape == (len(X_new), 2)
+
+def test_versions_keep_their_threshold(registry):
+    """Updates inherit the parent's threshold, or choose a new one on held-out rows"""
+    serving = HotSwapModel(registry_path=registry)
+    assert serving.threshold == 0.7
+
+    X_new, y_new = labelled_batch(seed=4, n_samples=500)
+    incremental_update(X_new, y_new, registry_path=registry)
+    assert version_threshold('v0002', registry) == 0.7
+
+    X_fit, X_cal, y_fit, y_cal = split_update_batch(*labelled_batch(seed=5, n_samples=2000))
+    assert X_cal is not None and len(X_fit) + len(X_cal) == 2000
+    incremental_update(X_fit, y_fit, registry_path=registry, X_cal=X_cal, y_cal=y_cal)
+    assert serving.refresh() and serving.version == 'v0003'
+    assert serving.threshold == version_threshold('v0003', registry) != 0.7
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
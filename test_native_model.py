@@ -0,0 +1,49 @@
+"""
+Unit tests for native and compiled model export
+"""
+import numpy as np
+import pytest
+import xgboost as xgb
+import native_model
+from native_model import CompiledModel, compile_model, export_compiled, export_native
+from preprocess import feature_engineering
+from test_preprocess import create_mock_data
+
+@pytest.fixture(scope='module')
+def data_and_model():
+    df = feature_engineering(create_mock_data(n_samples=2000, fraud_rate=0.05), verbose=False)
+    X = df.drop('Class', axis=1)
+    X.iloc[::11, 3] = np.nan  # exercise the default (missing value) direction
+    model = xgb.XGBClassifier(n_estimators=20, max_depth=4).fit(X, df['Class'])
+    return X, model
+
+def test_compiled_matches_xgboost(data_and_model):
+    """Vectorised traversal gives the same probabilities as XGBoost"""
+    X, model = data_and_model
+    compiled = CompiledModel(compile_model(model))
+
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-5)
+
+def test_compiled_single_transaction(data_and_model):
+    """A single feature dict scores the same as its row in a batch"""
+    X, model = data_and_model
+    compiled = CompiledModel(compile_model(model))
+    row = X.iloc[5].to_dict()
+
+    np.testing.assert_allclose(compiled.predict_proba(row)[0], compiled.predict_proba(X.iloc[[5]])[0])
+
+def test_export_round_trip(data_and_model, tmp_path, monkeypatch):
+    """Native and compiled exports load back to the same predictions"""
+    monkeypatch.setattr(native_model, 'MODELS_PATH', str(tmp_path))
+    X, model = data_and_model
+
+    native = xgb.Booster(model_file=export_native(model, 'model.ubj'))
+    compiled = CompiledModel.load(export_compiled(model, 'model.npz'))
+
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(native.predict(xgb.DMatrix(X)), expected, atol=1e-6)
+    np.testing.assert_allclose(compiled.predict_proba(X)[:, 1], expected, atol=1e-5)
+    assert list(compiled.feature_names_in_) == list(X.columns)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
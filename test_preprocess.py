@@ -4,18 +4,19 @@ Unit tests for preprocessing module
 import pytest
 import pandas as pd
 import numpy as np
-from preprocess import feature_engineering, split_data
+import data_cache
+from preprocess import (feature_engineering, split_data, apply_smote, FeatureTransformer,
+                        preprocess_pipeline, calibrated_preprocess_pipeline)
 
-def create_mock_data():
+def create_mock_data(n_samples=1000, fraud_rate=0.002, seed=42):
     """Create mock credit card data for testing"""
-    np.random.seed(42)
-    n_samples = 1000
+    np.random.seed(seed)
     
     # Create mock data similar to the real dataset
     data = pd.DataFrame({
         'Time': np.random.randint(0, 172800, n_samples),
         'Amount': np.random.exponential(scale=50, size=n_samples),
-        'Class': np.random.choice([0, 1], n_samples, p=[0.998, 0.002])
+        'Class': np.random.choice([0, 1], n_samples, p=[1 - fraud_rate, fraud_rate])
     })
     
     # Add V1-V28 features (mock PCA components)
@@ -40,6 +41,28 @@ def test_feature_engineering():
     assert df_features['Hour'].min() >= 0
     assert df_features['Hour'].max() < 48  # 172800 seconds / 3600 = 48 hours
 
+def test_feature_engineering_leaves_input_untouched():
+    """Feature engineering returns a new frame instead of mutating its input"""
+    df = create_mock_data()
+    original_columns = list(df.columns)
+    feature_engineering(df)
+    
+    assert list(df.columns) == original_columns
+
+def test_feature_transformer_inputs_agree():
+    """Dict, list of dicts, raw array and DataFrame inputs give the same features"""
+    df = create_mock_data()
+    transformer = FeatureTransformer().fit(df)
+    expected = feature_engineering(df)[transformer.feature_names].to_numpy(dtype=np.float32)
+    
+    np.testing.assert_array_equal(transformer.transform(df), expected)
+    np.testing.assert_array_equal(transformer.transform(df.to_dict(orient='records')), expected)
+    np.testing.assert_array_equal(transformer.transform(df[transformer.input_columns].to_numpy()), expected)
+    np.testing.assert_array_equal(transformer.transform(df.iloc[7].to_dict()), expected[7:8])
+    
+    rebuilt = FeatureTransformer.from_feature_names(transformer.feature_names)
+    assert rebuilt.feature_names == transformer.feature_names
+
 def test_split_data():
     """Test train/test split"""
     df = create_mock_data()
@@ -62,6 +85,22 @@ def test_split_data():
     test_ratio = len(X_test) / total
     assert 0.15 < test_ratio < 0.25  # Allow some variance
 
+def test_calibration_split_held_out_before_smote(tmp_path, monkeypatch):
+    """The calibration rows come from the train split, are not resampled, and the test split is unchanged"""
+    monkeypatch.setattr(data_cache, 'CACHE_PATH', str(tmp_path / 'cache'))
+    path = tmp_path / 'creditcard.csv'
+    create_mock_data(n_samples=5000, fraud_rate=0.02).to_csv(path, index=False)
+    
+    X_train, X_test, _, y_test = preprocess_pipeline(str(path), use_cache=False)
+    X_fit, X_cal, X_test_cal, y_fit, y_cal, y_test_cal = calibrated_preprocess_pipeline(str(path), use_cache=False)
+    
+    pd.testing.assert_frame_equal(X_test_cal, X_test)
+    np.testing.assert_array_equal(y_test_cal, y_test)
+    # Real transactions only: the calibration class balance matches the raw data
+    assert y_cal.mean() < 0.05 and y_cal.sum() > 0
+    assert not X_cal.index.isin(X_test.index).any()
+    assert len(X_fit) < len(X_train)
+
 def test_data_types():
     """Test that data types are correct"""
     df = create_mock_data()
@@ -70,5 +109,48 @@ def test_data_types():
     # All features should be numeric
     assert df.select_dtypes(include=[np.number]).shape[1] == len(df.columns)
 
+@pytest.mark.parametrize('dtype', ['float32', 'float64'])
+def test_feature_dtype_kept_through_smote(dtype):
+    """Features stay one contiguous matrix of the chosen dtype from feature engineering through SMOTE"""
+    df = feature_engineering(create_mock_data(n_samples=5000, fraud_rate=0.02), dtype=dtype)
+    X_train, X_test, y_train, y_test = split_data(df)
+    
+    for method in ('smote', 'fast_smote'):
+        X_res, _ = apply_smote(X_train, y_train, method=method)
+        for X in (X_train, X_test, X_res):
+            values = X.to_numpy()
+            assert values.dtype == dtype
+            assert values.flags['C_CONTIGUOUS']
+            # to_numpy() is a view, not a conversion copy
+            assert np.shares_memory(values, X.to_numpy())
+
+def test_fast_smote():
+    """Fast SMOTE matches the imblearn class ratio and interpolates within the minority class"""
+    df = feature_engineering(create_mock_data(n_samples=5000, fraud_rate=0.02))
+    X_train, X_test, y_train, y_test = split_data(df)
+    
+    X_res, y_res = apply_smote(X_train, y_train, method='fast_smote')
+    X_ref, y_ref = apply_smote(X_train, y_train, method='smote')
+    
+    assert dict(y_res.value_counts()) == dict(y_ref.value_counts())
+    assert list(X_res.columns) == list(X_train.columns)
+    assert (X_res.dtypes == np.float32).all()
+    
+    # Synthetic rows lie between minority points, so they stay inside the minority bounding box
+    minority = X_train[y_train.to_numpy() == 1]
+    synthetic = X_res.iloc[len(X_train):]
+    assert (synthetic.min() >= minority.min() - 1e-4).all()
+    assert (synthetic.max() <= minority.max() + 1e-4).all()
+
+def test_scale_pos_weight_skips_resampling():
+    """The scale_pos_weight mode leaves the training set untouched"""
+    df = feature_engineering(create_mock_data())
+    X_train, X_test, y_train, y_test = split_data(df)
+    
+    X_res, y_res = apply_smote(X_train, y_train, method='scale_pos_weight')
+    
+    assert X_res is X_train
+    assert y_res is y_train
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
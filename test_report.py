@@ -0,0 +1,40 @@
+"""
+Unit tests for headless figure rendering
+"""
+import os
+import numpy as np
+from report import decimate_curve, generate_figures
+from evaluate import evaluation_figures
+from visualize import eda_figures
+from test_preprocess import create_mock_data
+
+def test_decimate_curve_keeps_ends_and_budget():
+    x = np.linspace(0, 1, 100000)
+    y = np.sqrt(x)
+    xs, ys = decimate_curve(x, y, max_points=200)
+
+    assert len(xs) <= 202
+    assert (xs[0], ys[0], xs[-1], ys[-1]) == (0.0, 0.0, 1.0, 1.0)
+    assert np.all(np.diff(xs) > 0)
+    assert np.allclose(ys, np.sqrt(xs))
+
+def test_decimate_curve_leaves_short_curves():
+    xs, ys = decimate_curve([0, 0.5, 1], [0, 0.9, 1], max_points=10)
+    assert list(xs) == [0, 0.5, 1]
+
+def test_generate_figures_skips_unchanged(tmp_path):
+    df = create_mock_data(n_samples=2000, fraud_rate=0.05)
+    rng = np.random.default_rng(0)
+    y = df['Class'].to_numpy()
+    proba = np.clip(0.7 * y + rng.random(len(y)) * 0.5, 0, 1)
+    figures = eda_figures(df) + evaluation_figures(y, (proba >= 0.5).astype(int), proba)
+
+    rendered, skipped = generate_figures(figures, output_dir=str(tmp_path), n_workers=2, dpi=50)
+    assert len(rendered) == 7 and skipped == []
+    assert all(os.path.getsize(tmp_path / name) > 0 for name in rendered)
+
+    # Only the figures whose inputs changed are drawn again
+    figures = eda_figures(df) + evaluation_figures(y, (proba >= 0.3).astype(int), proba)
+    rendered, skipped = generate_figures(figures, output_dir=str(tmp_path), n_workers=1, dpi=50)
+    assert rendered == ['confusion_matrix.png']
+    assert len(skipped) == 6
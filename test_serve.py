@@ -0,0 +1,155 @@
+"""
+Unit tests for the scoring service
+"""
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+import xgboost as xgb
+from preprocess import feature_engineering
+from serve import MicroBatcher, create_server, score_transactions
+from test_preprocess import create_mock_data
+
+@pytest.fixture(scope='module')
+def trained_model():
+    """Small XGBoost model trained on mock data"""
+    df = feature_engineering(create_mock_data(), verbose=False)
+    df.loc[df.index[:20], 'Class'] = 1
+    X = df.drop('Class', axis=1)
+    model = xgb.XGBClassifier(n_estimators=5, max_depth=3)
+    model.fit(X, df['Class'])
+    return model
+
+def mock_transactions(n):
+    df = create_mock_data().drop('Class', axis=1).head(n)
+    return df.to_dict(orient='records')
+
+def test_score_transactions_matches_predict_proba(trained_model):
+    """Scoring raw transactions gives the same result as the training path"""
+    transactions = mock_transactions(10)
+    df = feature_engineering(create_mock_data().head(10), verbose=False)
+    expected = trained_model.predict_proba(df[trained_model.feature_names_in_])[:, 1]
+
+    np.testing.assert_allclose(score_transactions(trained_model, transactions), expected)
+
+def test_micro_batcher_concurrent_requests(trained_model):
+    """Concurrent requests each get back their own scores"""
+    transactions = mock_transactions(40)
+    expected = score_transactions(trained_model, transactions)
+    batcher = MicroBatcher(trained_model, max_batch_size=16, max_wait_ms=5)
+
+    futures = [batcher.submit([txn]) for txn in transactions]
+    results = np.concatenate([f.result(timeout=10) for f in futures])
+    batcher.close()
+
+    np.testing.assert_allclose(results, expected)
+
+def test_http_score_endpoint(trained_model):
+    """POST /score returns probabilities and fraud flags"""
+    server = create_server(trained_model, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        body = json.dumps(mock_transactions(3)).encode('utf-8')
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{server.server_port}/score', data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            result = json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.batcher.close()
+
+    assert len(result['fraud_probability']) == 3
+    assert len(result['is_fraud']) == 3
+
+def test_malformed_request_fails_alone(trained_model):
+    """A bad transaction fails only its own request, not the others in its batch"""
+    transactions = mock_transactions(4)
+    bad = dict(transactions[0])
+    del bad['V3']
+    batcher = MicroBatcher(trained_model, max_batch_size=16, max_wait_ms=50)
+    try:
+        good = batcher.submit(transactions)
+        missing = batcher.submit([bad])
+        wrong_type = batcher.submit([{**transactions[1], 'Amount': 'ten'}])
+        np.testing.assert_allclose(good.result(timeout=10), score_transactions(trained_model, transactions))
+        with pytest.raises(ValueError, match="missing field 'V3'"):
+            missing.result(timeout=10)
+        with pytest.raises(ValueError, match="'Amount' must be a number"):
+            wrong_type.result(timeout=10)
+    finally:
+        batcher.close()
+
+def test_http_bad_request_names_field(trained_model):
+    server = create_server(trained_model, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    bad = mock_transactions(1)[0]
+    del bad['V3']
+    try:
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{server.server_port}/score', data=json.dumps(bad).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request, timeout=10)
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.batcher.close()
+
+    assert error.value.code == 400
+    assert json.loads(error.value.read()) == {'error': "missing field 'V3'"}
+
+def test_unknown_path_keeps_connection_usable(trained_model):
+    """A 404 for a POST with a body does not leave that body to be parsed as the next request"""
+    server = create_server(trained_model, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+        body = b'GET /health HTTP/1.1\r\n\r\n'
+        connection.request('POST', '/other', body=body)
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 404
+
+        connection.request('POST', '/score', body=json.dumps(mock_transactions(1)))
+        response = connection.getresponse()
+        result = json.loads(response.read())
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.batcher.close()
+
+    assert response.status == 200
+    assert len(result['fraud_probability']) == 1
+
+def test_micro_batcher_reason_codes(trained_model):
+    """Flagged transactions get their top features, the others None"""
+    from explain import Explainer
+    transactions = mock_transactions(40)
+    batcher = MicroBatcher(trained_model, max_batch_size=16, max_wait_ms=5,
+                           explainer=Explainer(trained_model, k=2), threshold=0.5)
+    try:
+        proba, reasons = batcher.score(transactions, timeout=10, explain=True)
+    finally:
+        batcher.close()
+
+    np.testing.assert_allclose(proba, score_transactions(trained_model, transactions), rtol=1e-6)
+    for p, row in zip(proba, reasons):
+        assert (row is None) == (p < 0.5)
+        assert row is None or len(row) <= 2
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
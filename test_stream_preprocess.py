@@ -0,0 +1,57 @@
+"""
+Unit tests for streaming preprocessing
+"""
+import numpy as np
+import pytest
+from preprocess import feature_engineering
+from stream_preprocess import hash_split, hash_split_mask, iter_shards, stream_preprocess
+from test_preprocess import create_mock_data
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'creditcard.csv'
+    create_mock_data().to_csv(path, index=False)
+    return str(path)
+
+def test_hash_split_is_deterministic():
+    """Split assignment depends only on the key, and test share is close to TEST_SIZE"""
+    keys = np.arange(100000)
+    mask = hash_split_mask(keys)
+
+    np.testing.assert_array_equal(mask[500:600], hash_split_mask(keys[500:600]))
+    assert 0.19 < mask.mean() < 0.21
+
+    # Calibration rows come out of the train rows only, leaving the test rows unchanged
+    calibration, test = hash_split(keys)
+    np.testing.assert_array_equal(test, mask)
+    assert not (calibration & test).any()
+    assert 0.15 < calibration.mean() < 0.17
+
+def test_stream_preprocess_shards(csv_file, tmp_path):
+    """Shards cover every row once with the same features as the in-memory pipeline"""
+    output_dir = str(tmp_path / 'shards')
+    manifest = stream_preprocess(csv_file, output_dir, chunk_size=128)
+
+    train = [(X.copy(), y.copy()) for X, y in iter_shards('train', output_dir)]
+    calibration = [(X.copy(), y.copy()) for X, y in iter_shards('calibration', output_dir)]
+    test = [(X.copy(), y.copy()) for X, y in iter_shards('test', output_dir)]
+    X_all = np.concatenate([X for X, _ in train + calibration + test])
+
+    assert len(X_all) == 1000
+    assert manifest['feature_names'][-2:] == ['LogAmount', 'Hour']
+    assert all(X.dtype == np.float32 for X, _ in train)
+
+    expected = feature_engineering(create_mock_data(), verbose=False)
+    expected_test = expected[hash_split_mask(np.arange(1000))]
+    X_test = np.concatenate([X for X, _ in test])
+    np.testing.assert_allclose(X_test, expected_test[manifest['feature_names']], rtol=1e-5)
+
+def test_split_independent_of_chunk_size(csv_file, tmp_path):
+    """Changing the chunk size does not move rows between train and test"""
+    small = stream_preprocess(csv_file, str(tmp_path / 'a'), chunk_size=100)
+    large = stream_preprocess(csv_file, str(tmp_path / 'b'), chunk_size=1000)
+
+    assert small['class_counts'] == large['class_counts']
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
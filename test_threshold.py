@@ -0,0 +1,58 @@
+"""
+Unit tests for threshold optimisation
+"""
+import numpy as np
+import pytest
+from sklearn.metrics import precision_score, recall_score, confusion_matrix
+from threshold import threshold_sweep, select_threshold, optimise_threshold, save_threshold, load_threshold
+
+@pytest.fixture(scope='module')
+def scores():
+    rng = np.random.default_rng(0)
+    y = (rng.random(5000) < 0.02).astype(int)
+    # Rounded so that many rows share a score
+    proba = np.round(np.clip(rng.normal(0.2 + 0.5 * y, 0.15), 0, 1), 2)
+    return y, proba
+
+def test_sweep_matches_sklearn(scores):
+    """Every point of the single-sort sweep equals a direct count at that threshold"""
+    y, proba = scores
+    sweep = threshold_sweep(y, proba, cost_fn=10.0, cost_fp=1.0)
+
+    assert len(sweep['threshold']) == len(np.unique(proba))
+    for i in range(0, len(sweep['threshold']), 7):
+        y_pred = (proba >= sweep['threshold'][i]).astype(int)
+        tn, fp, fn, tp = confusion_matrix(y, y_pred, labels=[0, 1]).ravel()
+        assert (sweep['tp'][i], sweep['fp'][i], sweep['fn'][i]) == (tp, fp, fn)
+        assert sweep['precision'][i] == pytest.approx(precision_score(y, y_pred, zero_division=1))
+        assert sweep['recall'][i] == pytest.approx(recall_score(y, y_pred))
+        assert sweep['fpr'][i] == pytest.approx(fp / (fp + tn))
+        assert sweep['expected_cost'][i] == pytest.approx((10.0 * fn + fp) / len(y))
+
+def test_fpr_budget_picks_highest_recall(scores):
+    y, proba = scores
+    sweep = threshold_sweep(y, proba)
+    i = select_threshold(sweep, 'fpr_budget', max_fpr=0.01)
+
+    within = sweep['fpr'] <= 0.01
+    assert sweep['fpr'][i] <= 0.01
+    assert sweep['recall'][i] == sweep['recall'][within].max()
+
+def test_cost_and_f1_strategies(scores):
+    y, proba = scores
+    sweep = threshold_sweep(y, proba)
+
+    assert sweep['expected_cost'][select_threshold(sweep, 'cost')] == sweep['expected_cost'].min()
+    assert sweep['f1'][select_threshold(sweep, 'f1')] == sweep['f1'].max()
+    with pytest.raises(ValueError):
+        select_threshold(sweep, 'accuracy')
+
+def test_threshold_round_trip(scores, tmp_path, monkeypatch):
+    import threshold
+    monkeypatch.setattr(threshold, 'MODELS_PATH', str(tmp_path))
+    assert load_threshold(default=0.5) == 0.5
+
+    y, proba = scores
+    point = optimise_threshold(y, proba, strategy='f1')
+    save_threshold(point)
+    assert load_threshold() == point['threshold']
@@ -0,0 +1,33 @@
+"""
+Unit tests for model training
+"""
+import numpy as np
+import pytest
+import train_model
+from stream_preprocess import stream_preprocess, load_split
+from train_model import train_xgboost_external_memory
+from test_preprocess import create_mock_data
+
+def test_external_memory_training(tmp_path, monkeypatch):
+    """Training from shards produces a classifier that scores the test shards"""
+    monkeypatch.setattr(train_model, 'EXTMEM_CACHE_PATH', str(tmp_path / 'extmem'))
+
+    df = create_mock_data()
+    df.loc[df['V1'] > 1.5, 'Class'] = 1
+    csv_path = tmp_path / 'creditcard.csv'
+    df.to_csv(csv_path, index=False)
+
+    shards_dir = str(tmp_path / 'shards')
+    stream_preprocess(str(csv_path), shards_dir, chunk_size=200)
+    model = train_xgboost_external_memory(shards_dir, nthread=1)
+
+    X_test, y_test = load_split('test', shards_dir)
+    proba = model.predict_proba(X_test)[:, 1]
+
+    assert list(model.feature_names_in_) == list(X_test.columns)
+    assert proba.shape == (len(X_test),)
+    # V1 alone decides the label, so the model should separate the classes
+    assert np.mean((proba >= 0.5) == y_test.to_numpy()) > 0.95
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,47 @@
+"""
+Unit tests for hyperparameter search
+"""
+import pytest
+from preprocess import feature_engineering, split_data
+from tune import Trial, sample_configs, select_cheapest, successive_halving, tune
+from test_preprocess import create_mock_data
+import xgboost as xgb
+
+@pytest.fixture(scope='module')
+def split():
+    df = create_mock_data(n_samples=3000)
+    df.loc[df['V1'] + df['V2'] > 2, 'Class'] = 1
+    return split_data(feature_engineering(df, verbose=False))
+
+def test_successive_halving_prunes_trials(split):
+    """Fewer trials reach each larger budget, and none exceeds the round limit"""
+    X_train, X_valid, y_train, y_valid = split
+    dtrain = xgb.QuantileDMatrix(X_train, y_train)
+    dvalid = xgb.QuantileDMatrix(X_valid, y_valid, ref=dtrain)
+
+    trials = successive_halving(dtrain, dvalid, y_valid.to_numpy(), sample_configs(9),
+                                min_rounds=5, max_rounds=45, eta=3, n_parallel=3)
+    rounds = sorted(t.booster.num_boosted_rounds() for t in trials)
+
+    assert len(trials) == 9
+    assert rounds[-1] <= 45
+    assert sum(r > 5 for r in rounds) <= 3
+
+def test_select_cheapest_prefers_small_model():
+    """A cheaper trial within tolerance beats a slightly better expensive one"""
+    big, small = Trial(0, {'max_depth': 6}), Trial(1, {'max_depth': 2})
+    big.best_score, big.best_iteration, big.recall = 0.90, 199, 0.85
+    small.best_score, small.best_iteration, small.recall = 0.895, 49, 0.85
+
+    assert select_cheapest([big, small], tolerance=0.01) is small
+
+def test_tune_returns_classifier_params(split):
+    X_train, X_valid, y_train, y_valid = split
+    params, results = tune(X_train, y_train, X_valid, y_valid, n_trials=4, n_parallel=2)
+
+    assert len(results) == 4
+    model = xgb.XGBClassifier(**params).fit(X_train, y_train)
+    assert model.get_booster().num_boosted_rounds() == params['n_estimators']
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
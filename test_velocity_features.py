@@ -0,0 +1,85 @@
+"""
+Unit tests for velocity features
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from preprocess import feature_engineering
+from velocity_features import VelocityFeatureStore, backfill_velocity_features, velocity_feature_names
+from stream_preprocess import hash_split, iter_shards, stream_preprocess
+from test_preprocess import create_mock_data
+
+def mock_card_data(n_samples=3000, n_cards=40, seed=0):
+    """Mock transactions spread over a few cards, sorted by time"""
+    df = create_mock_data(n_samples=n_samples)
+    df['card_id'] = np.random.default_rng(seed).integers(0, n_cards, n_samples)
+    # Coarse timestamps so some transactions share a second
+    df['Time'] = (df['Time'] // 30) * 30
+    return df.sort_values('Time', kind='stable').reset_index(drop=True)
+
+def test_streaming_matches_backfill():
+    """Replaying transactions through the store gives the backfilled features"""
+    df = mock_card_data()
+    expected = backfill_velocity_features(df)[velocity_feature_names()]
+
+    store = VelocityFeatureStore()
+    streamed = pd.DataFrame([
+        store.update(card, t, amount)
+        for card, t, amount in zip(df['card_id'], df['Time'], df['Amount'])
+    ])
+
+    np.testing.assert_array_equal(streamed.filter(like='count'), expected.filter(like='count'))
+    np.testing.assert_allclose(streamed.filter(like='amount'), expected.filter(like='amount'), atol=1e-6)
+
+def test_backfill_small_example():
+    """Counts and sums cover (t - window, t] for the same card only"""
+    df = pd.DataFrame({
+        'card_id': ['a', 'a', 'b', 'a'],
+        'Time': [0.0, 30.0, 45.0, 90.0],
+        'Amount': [10.0, 20.0, 5.0, 1.0]
+    })
+    result = backfill_velocity_features(df, windows={'1m': 60})
+
+    assert result['velocity_count_1m'].tolist() == [1, 2, 1, 1]
+    assert result['velocity_amount_1m'].tolist() == [10.0, 30.0, 5.0, 1.0]
+
+def test_store_eviction():
+    """LRU and TTL limits keep the number of tracked entities bounded"""
+    store = VelocityFeatureStore(max_entities=10, ttl_seconds=100)
+    for i in range(50):
+        store.update(i, float(i), 1.0)
+    assert len(store) == 10
+
+    store.update('late', 1000.0, 1.0)
+    assert len(store) == 1
+
+def test_feature_engineering_adds_velocity_columns():
+    """Data with a card id gets velocity features, but not the id itself"""
+    features = feature_engineering(mock_card_data(), verbose=False)
+
+    assert set(velocity_feature_names()) <= set(features.columns)
+    assert 'card_id' not in features.columns
+
+def test_stream_preprocess_carries_windows_across_chunks(tmp_path):
+    """Chunked streaming gives the same velocity features as the whole file at once"""
+    df = mock_card_data()
+    # Few cards and a short time span, so most windows cross chunk boundaries
+    df['card_id'] = df['card_id'] % 5
+    path = tmp_path / 'cards.csv'
+    df.to_csv(path, index=False)
+
+    manifest = stream_preprocess(str(path), str(tmp_path / 'shards'), chunk_size=250)
+    expected = feature_engineering(pd.read_csv(path), verbose=False)[manifest['feature_names']]
+    calibration, test = hash_split(np.arange(len(df)))
+    for split, mask in (('train', ~(calibration | test)), ('calibration', calibration), ('test', test)):
+        X = np.concatenate([X for X, _ in iter_shards(split, str(tmp_path / 'shards'))])
+        np.testing.assert_allclose(X, expected[mask].to_numpy(dtype=np.float32), rtol=1e-5)
+
+def test_stream_preprocess_needs_time_order(tmp_path):
+    path = tmp_path / 'cards.csv'
+    mock_card_data().iloc[::-1].to_csv(path, index=False)
+    with pytest.raises(ValueError, match='sorted by Time'):
+        stream_preprocess(str(path), str(tmp_path / 'shards'), chunk_size=500)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
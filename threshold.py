@@ -0,0 +1,89 @@
+"""
+Decision threshold optimisation for the fraud model
+One sort of the predicted probabilities gives precision, recall, F1, false
+positive rate and expected cost at every distinct threshold in O(n log n).
+The chosen operating point is saved next to the model so serving can use it.
+"""
+
+import json
+import os
+import numpy as np
+from metrics import ScoreCounts
+from config import *
+
+THRESHOLD_FILE = 'threshold.json'
+
+def threshold_sweep(y_true, y_pred_proba, cost_fn=COST_FALSE_NEGATIVE, cost_fp=COST_FALSE_POSITIVE):
+    """Metrics at every distinct threshold, flagging fraud when proba >= threshold
+
+    Returns a dict of arrays ordered from the highest threshold to the lowest.
+    """
+    counts = ScoreCounts.from_scores(y_true, y_pred_proba)
+    tp, fp = counts.tp, counts.fp
+    n_positive, n_negative = counts.n_positive, counts.n_negative
+    fn = n_positive - tp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / n_positive if n_positive else np.zeros(len(tp))
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        fpr = fp / n_negative if n_negative else np.zeros(len(fp))
+
+    return {
+        'threshold': counts.thresholds,
+        'tp': tp, 'fp': fp, 'fn': fn,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'fpr': fpr,
+        'expected_cost': (cost_fn * fn + cost_fp * fp) / max(n_positive + n_negative, 1)
+    }
+
+def select_threshold(sweep, strategy=THRESHOLD_STRATEGY, max_fpr=TARGET_FPR):
+    """Index of the operating point in a sweep
+
+    'fpr_budget': highest recall with false positive rate <= max_fpr
+    'cost': lowest expected cost
+    'f1': highest F1
+    """
+    if strategy == 'fpr_budget':
+        allowed = np.flatnonzero(sweep['fpr'] <= max_fpr)
+        if len(allowed) == 0:
+            raise ValueError(f"No threshold keeps the false positive rate under {max_fpr}")
+        # Recall only grows as the threshold falls, so the last allowed point has the most recall
+        return int(allowed[-1])
+    if strategy == 'cost':
+        return int(np.argmin(sweep['expected_cost']))
+    if strategy == 'f1':
+        return int(np.argmax(sweep['f1']))
+    raise ValueError(f"Unknown threshold strategy: {strategy}")
+
+def optimise_threshold(y_true, y_pred_proba, strategy=THRESHOLD_STRATEGY, max_fpr=TARGET_FPR):
+    """Sweep all thresholds and return the chosen operating point as a dict"""
+    sweep = threshold_sweep(y_true, y_pred_proba)
+    i = select_threshold(sweep, strategy, max_fpr)
+
+    point = {key: float(values[i]) for key, values in sweep.items()}
+    point.update({'strategy': strategy, 'max_fpr': max_fpr,
+                  'cost_fn': COST_FALSE_NEGATIVE, 'cost_fp': COST_FALSE_POSITIVE})
+
+    print(f"Operating point ({strategy}): threshold {point['threshold']:.4f}, "
+          f"precision {point['precision']:.4f}, recall {point['recall']:.4f}, "
+          f"FPR {point['fpr']:.5f}")
+    return point
+
+def save_threshold(point, filename=THRESHOLD_FILE):
+    """Store the operating point next to the model"""
+    os.makedirs(MODELS_PATH, exist_ok=True)
+    filepath = os.path.join(MODELS_PATH, filename)
+    with open(filepath, 'w') as f:
+        json.dump(point, f, indent=2)
+    print(f"Threshold saved to {filepath}")
+
+def load_threshold(filename=THRESHOLD_FILE, default=FRAUD_THRESHOLD):
+    """Saved decision threshold, or default when none has been saved"""
+    filepath = os.path.join(MODELS_PATH, filename)
+    if not os.path.exists(filepath):
+        return default
+    with open(filepath) as f:
+        return json.load(f)['threshold']
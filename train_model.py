@@ -6,19 +6,104 @@ Trains XGBoost classifier and saves the model
 import xgboost as xgb
 import joblib
 import os
+import shutil
+import numpy as np
 from preprocess import preprocess_pipeline
+from stream_preprocess import load_manifest
+from instrument import instrumented
 from config import *
 
-def train_xgboost(X_train, y_train):
+def class_weight_params(y_train):
+    """XGBoost scale_pos_weight for y_train when RESAMPLING_METHOD is 'scale_pos_weight', else nothing"""
+    if RESAMPLING_METHOD != 'scale_pos_weight':
+        return {}
+    # No synthetic fraud rows, so weight the fraud class by the imbalance ratio
+    y = np.asarray(y_train)
+    return {'scale_pos_weight': (y == 0).sum() / max((y == 1).sum(), 1)}
+
+@instrumented()
+def train_xgboost(X_train, y_train, params=None):
     """Train XGBoost classifier"""
     print("Training XGBoost model...")
     
-    model = xgb.XGBClassifier(**XGBOOST_PARAMS)
+    params = dict(XGBOOST_PARAMS if params is None else params)
+    params.update(class_weight_params(y_train))
+    
+    model = xgb.XGBClassifier(**params)
     model.fit(X_train, y_train)
     
     print("Model training complete!")
     return model
 
+def booster_params(nthread=TRAIN_NTHREAD):
+    """Translate XGBOOST_PARAMS (sklearn wrapper names) into xgb.train params"""
+    params = {k: v for k, v in XGBOOST_PARAMS.items() if k not in ('n_estimators', 'random_state')}
+    params['objective'] = 'binary:logistic'
+    params['tree_method'] = 'hist'
+    params['seed'] = XGBOOST_PARAMS.get('random_state', RANDOM_STATE)
+    if nthread:
+        params['nthread'] = nthread
+
+    return params, XGBOOST_PARAMS['n_estimators']
+
+def booster_to_classifier(booster):
+    """Wrap a native Booster as an XGBClassifier so it works with predict_proba and save_model"""
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw('json')))
+    return model
+
+class ShardIterator(xgb.DataIter):
+    """Feed preprocessed shards from disk to XGBoost one at a time"""
+
+    def __init__(self, split='train', shards_dir=SHARDS_PATH, cache_prefix=None):
+        manifest = load_manifest(shards_dir)
+        self.feature_names = manifest['feature_names']
+        directory = os.path.join(shards_dir, split)
+        self._paths = [
+            (os.path.join(directory, f"X_{shard['index']:05d}.npy"),
+             os.path.join(directory, f"y_{shard['index']:05d}.npy"))
+            for shard in manifest['shards'][split]
+        ]
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._position == len(self._paths):
+            return False
+
+        X_path, y_path = self._paths[self._position]
+        input_data(data=np.load(X_path), label=np.load(y_path), feature_names=self.feature_names)
+        self._position += 1
+        return True
+
+    def reset(self):
+        self._position = 0
+
+@instrumented()
+def train_xgboost_external_memory(shards_dir=SHARDS_PATH, nthread=TRAIN_NTHREAD):
+    """Train XGBoost from on-disk shards without loading the training set into memory"""
+    print("Training XGBoost model from shards (external memory)...")
+
+    params, num_boost_round = booster_params(nthread)
+
+    # Shards are not resampled with SMOTE, so weight the fraud class instead
+    counts = load_manifest(shards_dir)['class_counts']['train']
+    params['scale_pos_weight'] = counts.get('0', 0) / max(counts.get('1', 0), 1)
+
+    cache_dir = os.path.join(EXTMEM_CACHE_PATH, str(os.getpid()))
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        iterator = ShardIterator('train', shards_dir, cache_prefix=os.path.join(cache_dir, 'train'))
+        dtrain = xgb.ExtMemQuantileDMatrix(iterator, nthread=nthread, max_bin=EXTMEM_MAX_BIN)
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+        # Free the matrix first so XGBoost releases its cache pages before they are deleted
+        del dtrain, iterator
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("Model training complete!")
+    return booster_to_classifier(booster)
+
 def save_model(model, filename='fraud_detection_model.pkl'):
     """Save trained model to disk"""
     # Create models directory if it doesn't exist
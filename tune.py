@@ -0,0 +1,180 @@
+"""
+Hyperparameter search for the XGBoost model
+Successive halving over randomly sampled configurations: every trial gets a
+small boosting budget, only the best third move on to a bigger one.
+Trials run in parallel threads with their own thread limit and share one
+QuantileDMatrix, and each uses early stopping on a held-out validation fold.
+Among the good trials the cheapest model (fewest trees x depth) is kept,
+since inference cost grows with the number of trees.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from preprocess import load_data, feature_engineering, split_data, apply_smote
+from train_model import booster_params, class_weight_params
+from instrument import instrumented
+from config import *
+
+TUNED_PARAMS_FILE = 'tuned_params.json'
+
+def sample_configs(n_trials=TUNE_N_TRIALS, search_space=TUNE_SEARCH_SPACE, seed=RANDOM_STATE):
+    """Draw n_trials random configurations from the search space"""
+    rng = np.random.default_rng(seed)
+    return [
+        {name: values[rng.integers(len(values))] for name, values in search_space.items()}
+        for _ in range(n_trials)
+    ]
+
+class Trial:
+    """One configuration and its partially trained booster"""
+
+    def __init__(self, trial_id, config):
+        self.trial_id = trial_id
+        self.config = config
+        self.booster = None
+        self.best_score = -np.inf
+        self.best_iteration = 0
+        self.stopped = False  # early stopping fired, more rounds will not help
+        self.recall = None
+        self.train_time = 0.0
+
+    @property
+    def n_trees(self):
+        return self.best_iteration + 1
+
+    @property
+    def cost(self):
+        """Inference cost proxy: trees times depth"""
+        return self.n_trees * self.config['max_depth']
+
+    def to_dict(self):
+        return {'trial': self.trial_id, **self.config, 'n_trees': self.n_trees,
+                'score': self.best_score, 'recall': self.recall,
+                'train_time_s': self.train_time, 'stopped_early': self.stopped}
+
+def run_rung(trial, dtrain, dvalid, y_valid, num_rounds, nthread, class_weight=None):
+    """Continue a trial's training up to num_rounds total trees"""
+    params, _ = booster_params(nthread)
+    params.update(class_weight or {})
+    params.update(trial.config)
+    params['eval_metric'] = TUNE_METRIC
+
+    done = trial.booster.num_boosted_rounds() if trial.booster is not None else 0
+    start = time.perf_counter()
+    booster = xgb.train(
+        params, dtrain, num_boost_round=num_rounds - done,
+        evals=[(dvalid, 'valid')], early_stopping_rounds=TUNE_EARLY_STOPPING_ROUNDS,
+        xgb_model=trial.booster, verbose_eval=False
+    )
+    trial.train_time += time.perf_counter() - start
+
+    # best_score only covers the rounds added in this call
+    if booster.best_score > trial.best_score:
+        trial.best_score = booster.best_score
+        trial.best_iteration = booster.best_iteration
+    trial.stopped = booster.num_boosted_rounds() < num_rounds
+    trial.booster = booster
+
+    proba = booster.predict(dvalid, iteration_range=(0, trial.n_trees))
+    positives = y_valid == 1
+    trial.recall = float(((proba >= FRAUD_THRESHOLD) & positives).sum() / max(positives.sum(), 1))
+    return trial
+
+def successive_halving(dtrain, dvalid, y_valid, configs, min_rounds=TUNE_MIN_ROUNDS,
+                       max_rounds=TUNE_MAX_ROUNDS, eta=TUNE_ETA, n_parallel=TUNE_PARALLEL_TRIALS,
+                       class_weight=None):
+    """Train all configs on a small budget, keep the best 1/eta, multiply the budget by eta, repeat
+
+    class_weight holds the scale_pos_weight train_xgboost will use, so trials train the same model.
+    """
+    nthread = max(1, (os.cpu_count() or 1) // n_parallel)
+    trials = [Trial(i, config) for i, config in enumerate(configs)]
+    active = list(trials)
+    budget = min_rounds
+
+    with ThreadPoolExecutor(max_workers=n_parallel) as pool:
+        while active:
+            print(f"Rung: {len(active)} trials, {budget} rounds each ({nthread} threads per trial)")
+            # XGBoost releases the GIL while training, so threads run trials in parallel
+            list(pool.map(lambda t: run_rung(t, dtrain, dvalid, y_valid, budget, nthread, class_weight), active))
+
+            if budget >= max_rounds:
+                break
+            ranked = sorted(active, key=lambda t: t.best_score, reverse=True)
+            keep = max(1, len(ranked) // eta)
+            active = [t for t in ranked[:keep] if not t.stopped]
+            budget = min(budget * eta, max_rounds)
+
+    return trials
+
+def select_cheapest(trials, tolerance=TUNE_SCORE_TOLERANCE):
+    """Cheapest trial whose score and recall are within tolerance of the best-scoring trial"""
+    best = max(trials, key=lambda t: t.best_score)
+    good = [t for t in trials
+            if t.best_score >= best.best_score - tolerance and t.recall >= best.recall - tolerance]
+    return min(good, key=lambda t: (t.cost, -t.best_score))
+
+def tune(X_train, y_train, X_valid, y_valid, n_trials=TUNE_N_TRIALS, n_parallel=TUNE_PARALLEL_TRIALS):
+    """Search hyperparameters, returning (best params for XGBClassifier, all trial results)"""
+    print(f"Tuning XGBoost: {n_trials} trials, {n_parallel} in parallel...")
+
+    # Quantise the data once; every trial and rung reuses these matrices
+    dtrain = xgb.QuantileDMatrix(X_train, y_train)
+    dvalid = xgb.QuantileDMatrix(X_valid, y_valid, ref=dtrain)
+
+    trials = successive_halving(dtrain, dvalid, np.asarray(y_valid), sample_configs(n_trials),
+                                n_parallel=n_parallel, class_weight=class_weight_params(y_train))
+    best = select_cheapest(trials)
+
+    params = dict(XGBOOST_PARAMS)
+    params.update(best.config)
+    params['n_estimators'] = best.n_trees
+
+    print(f"\nBest trial {best.trial_id}: {best.config}")
+    print(f"{best.n_trees} trees, {TUNE_METRIC} {best.best_score:.4f}, recall {best.recall:.4f}")
+    return params, [t.to_dict() for t in trials]
+
+def save_tuned_params(params, results, filename=TUNED_PARAMS_FILE):
+    os.makedirs(MODELS_PATH, exist_ok=True)
+    filepath = os.path.join(MODELS_PATH, filename)
+    with open(filepath, 'w') as f:
+        json.dump({'params': params, 'trials': results}, f, indent=2, default=float)
+    print(f"Tuned parameters saved to {filepath}")
+
+def load_tuned_params(filename=TUNED_PARAMS_FILE):
+    """Parameters found by the last tuning run"""
+    filepath = os.path.join(MODELS_PATH, filename)
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Tuned parameters not found at {filepath}")
+    with open(filepath) as f:
+        return json.load(f)['params']
+
+@instrumented()
+def tune_pipeline(filepath=DATA_PATH, n_trials=TUNE_N_TRIALS, n_parallel=TUNE_PARALLEL_TRIALS):
+    """Hold out a validation fold from the training split, resample only the rest, and tune"""
+    df = feature_engineering(load_data(filepath))
+    X_train, X_test, y_train, y_test = split_data(df)
+
+    # Validation rows stay real: SMOTE only sees the fitting part
+    X_fit, X_valid, y_fit, y_valid = train_test_split(
+        X_train, y_train, test_size=TUNE_VALID_SIZE, random_state=RANDOM_STATE, stratify=y_train
+    )
+    X_fit, y_fit = apply_smote(X_fit, y_fit)
+
+    params, results = tune(X_fit, y_fit, X_valid, y_valid, n_trials, n_parallel)
+    save_tuned_params(params, results)
+    return params
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Hyperparameter search with successive halving')
+    parser.add_argument('--trials', type=int, default=TUNE_N_TRIALS)
+    parser.add_argument('--parallel', type=int, default=TUNE_PARALLEL_TRIALS)
+
+    args = parser.parse_args()
+    tune_pipeline(n_trials=args.trials, n_parallel=args.parallel)
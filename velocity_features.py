@@ -0,0 +1,160 @@
+"""
+Per-entity velocity features (transaction count and amount sum over sliding windows)
+Streaming mode keeps a fixed-size ring buffer of recent transactions per
+entity with O(1) amortised updates and LRU/TTL eviction; backfill mode
+computes the same features vectorised over a whole DataFrame for training
+"""
+
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from config import *
+
+def velocity_feature_names(windows=VELOCITY_WINDOWS):
+    """Output column names, e.g. velocity_count_1h and velocity_amount_1h"""
+    names = []
+    for label in windows:
+        names += [f'velocity_count_{label}', f'velocity_amount_{label}']
+    return names
+
+class _EntityState:
+    """Ring buffer of one entity's recent transactions plus running window totals"""
+
+    __slots__ = ('times', 'amounts', 'head', 'size', 'starts', 'counts', 'sums', 'last_time')
+
+    def __init__(self, capacity, n_windows):
+        self.times = np.empty(capacity)
+        self.amounts = np.empty(capacity)
+        self.head = 0  # absolute index of the oldest event still in the buffer
+        self.size = 0
+        self.starts = [0] * n_windows  # absolute index of the first event inside each window
+        self.counts = [0] * n_windows
+        self.sums = [0.0] * n_windows
+        self.last_time = None
+
+class VelocityFeatureStore:
+    """Streaming sliding-window aggregates keyed by entity (e.g. card id)
+
+    Each update adds one transaction and returns the count and amount sum
+    over every window, including that transaction. Window totals are kept
+    incrementally: expired events are subtracted as the window start moves
+    forward, so an update costs O(number of windows) amortised.
+
+    Memory is bounded by max_entities (least recently seen entities are
+    evicted first), ttl_seconds (entities idle for longer are dropped) and
+    max_events per entity. Results match backfill_velocity_features as
+    long as an entity has no more than max_events transactions inside the
+    largest window and events arrive in time order.
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS, max_entities=VELOCITY_MAX_ENTITIES,
+                 ttl_seconds=VELOCITY_TTL_SECONDS, max_events=VELOCITY_MAX_EVENTS):
+        self.labels = list(windows)
+        self.lengths = [windows[label] for label in self.labels]
+        self.feature_names = velocity_feature_names(windows)
+        self.max_entities = max_entities
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self._entities = OrderedDict()
+
+    def __len__(self):
+        return len(self._entities)
+
+    def _evict(self, now):
+        # Entities are ordered by last update, so idle ones are at the front
+        while self._entities:
+            key, state = next(iter(self._entities.items()))
+            if len(self._entities) > self.max_entities or now - state.last_time > self.ttl_seconds:
+                del self._entities[key]
+            else:
+                break
+
+    def _drop_before(self, state, index):
+        """Remove events with absolute index < index from every window total"""
+        capacity = self.max_events
+        for w in range(len(self.lengths)):
+            while state.starts[w] < index:
+                slot = state.starts[w] % capacity
+                state.counts[w] -= 1
+                state.sums[w] -= state.amounts[slot]
+                state.starts[w] += 1
+
+    def update(self, entity, time, amount):
+        """Add one transaction and return its velocity features as a dict"""
+        state = self._entities.get(entity)
+        if state is None:
+            state = _EntityState(self.max_events, len(self.lengths))
+            self._entities[entity] = state
+        else:
+            self._entities.move_to_end(entity)
+
+        capacity = self.max_events
+        # Buffer full: the oldest event leaves every window that still holds it
+        if state.size == capacity:
+            self._drop_before(state, state.head + 1)
+            state.head += 1
+            state.size -= 1
+
+        tail = state.head + state.size
+        state.times[tail % capacity] = time
+        state.amounts[tail % capacity] = amount
+        state.size += 1
+        state.last_time = time
+
+        features = {}
+        for w, (label, length) in enumerate(zip(self.labels, self.lengths)):
+            state.counts[w] += 1
+            state.sums[w] += amount
+            # Slide the window start past events at or before time - length
+            while state.times[state.starts[w] % capacity] <= time - length:
+                state.counts[w] -= 1
+                state.sums[w] -= state.amounts[state.starts[w] % capacity]
+                state.starts[w] += 1
+            features[f'velocity_count_{label}'] = state.counts[w]
+            features[f'velocity_amount_{label}'] = state.sums[w]
+
+        # Events older than the largest window are no longer needed
+        oldest_needed = min(state.starts)
+        state.size -= oldest_needed - state.head
+        state.head = oldest_needed
+
+        self._evict(time)
+        return features
+
+def backfill_velocity_features(df, entity_column=ENTITY_COLUMN, windows=VELOCITY_WINDOWS):
+    """Vectorised velocity features for every row of a DataFrame
+
+    Rows are ordered by (entity, Time); within each entity a window's
+    count is the distance to the first event after time - window, found
+    with one searchsorted, and its sum is a difference of prefix sums.
+    Returns a copy of df with the velocity columns added.
+    """
+    codes = pd.factorize(df[entity_column])[0].astype(np.float64)
+    times = df[TIME_COLUMN].to_numpy(dtype=np.float64)
+    amounts = df[AMOUNT_COLUMN].to_numpy(dtype=np.float64)
+
+    # Stable sort, so equal timestamps keep their input order like the streaming store
+    order = np.lexsort((times, codes))
+    sorted_times = times[order]
+    sorted_amounts = amounts[order]
+
+    # Offset every entity onto its own stretch of the time axis, so one
+    # searchsorted over the whole array never crosses entity boundaries
+    offset = sorted_times - sorted_times.min() if len(df) else sorted_times
+    span = (offset.max() if len(df) else 0.0) + max(windows.values()) + 1.0
+    keys = codes[order] * span + offset
+
+    positions = np.arange(len(df))
+    prefix = np.concatenate([[0.0], np.cumsum(sorted_amounts)])
+
+    result = df.copy()
+    for label, length in windows.items():
+        first = np.searchsorted(keys, keys - length, side='right')
+        count = np.empty(len(df), dtype=np.int64)
+        total = np.empty(len(df))
+        count[order] = positions - first + 1
+        total[order] = prefix[positions + 1] - prefix[first]
+        result[f'velocity_count_{label}'] = count
+        result[f'velocity_amount_{label}'] = total
+
+    return result
@@ -9,14 +9,16 @@ import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
+from data_cache import load_cached
+from report import plot_figure, generate_figures
+from preprocess import hour_of_day
+from instrument import instrumented
 from config import *
 
-def plot_class_distribution(df, save=True):
-    """Plot distribution of fraud vs legitimate transactions"""
+def draw_class_distribution(class_counts):
+    """Draw fraud vs legitimate transaction counts"""
     plt.figure(figsize=FIGURE_SIZE)
     
-    class_counts = df[TARGET_COLUMN].value_counts()
     colors = ['#2ecc71', '#e74c3c']
     
     plt.bar(class_counts.index, class_counts.values, color=colors, alpha=0.8)
@@ -26,91 +28,100 @@ def plot_class_distribution(df, save=True):
     plt.xticks([0, 1], ['Legitimate', 'Fraud'])
     
     # Add percentage labels
-    total = len(df)
+    total = class_counts.sum()
     for i, count in enumerate(class_counts.values):
         percentage = (count / total) * 100
         plt.text(i, count, f'{percentage:.2f}%', ha='center', va='bottom')
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'class_distribution.png'), dpi=300, bbox_inches='tight')
-        print(f"Class distribution plot saved to {PLOTS_PATH}")
-    
-    plt.close()
 
-def plot_amount_distribution(df, save=True):
-    """Plot distribution of transaction amounts"""
+def draw_amount_distribution(legitimate, fraud):
+    """Draw amount histograms from (counts, bin edges) per class"""
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
     
-    # Plot for legitimate transactions
-    legitimate = df[df[TARGET_COLUMN] == 0][AMOUNT_COLUMN]
-    axes[0].hist(legitimate, bins=50, color='#2ecc71', alpha=0.7)
-    axes[0].set_xlabel('Amount')
-    axes[0].set_ylabel('Frequency')
-    axes[0].set_title('Legitimate Transactions')
-    axes[0].set_xlim([0, 500])
-    
-    # Plot for fraud transactions
-    fraud = df[df[TARGET_COLUMN] == 1][AMOUNT_COLUMN]
-    axes[1].hist(fraud, bins=50, color='#e74c3c', alpha=0.7)
-    axes[1].set_xlabel('Amount')
-    axes[1].set_ylabel('Frequency')
-    axes[1].set_title('Fraudulent Transactions')
-    axes[1].set_xlim([0, 500])
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'amount_distribution.png'), dpi=300, bbox_inches='tight')
-        print(f"Amount distribution plot saved to {PLOTS_PATH}")
-    
-    plt.close()
+    for ax, (counts, edges), color, title in [(axes[0], legitimate, '#2ecc71', 'Legitimate Transactions'),
+                                              (axes[1], fraud, '#e74c3c', 'Fraudulent Transactions')]:
+        ax.hist(edges[:-1], bins=edges, weights=counts, color=color, alpha=0.7)
+        ax.set_xlabel('Amount')
+        ax.set_ylabel('Frequency')
+        ax.set_title(title)
+        ax.set_xlim([0, 500])
 
-def plot_time_distribution(df, save=True):
-    """Plot transaction patterns over time"""
+def draw_time_distribution(histograms):
+    """Draw hour-of-day histograms from (counts, bin edges) per class"""
     plt.figure(figsize=(12, 5))
     
-    # Convert Time to hours
-    df['Hour'] = (df[TIME_COLUMN] / 3600) % 24
-    
-    # Plot for each class
-    for class_val, color, label in [(0, '#2ecc71', 'Legitimate'), 
-                                      (1, '#e74c3c', 'Fraud')]:
-        subset = df[df[TARGET_COLUMN] == class_val]
-        plt.hist(subset['Hour'], bins=24, alpha=0.6, color=color, label=label)
+    for (counts, edges), color, label in zip(histograms, ['#2ecc71', '#e74c3c'], ['Legitimate', 'Fraud']):
+        plt.hist(edges[:-1], bins=edges, weights=counts, alpha=0.6, color=color, label=label)
     
     plt.xlabel('Hour of Day')
     plt.ylabel('Number of Transactions')
     plt.title('Transaction Distribution by Hour')
     plt.legend()
     plt.grid(True, alpha=0.3)
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'time_distribution.png'), dpi=300, bbox_inches='tight')
-        print(f"Time distribution plot saved to {PLOTS_PATH}")
-    
-    plt.close()
 
-def plot_correlation_heatmap(df, save=True):
-    """Plot correlation heatmap of features"""
+def draw_correlation_heatmap(correlation):
+    """Draw a feature correlation heatmap"""
     plt.figure(figsize=(12, 10))
     
-    # Select a subset of features for readability
-    features_to_plot = [col for col in df.columns if col.startswith('V')][:10] + [AMOUNT_COLUMN, TARGET_COLUMN]
-    
-    correlation = df[features_to_plot].corr()
-    
     sns.heatmap(correlation, annot=True, fmt='.2f', cmap='coolwarm', 
                 center=0, square=True, linewidths=1)
     plt.title('Feature Correlation Heatmap')
-    
-    if save:
-        os.makedirs(PLOTS_PATH, exist_ok=True)
-        plt.savefig(os.path.join(PLOTS_PATH, 'correlation_heatmap.png'), dpi=300, bbox_inches='tight')
-        print(f"Correlation heatmap saved to {PLOTS_PATH}")
-    
-    plt.close()
 
+def class_distribution_figure(df):
+    return 'class_distribution.png', draw_class_distribution, {
+        'class_counts': df[TARGET_COLUMN].value_counts()
+    }
+
+def amount_distribution_figure(df):
+    """Amount histograms, binned here so the renderer only gets the counts"""
+    labels = df[TARGET_COLUMN].to_numpy()
+    amounts = df[AMOUNT_COLUMN].to_numpy()
+    return 'amount_distribution.png', draw_amount_distribution, {
+        'legitimate': np.histogram(amounts[labels == 0], bins=50),
+        'fraud': np.histogram(amounts[labels == 1], bins=50)
+    }
+
+def time_distribution_figure(df):
+    # Convert Time to hours (same computation as the Hour feature)
+    hours = hour_of_day(df[TIME_COLUMN].to_numpy())
+    labels = df[TARGET_COLUMN].to_numpy()
+    return 'time_distribution.png', draw_time_distribution, {
+        'histograms': [np.histogram(hours[labels == class_val], bins=24) for class_val in (0, 1)]
+    }
+
+def correlation_heatmap_figure(df):
+    # Select a subset of features for readability
+    features_to_plot = [col for col in df.columns if col.startswith('V')][:10] + [AMOUNT_COLUMN, TARGET_COLUMN]
+    return 'correlation_heatmap.png', draw_correlation_heatmap, {
+        'correlation': df[features_to_plot].corr()
+    }
+
+@instrumented()
+def eda_figures(df):
+    """Every EDA figure, ready for report.generate_figures"""
+    return [
+        class_distribution_figure(df),
+        amount_distribution_figure(df),
+        time_distribution_figure(df),
+        correlation_heatmap_figure(df)
+    ]
+
+def plot_class_distribution(df, save=True):
+    """Plot distribution of fraud vs legitimate transactions"""
+    plot_figure(class_distribution_figure(df), save)
+
+def plot_amount_distribution(df, save=True):
+    """Plot distribution of transaction amounts"""
+    plot_figure(amount_distribution_figure(df), save)
+
+def plot_time_distribution(df, save=True):
+    """Plot transaction patterns over time"""
+    plot_figure(time_distribution_figure(df), save)
+
+def plot_correlation_heatmap(df, save=True):
+    """Plot correlation heatmap of features"""
+    plot_figure(correlation_heatmap_figure(df), save)
+
+@instrumented()
 def generate_all_plots(filepath=DATA_PATH):
     """Generate all EDA visualizations"""
     print("\n" + "="*60)
@@ -119,21 +130,12 @@ def generate_all_plots(filepath=DATA_PATH):
     
     # Load data
     print("Loading data...")
-    df = pd.read_csv(filepath)
+    df = load_cached(filepath) if USE_DATA_CACHE else pd.read_csv(filepath)
     print(f"Data loaded: {df.shape[0]} rows, {df.shape[1]} columns\n")
     
-    # Generate plots
-    print("1. Class Distribution...")
-    plot_class_distribution(df)
-    
-    print("\n2. Amount Distribution...")
-    plot_amount_distribution(df)
-    
-    print("\n3. Time Distribution...")
-    plot_time_distribution(df)
-    
-    print("\n4. Correlation Heatmap...")
-    plot_correlation_heatmap(df)
+    # Summarise the data here, then render the figures in parallel
+    print("Summarising data for plots...")
+    generate_figures(eda_figures(df))
     
     print("\n" + "="*60)
     print("ALL VISUALIZATIONS COMPLETE!")